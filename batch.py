@@ -0,0 +1,157 @@
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from cube import SISCube
+from flux_stats import cached_flux_statistics
+from identification import DecaySegmentIndex, compute_decay_events_for_all_data
+from instrumentation import PipelineStats
+from parallel import resolve_max_workers
+
+"""Batch runner for several SIS archives (flux_1998/, flux_2014/, ...). Each
+dataset folder is loaded, its Q1 helium threshold is looked up in the folder's
+cached flux statistics (see flux_stats.py), and `compute_decay_events_for_all_data` is run on it.
+Datasets are processed concurrently, one process each, and the remaining cores
+are shared out to parse each dataset's element files. Every dataset gets its
+own catalog CSV, and a JSON report records per-dataset wall time, throughput and
+the detection's stage timings and counters (see instrumentation.py).
+
+    python batch.py flux_1998/ flux_2014/ --output-dir transformed_data/batch
+"""
+
+
+def process_dataset(folder_path, output_dir, energy_level, min_duration_hours, window_size, window_size_for_decay_count,
+                    slope_threshold, r_value_threshold, load_workers=1):
+    """
+    Loads one dataset folder, detects its decay events and writes its catalog.
+
+    Args:
+        folder_path (str): The dataset folder containing the SIS data files.
+        output_dir (str): Folder the catalog is written to, as `decay_events_<dataset>.csv`.
+        energy_level (int): The energy level to analyze.
+        min_duration_hours (int): Minimum duration (hours) above threshold.
+        window_size (int): Size of the sliding window for decay detection (in hours).
+        window_size_for_decay_count (int): Size of the sliding window for counting decaying elements (in hours).
+        slope_threshold (float): Threshold for the slope to identify a decay.
+        r_value_threshold (float): Minimum correlation coefficient (r-value) for considering a fit.
+        load_workers (int): Number of processes used to parse the element files.
+
+    Returns:
+        dict: Report with the output path, event count, stage timings, throughput and detection stats.
+    """
+    dataset_name = os.path.basename(os.path.normpath(folder_path))
+    timings = {}
+
+    start = time.perf_counter()
+    cube = SISCube.from_folder(folder_path, max_workers=load_workers)
+    timings["load"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    q1_values = cached_flux_statistics(folder_path, max_workers=load_workers).q1_thresholds(energy_level)
+    timings["thresholds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    detection_stats = PipelineStats()
+    with detection_stats.stage("decay_index"):
+        decay_index = DecaySegmentIndex(cube, None, None, window_size_for_decay_count, slope_threshold, r_value_threshold,
+                                        energy_levels=[energy_level])
+    decay_events_df = compute_decay_events_for_all_data(
+        cube, None, None, energy_level, q1_values["He"], min_duration_hours, window_size,
+        window_size_for_decay_count, slope_threshold, r_value_threshold, decay_index=decay_index, stats=detection_stats,
+    )
+    timings["detect"] = time.perf_counter() - start
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_csv = os.path.join(output_dir, f"decay_events_{dataset_name}.csv")
+    decay_events_df.to_csv(output_csv, index=False)
+
+    total_seconds = sum(timings.values())
+    num_samples = len(cube)
+    return {
+        "dataset": dataset_name,
+        "folder_path": folder_path,
+        "output_csv": output_csv,
+        "samples": num_samples,
+        "elements": len(cube.element_mapping),
+        "events": len(decay_events_df),
+        "he_flux_threshold": float(q1_values["He"]),
+        "seconds": timings,
+        "total_seconds": total_seconds,
+        "samples_per_second": num_samples / total_seconds if total_seconds > 0 else float("inf"),
+        "detection": detection_stats.as_dict(),
+    }
+
+
+def run_batch(folder_paths, output_dir, energy_level=1, min_duration_hours=48, window_size=24, window_size_for_decay_count=18,
+              slope_threshold=-0.005, r_value_threshold=0.5, max_workers=None):
+    """
+    Processes several dataset folders concurrently with `process_dataset`.
+
+    Args:
+        folder_paths (list): Dataset folders, e.g. ["flux_1998/", "flux_2014/"].
+        output_dir (str): Folder the catalogs and `batch_report.json` are written to.
+        energy_level (int): The energy level to analyze.
+        min_duration_hours (int): Minimum duration (hours) above threshold.
+        window_size (int): Size of the sliding window for decay detection (in hours).
+        window_size_for_decay_count (int): Size of the sliding window for counting decaying elements (in hours).
+        slope_threshold (float): Threshold for the slope to identify a decay.
+        r_value_threshold (float): Minimum correlation coefficient (r-value) for considering a fit.
+        max_workers (int): Total number of processes to use. Defaults to one per CPU.
+
+    Returns:
+        list: One report dict per dataset, in the order of `folder_paths`.
+    """
+    max_workers = resolve_max_workers(max_workers)
+    dataset_workers = max(1, min(max_workers, len(folder_paths)))
+    # Cores left over after one process per dataset go to parsing the element files
+    load_workers = max(1, max_workers // dataset_workers)
+
+    params = (energy_level, min_duration_hours, window_size, window_size_for_decay_count, slope_threshold, r_value_threshold, load_workers)
+
+    start = time.perf_counter()
+    if dataset_workers == 1:
+        reports = [process_dataset(folder_path, output_dir, *params) for folder_path in folder_paths]
+    else:
+        with ProcessPoolExecutor(max_workers=dataset_workers) as executor:
+            futures = [executor.submit(process_dataset, folder_path, output_dir, *params) for folder_path in folder_paths]
+            reports = [future.result() for future in futures]
+    wall_seconds = time.perf_counter() - start
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "batch_report.json"), "w") as f:
+        json.dump({"wall_seconds": wall_seconds, "max_workers": max_workers, "datasets": reports}, f, indent=2)
+
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect decay events in several SIS dataset folders at once.")
+    parser.add_argument("folder_paths", nargs="+", help="dataset folders, e.g. flux_1998/ flux_2014/")
+    parser.add_argument("--output-dir", default="transformed_data/batch")
+    parser.add_argument("--energy-level", type=int, default=1)
+    parser.add_argument("--min-duration-hours", type=int, default=48)
+    parser.add_argument("--window-size", type=int, default=24)
+    parser.add_argument("--window-size-for-decay-count", type=int, default=18)
+    parser.add_argument("--slope-threshold", type=float, default=-0.005)
+    parser.add_argument("--r-value-threshold", type=float, default=0.5)
+    parser.add_argument("--max-workers", type=int, default=None)
+    parser.add_argument("--log-level", default="WARNING", help="logging level, e.g. INFO or DEBUG")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    reports = run_batch(
+        args.folder_paths, args.output_dir, args.energy_level, args.min_duration_hours, args.window_size,
+        args.window_size_for_decay_count, args.slope_threshold, args.r_value_threshold, args.max_workers,
+    )
+
+    print(f"{'dataset':<16}{'samples':>10}{'events':>8}{'load s':>9}{'detect s':>10}{'total s':>9}{'samples/s':>12}")
+    for report in reports:
+        print(f"{report['dataset']:<16}{report['samples']:>10}{report['events']:>8}{report['seconds']['load']:>9.2f}"
+              f"{report['seconds']['detect']:>10.2f}{report['total_seconds']:>9.2f}{report['samples_per_second']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmarks the batched sliding-window regression in `identify_exponential_decays`
+against the original one-`linregress`-per-window loop and checks that both give
+the same decay segments.
+
+Run from the repository root:
+
+    python benchmarks/bench_identification.py --hours 200000 --window-size 24
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.stats import linregress
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from identification import _smoothed_log_flux, identify_exponential_decays
+
+
+def identify_exponential_decays_loop(flux_data, time_data, window_size, slope_threshold, r_value_threshold):
+    """
+    Reference implementation: the original per-window loop.
+    """
+    log_flux_data = _smoothed_log_flux(flux_data)
+
+    decays = []
+    for i in range(len(log_flux_data) - window_size):
+        window = log_flux_data[i:i + window_size]
+        if np.isnan(window).any():
+            continue
+        slope, intercept, r_value, p_value, std_err = linregress(np.arange(window_size), window)
+        if slope < slope_threshold and abs(r_value) > r_value_threshold:
+            decays.append((time_data[i], time_data[i + window_size - 1]))
+
+    merged_decays = []
+    for start, end in decays:
+        if merged_decays and start <= merged_decays[-1][1] + (time_data[1] - time_data[0]):
+            merged_decays[-1] = (merged_decays[-1][0], max(merged_decays[-1][1], end))
+        else:
+            merged_decays.append((start, end))
+
+    return merged_decays
+
+
+def make_series(hours, seed=0):
+    """
+    Builds an hourly flux series with noise, repeated exponential decays and -999.9/zero gaps.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(hours)
+    flux = 10 ** (-2 + 0.05 * rng.standard_normal(hours))
+    # Inject an exponential decay every ~10 days
+    for onset in range(0, hours, 240):
+        length = min(120, hours - onset)
+        flux[onset:onset + length] *= 10 ** (2 - 0.02 * np.arange(length))
+    # Non-positive values become NaN before smoothing
+    flux[rng.random(hours) < 0.002] = 0
+    time_data = np.datetime64("1998-01-01T00:00", "ns") + t.astype("timedelta64[h]")
+    return flux, time_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=int, default=100000)
+    parser.add_argument("--window-size", type=int, default=24)
+    parser.add_argument("--slope-threshold", type=float, default=-0.005)
+    parser.add_argument("--r-value-threshold", type=float, default=0.5)
+    args = parser.parse_args()
+
+    flux, time_data = make_series(args.hours)
+    params = (args.window_size, args.slope_threshold, args.r_value_threshold)
+
+    start = time.perf_counter()
+    loop_segments = identify_exponential_decays_loop(flux, time_data, *params)
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched_segments = identify_exponential_decays(flux, time_data, *params)
+    batched_seconds = time.perf_counter() - start
+
+    same = [tuple(map(pd.Timestamp, s)) for s in loop_segments] == [tuple(map(pd.Timestamp, s)) for s in batched_segments]
+    print(f"samples: {args.hours}, window: {args.window_size}, segments: {len(batched_segments)}")
+    print(f"loop:    {loop_seconds:.3f} s")
+    print(f"batched: {batched_seconds:.3f} s  ({loop_seconds / batched_seconds:.0f}x faster)")
+    print(f"identical segments: {same}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
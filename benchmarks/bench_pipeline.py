@@ -0,0 +1,247 @@
+"""
+Benchmarks the pipeline stages on synthetic SIS data (see synthetic.py), reporting wall
+time and peak Python/NumPy memory (tracemalloc) per stage as the data length, element
+count and event count grow. Each dimension is swept on its own while the others stay at
+their first value.
+
+Results are written as JSON so runs can be compared; `--compare` prints the ratio of
+every stage against an earlier results file and flags slowdowns.
+
+Run from the repository root:
+
+    python benchmarks/bench_pipeline.py --hours 8760 35040 --elements 4 10 --events 10 40
+    python benchmarks/bench_pipeline.py --compare benchmarks/results/pipeline_20250101-120000.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flux_stats import compute_q1_thresholds
+from graph import create_interactive_plot_with_events, export_all_decay_events, plot_all_decay_events
+from identification import compute_decay_events_for_all_data, count_elements_decaying_in_window, identify_exponential_decays
+from load import load_all_sis_data
+from synthetic import DEFAULT_ELEMENTS, generate_sis_cube, write_sis_files
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# --compare reports a slowdown when a stage takes this much longer, both as a ratio and in
+# seconds (the absolute limit keeps timer noise on very short stages from being flagged)
+SLOWDOWN_RATIO = 1.2
+SLOWDOWN_SECONDS = 0.05
+
+DETECTION_PARAMS = {
+    "energy_level": 1,
+    "min_duration_hours": 48,
+    "window_size": 24,
+    "window_size_for_decay_count": 18,
+    "slope_threshold": -0.005,
+    "r_value_threshold": 0.5,
+}
+
+
+def measure(stage, repeat):
+    """
+    Runs a stage once under tracemalloc for its peak memory, then `repeat` times untraced for its time.
+
+    Returns:
+        float: Best wall time in seconds.
+        int: Peak traced memory in bytes.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        stage()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        seconds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            stage()
+            seconds.append(time.perf_counter() - start)
+    return min(seconds), peak_bytes
+
+
+def pipeline_stages(work_dir, hours, num_elements, num_events, seed):
+    """
+    Generates one synthetic dataset and returns the stages to measure on it.
+
+    Returns:
+        list: (stage name, zero-argument callable) pairs.
+    """
+    elements = DEFAULT_ELEMENTS[:num_elements] if num_elements <= len(DEFAULT_ELEMENTS) else \
+        DEFAULT_ELEMENTS + tuple(f"X{i}" for i in range(num_elements - len(DEFAULT_ELEMENTS)))
+    if "He" not in elements:
+        raise ValueError("--elements must be at least 2 so that He is included")
+    data_3d, datetime_values, element_mapping, events_df = generate_sis_cube(hours=hours, elements=elements, num_events=num_events, seed=seed)
+
+    data_dir = os.path.join(work_dir, "data")
+    cache_dir = os.path.join(work_dir, "cache")
+    write_sis_files(data_dir, data_3d, datetime_values, element_mapping)
+
+    energy_level = DETECTION_PARAMS["energy_level"]
+    he_flux = data_3d[energy_level - 1, :, element_mapping["He"]]
+    he_valid = he_flux != -999.9
+    he_threshold = compute_q1_thresholds(data_3d, element_mapping, energy_level)["He"]
+    event_starts = pd.DatetimeIndex(events_df["Peak Time"])
+    event_ends = pd.DatetimeIndex(events_df["End Time"])
+    # Catalog rows for the plotting stages, numbered like compute_decay_events_for_all_data's output
+    catalog = events_df.assign(**{"Event Number": np.arange(1, len(events_df) + 1)})
+
+    def load_cold():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        load_all_sis_data(data_dir, cache_dir=cache_dir, max_workers=1)
+
+    def load_warm():
+        load_all_sis_data(data_dir, cache_dir=cache_dir, max_workers=1)
+
+    def identify():
+        identify_exponential_decays(he_flux[he_valid], datetime_values[he_valid], DETECTION_PARAMS["window_size"],
+                                    DETECTION_PARAMS["slope_threshold"], DETECTION_PARAMS["r_value_threshold"])
+
+    def count_elements():
+        for start_time, end_time in zip(event_starts, event_ends):
+            count_elements_decaying_in_window(data_3d, datetime_values, element_mapping, energy_level, start_time, end_time,
+                                              DETECTION_PARAMS["window_size_for_decay_count"],
+                                              DETECTION_PARAMS["slope_threshold"], DETECTION_PARAMS["r_value_threshold"])
+
+    def compute_events():
+        compute_decay_events_for_all_data(data_3d, datetime_values, element_mapping, he_flux_threshold=he_threshold, **DETECTION_PARAMS)
+
+    def plot_all():
+        plot_all_decay_events(catalog, data_3d, datetime_values, element_mapping, energy_level, 1, True)
+        plt.close("all")
+
+    def export_pages():
+        shutil.rmtree(os.path.join(work_dir, "pages"), ignore_errors=True)
+        export_all_decay_events(catalog, data_3d, datetime_values, element_mapping, energy_level, 1, True,
+                                os.path.join(work_dir, "pages"), max_workers=1)
+
+    def interactive(**kwargs):
+        create_interactive_plot_with_events(data_3d, datetime_values, element_mapping, energy_level, datetime_values[0],
+                                            datetime_values[-1], os.path.join(work_dir, "plot.html"), catalog, show=False, **kwargs)
+
+    return [
+        ("load_all_sis_data[cold]", load_cold),
+        ("load_all_sis_data[warm]", load_warm),
+        ("identify_exponential_decays", identify),
+        ("count_elements_decaying_in_window", count_elements),
+        ("compute_decay_events_for_all_data", compute_events),
+        ("plot_all_decay_events", plot_all),
+        ("export_all_decay_events", export_pages),
+        ("create_interactive_plot_with_events", interactive),
+        ("create_interactive_plot_with_events[downsampled]", lambda: interactive(max_points_per_series=4000)),
+    ]
+
+
+def scale_configs(hours, elements, events):
+    """
+    Sweeps each dimension on its own, holding the others at their first value.
+
+    Returns:
+        list: Unique (hours, elements, events) tuples.
+    """
+    configs = [(h, elements[0], events[0]) for h in hours]
+    configs += [(hours[0], e, events[0]) for e in elements[1:]]
+    configs += [(hours[0], elements[0], n) for n in events[1:]]
+    return list(dict.fromkeys(configs))
+
+
+def run_metadata():
+    """
+    Describes the machine and code the results were measured on.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "matplotlib": matplotlib.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results, previous):
+    """
+    Prints the time and memory ratio of every stage and scale found in both runs.
+
+    Returns:
+        int: Number of stages that got slower by more than SLOWDOWN_RATIO.
+    """
+    key = lambda r: (r["stage"], r["hours"], r["elements"], r["events"])
+    old = {key(r): r for r in previous["results"]}
+    slowdowns = 0
+    print(f"\nCompared with {previous['metadata'].get('timestamp')} ({previous['metadata'].get('git_commit')}):")
+    for result in results:
+        if key(result) not in old:
+            continue
+        old_seconds = old[key(result)]["seconds"]
+        time_ratio = result["seconds"] / max(old_seconds, 1e-9)
+        memory_ratio = result["peak_bytes"] / max(old[key(result)]["peak_bytes"], 1)
+        slower = time_ratio > SLOWDOWN_RATIO and result["seconds"] - old_seconds > SLOWDOWN_SECONDS
+        flag = "  SLOWER" if slower else ""
+        slowdowns += bool(flag)
+        print(f"{result['stage']:<50}{result['hours']:>8}{result['elements']:>4}{result['events']:>5}"
+              f"  time x{time_ratio:5.2f}  memory x{memory_ratio:5.2f}{flag}")
+    return slowdowns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=int, nargs="+", default=[8760, 35040])
+    parser.add_argument("--elements", type=int, nargs="+", default=[4, 10])
+    parser.add_argument("--events", type=int, nargs="+", default=[10, 40])
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per stage, the best is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="results file, defaults to benchmarks/results/pipeline_<time>.json")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'stage':<50}{'hours':>8}{'elem':>5}{'events':>7}{'seconds':>10}{'peak MB':>9}")
+    for hours, num_elements, num_events in scale_configs(args.hours, args.elements, args.events):
+        with tempfile.TemporaryDirectory(prefix="sis_bench_") as work_dir:
+            for stage_name, stage in pipeline_stages(work_dir, hours, num_elements, num_events, args.seed):
+                seconds, peak_bytes = measure(stage, args.repeat)
+                results.append({"stage": stage_name, "hours": hours, "elements": num_elements, "events": num_events,
+                                "seconds": seconds, "peak_bytes": peak_bytes})
+                print(f"{stage_name:<50}{hours:>8}{num_elements:>5}{num_events:>7}{seconds:>10.3f}{peak_bytes / 2**20:>9.1f}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"metadata": run_metadata(), "results": results}, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            return 1 if compare(results, json.load(f)) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
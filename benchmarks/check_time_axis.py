@@ -0,0 +1,115 @@
+"""
+Checks the vectorized, leap-year aware time axis from `load_all_sis_data` against the
+original per-row conversion (`datetime(year) + frac * 365 days`).
+
+It compares the two time axes sample by sample and runs `compute_decay_events_for_all_data`
+on both, reporting how far event boundaries move. The old conversion used a fixed 365-day
+year, so in leap years it lags by up to one day towards December; those offsets are the
+intended correction and are reported separately. Outside leap years, every boundary must
+match to within the hourly cadence.
+
+Run from the repository root:
+
+    python benchmarks/check_time_axis.py flux_1998/
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from identification import compute_decay_events_for_all_data
+from load import fractional_year_to_datetime64, load_all_sis_data
+
+
+def legacy_time_axis(fp_year):
+    """
+    The original list-comprehension conversion, kept here for comparison.
+    """
+    return np.array([pd.Timestamp(datetime(year=int(fp), month=1, day=1) +
+                                  pd.Timedelta(days=(fp - int(fp)) * 365))
+                     for fp in fp_year])
+
+
+def event_boundaries(decay_events_df):
+    """
+    Rebuilds event start and end times from the catalog columns.
+    """
+    if len(decay_events_df) == 0:
+        return np.array([], dtype="datetime64[ns]"), np.array([], dtype="datetime64[ns]")
+    starts = pd.to_datetime(decay_events_df["Start Year"].astype(str) + "-01-01") + pd.to_timedelta(decay_events_df["Start Fractional Day"] - 1, unit="D")
+    ends = pd.to_datetime(decay_events_df["End Year"].astype(str) + "-01-01") + pd.to_timedelta(decay_events_df["End Fractional Day"] - 1, unit="D")
+    return starts.to_numpy(), ends.to_numpy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder_path")
+    parser.add_argument("--energy-level", type=int, default=1)
+    parser.add_argument("--min-duration-hours", type=int, default=48)
+    parser.add_argument("--window-size", type=int, default=24)
+    parser.add_argument("--window-size-for-decay-count", type=int, default=18)
+    parser.add_argument("--slope-threshold", type=float, default=-0.005)
+    parser.add_argument("--r-value-threshold", type=float, default=0.5)
+    args = parser.parse_args()
+
+    data_3d, datetime_values, element_mapping = load_all_sis_data(args.folder_path)
+    first_file = sorted(f for f in os.listdir(args.folder_path) if f.endswith(".txt"))[0]
+    fp_year = np.loadtxt(os.path.join(args.folder_path, first_file), skiprows=25, usecols=0)
+
+    start = time.perf_counter()
+    legacy_values = legacy_time_axis(fp_year)
+    legacy_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    vectorized_values = fractional_year_to_datetime64(fp_year)
+    vectorized_seconds = time.perf_counter() - start
+    print(f"conversion: legacy {legacy_seconds:.3f} s, vectorized {vectorized_seconds:.4f} s")
+
+    if not np.array_equal(vectorized_values, datetime_values):
+        print("load_all_sis_data time axis differs from fractional_year_to_datetime64 (stale cache?)")
+        return 1
+
+    years = np.floor(fp_year).astype(int)
+    leap_years = (years % 4 == 0) & ((years % 100 != 0) | (years % 400 == 0))
+    sample_offsets = np.abs(pd.DatetimeIndex(legacy_values).to_numpy() - vectorized_values) / np.timedelta64(1, "h")
+    print(f"sample offsets: non-leap max {sample_offsets[~leap_years].max(initial=0):.4f} h, "
+          f"leap max {sample_offsets[leap_years].max(initial=0):.2f} h")
+
+    # Q1-based helium threshold, as in preprocessing_1998.ipynb
+    he_flux = data_3d[args.energy_level - 1, :, element_mapping["He"]]
+    he_flux_threshold = 3 * np.percentile(he_flux[(he_flux != -999.9) & (he_flux != 0)], 25)
+
+    params = (element_mapping, args.energy_level, he_flux_threshold, args.min_duration_hours, args.window_size,
+              args.window_size_for_decay_count, args.slope_threshold, args.r_value_threshold)
+    legacy_events = compute_decay_events_for_all_data(data_3d, legacy_values, *params)
+    vectorized_events = compute_decay_events_for_all_data(data_3d, vectorized_values, *params)
+
+    if len(legacy_events) != len(vectorized_events) or (
+            len(legacy_events) and (legacy_events["Event Number"].to_numpy() != vectorized_events["Event Number"].to_numpy()).any()):
+        print(f"event lists differ: {len(legacy_events)} legacy vs {len(vectorized_events)} vectorized events")
+        return 1
+
+    legacy_starts, legacy_ends = event_boundaries(legacy_events)
+    starts, ends = event_boundaries(vectorized_events)
+    boundary_offsets = np.maximum(np.abs(legacy_starts - starts), np.abs(legacy_ends - ends)) / np.timedelta64(1, "h")
+    # An event is affected by the leap-year correction if either boundary falls in a leap year
+    leap_events = np.zeros(len(starts), dtype=bool)
+    for boundaries in (starts, ends):
+        event_years = pd.DatetimeIndex(boundaries).year.to_numpy()
+        leap_events |= (event_years % 4 == 0) & ((event_years % 100 != 0) | (event_years % 400 == 0))
+
+    non_leap_max = boundary_offsets[~leap_events].max(initial=0)
+    print(f"events: {len(starts)}, boundary offsets: non-leap max {non_leap_max:.4f} h, "
+          f"leap max {boundary_offsets[leap_events].max(initial=0):.2f} h")
+    ok = non_leap_max <= 1
+    print("compatible" if ok else "boundaries moved by more than the hourly cadence")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
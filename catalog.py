@@ -0,0 +1,384 @@
+import ast
+import re
+
+import numpy as np
+import pandas as pd
+
+from identification import event_times
+
+"""Decay event catalogs are passed around as DataFrames and saved as CSV, where
+element lists and window times end up as Python-repr strings that have to be
+parsed again on every load. `EventCatalog` keeps a catalog as typed columns
+instead: datetime64 start and end times, numeric and string columns as NumPy
+arrays, element lists as bitmasks over a fixed element vocabulary and window
+time tuples as datetime64 pairs. It is saved as a single uncompressed `.npz`
+file, so loading is a handful of array reads.
+
+Events are kept sorted by start time. Together with the running maximum of the
+end times this forms the interval index: the events overlapping a time range lie
+between two binary-search positions, and only that stretch is checked against
+the end times. Element and decay-type queries are vectorized comparisons on the
+bitmask and string columns.
+
+    catalog = EventCatalog.from_csv("transformed_data/classified_decay_events_98.csv", elements=list(element_mapping))
+    catalog.save("transformed_data/classified_decay_events_98.npz")
+    catalog = EventCatalog.load("transformed_data/classified_decay_events_98.npz")
+    may_1998 = catalog.overlapping("1998-05-01", "1998-06-01").of_type("Exponential Decay").decaying("Fe")
+    plot_all_decay_events(may_1998.to_dataframe(), cube, None, None, 1, 1, True)
+"""
+
+
+# Column kinds, stored alongside the columns so a loaded catalog knows how to rebuild them
+VALUE_COLUMN = "value"
+SET_COLUMN = "set"
+TIME_PAIR_COLUMN = "time_pair"
+
+# Bump when the layout of the saved arrays changes
+CATALOG_FORMAT_VERSION = 1
+
+# Kinds of the list and tuple columns the pipeline writes, for empty catalogs that have no value to inspect
+_KNOWN_COLUMN_KINDS = {
+    "Non-Decaying Elements": SET_COLUMN,
+    "Best Log-Y Window Times": TIME_PAIR_COLUMN,
+    "Best Log-Log Window Times": TIME_PAIR_COLUMN,
+}
+
+_TIMESTAMP_PATTERN = re.compile(r"Timestamp\('([^']*)'\)|None")
+
+
+class EventCatalog:
+    """
+    A decay event catalog stored as typed columns, sorted by start time.
+
+    Build one with `from_dataframe`, `from_csv` or `load` rather than directly.
+
+    Args:
+        start_times (numpy.ndarray): datetime64 start time of each event.
+        end_times (numpy.ndarray): datetime64 end time of each event.
+        columns (dict): Column name to array with one entry (row) per event, in column order.
+        column_kinds (dict): Column name to `VALUE_COLUMN`, `SET_COLUMN` (uint64 bitmask over
+            `elements`) or `TIME_PAIR_COLUMN` ((event, 2) datetime64 array, NaT for missing times).
+        elements (list): Element vocabulary of the bitmask columns; bit i stands for elements[i].
+    """
+
+    def __init__(self, start_times, end_times, columns=None, column_kinds=None, elements=()):
+        start_times = np.asarray(start_times, dtype="datetime64[ns]")
+        end_times = np.asarray(end_times, dtype="datetime64[ns]")
+        columns = dict(columns or {})
+        if len(elements) > 64:
+            raise ValueError(f"At most 64 elements fit in a bitmask, got {len(elements)}")
+
+        # Sort by start time (stably, so events starting together keep their order)
+        order = np.argsort(start_times, kind="stable")
+        if np.any(order[1:] < order[:-1]):
+            start_times, end_times = start_times[order], end_times[order]
+            columns = {name: values[order] for name, values in columns.items()}
+
+        self.start_times = start_times
+        self.end_times = end_times
+        self.columns = columns
+        self.column_kinds = {name: (column_kinds or {}).get(name, VALUE_COLUMN) for name in columns}
+        self.elements = list(elements)
+        # Interval index: the latest end among the events up to each position, non-decreasing
+        self._max_end_times = np.maximum.accumulate(end_times) if len(end_times) else end_times
+
+    def __len__(self):
+        return len(self.start_times)
+
+    def __repr__(self):
+        if len(self) == 0:
+            return "EventCatalog(0 events)"
+        return f"EventCatalog({len(self)} events, {self.start_times[0]} to {self._max_end_times[-1]})"
+
+    @classmethod
+    def from_dataframe(cls, decay_events_df, elements=None):
+        """
+        Converts a catalog DataFrame, e.g. from `compute_decay_events_for_all_data` or `classify_decay_events`.
+
+        Event times come from "Start Time"/"End Time" columns if present, otherwise from the
+        year and fractional-day columns (see `event_times`). Columns holding lists of element
+        names (or their string repr, as read back from CSV) become bitmask columns, and columns
+        holding (start, end) Timestamp tuples (or their repr) become datetime64 pair columns.
+
+        An empty catalog, including the DataFrame without columns that `compute_decay_events_for_all_data`
+        returns when it finds nothing, becomes a zero-length catalog with empty typed columns.
+
+        Args:
+            decay_events_df (pd.DataFrame): The decay event catalog.
+            elements (list): Element vocabulary for the bitmask columns, e.g. `list(element_mapping)`.
+                Defaults to the element names found in the list columns, in first-seen order, which
+                leaves out elements that never appear in any list.
+
+        Returns:
+            EventCatalog: The catalog, sorted by start time.
+        """
+        if len(decay_events_df) == 0:
+            start_times = end_times = np.empty(0, dtype="datetime64[ns]")
+        elif "Start Time" in decay_events_df and "End Time" in decay_events_df:
+            start_times = pd.DatetimeIndex(decay_events_df["Start Time"]).to_numpy(dtype="datetime64[ns]")
+            end_times = pd.DatetimeIndex(decay_events_df["End Time"]).to_numpy(dtype="datetime64[ns]")
+        else:
+            start_times, end_times = event_times(decay_events_df)
+
+        parsed = {}
+        column_kinds = {}
+        vocabulary = list(elements) if elements is not None else []
+        for name in decay_events_df.columns:
+            values = decay_events_df[name]
+            kind = _column_kind(values, name)
+            if kind == SET_COLUMN:
+                parsed[name] = [_parse_element_list(value) for value in values]
+                if elements is None:
+                    for element_names in parsed[name]:
+                        vocabulary.extend(element_name for element_name in element_names if element_name not in vocabulary)
+            elif kind == TIME_PAIR_COLUMN:
+                parsed[name] = np.array([_parse_time_pair(value) for value in values], dtype="datetime64[ns]").reshape(-1, 2)
+            elif pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+                parsed[name] = np.array(values.astype(str).tolist(), dtype=str)
+            elif pd.api.types.is_datetime64_any_dtype(values):
+                parsed[name] = pd.DatetimeIndex(values).to_numpy(dtype="datetime64[ns]")
+            else:
+                parsed[name] = values.to_numpy()
+            column_kinds[name] = kind
+
+        bits = {element_name: np.uint64(1) << np.uint64(i) for i, element_name in enumerate(vocabulary)}
+        for name, kind in column_kinds.items():
+            if kind == SET_COLUMN:
+                masks = np.zeros(len(decay_events_df), dtype=np.uint64)
+                for event, element_names in enumerate(parsed[name]):
+                    for element_name in element_names:
+                        if element_name not in bits:
+                            raise ValueError(f"Element {element_name!r} in column {name!r} is not in `elements`")
+                        masks[event] |= bits[element_name]
+                parsed[name] = masks
+
+        return cls(start_times, end_times, parsed, column_kinds, vocabulary)
+
+    @classmethod
+    def from_csv(cls, path, elements=None):
+        """
+        Reads a catalog CSV written with `DataFrame.to_csv`, parsing its repr cells once.
+
+        Args:
+            path (str): The CSV file.
+            elements (list): Element vocabulary, see `from_dataframe`.
+
+        Returns:
+            EventCatalog: The catalog, sorted by start time.
+        """
+        return cls.from_dataframe(pd.read_csv(path), elements)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a catalog saved with `save`.
+
+        Args:
+            path (str): The `.npz` file.
+
+        Returns:
+            EventCatalog: The catalog.
+        """
+        with np.load(path, allow_pickle=False) as saved:
+            if int(saved["format_version"]) != CATALOG_FORMAT_VERSION:
+                raise ValueError(f"{path} has catalog format {int(saved['format_version'])}, expected {CATALOG_FORMAT_VERSION}")
+            names = saved["column_names"].tolist()
+            kinds = saved["column_kinds"].tolist()
+            columns = {name: saved[f"column_{i}"] for i, name in enumerate(names)}
+            return cls(saved["start_times"], saved["end_times"], columns, dict(zip(names, kinds)), saved["elements"].tolist())
+
+    def save(self, path):
+        """
+        Saves the catalog as an uncompressed `.npz` file, without pickled objects.
+
+        Args:
+            path (str): The file to write; NumPy appends `.npz` if it is missing.
+        """
+        names = list(self.columns)
+        np.savez(
+            path,
+            format_version=np.array(CATALOG_FORMAT_VERSION),
+            start_times=self.start_times,
+            end_times=self.end_times,
+            elements=np.array(self.elements, dtype=str),
+            column_names=np.array(names, dtype=str),
+            column_kinds=np.array([self.column_kinds[name] for name in names], dtype=str),
+            **{f"column_{i}": self.columns[name] for i, name in enumerate(names)},
+        )
+
+    def to_dataframe(self, include_times=False):
+        """
+        Converts the catalog back to the DataFrame layout the rest of the pipeline uses.
+
+        Bitmask columns become lists of element names (in vocabulary order) and time pair
+        columns become (start, end) Timestamp tuples, (None, None) where missing.
+
+        Args:
+            include_times (bool): Whether to add "Start Time" and "End Time" columns if they are not columns already.
+
+        Returns:
+            pd.DataFrame: One row per event, sorted by start time.
+        """
+        data = {}
+        for name, values in self.columns.items():
+            kind = self.column_kinds[name]
+            if kind == SET_COLUMN:
+                data[name] = [self._element_names(mask) for mask in values]
+            elif kind == TIME_PAIR_COLUMN:
+                data[name] = [tuple(None if np.isnat(time) else pd.Timestamp(time) for time in pair) for pair in values]
+            else:
+                data[name] = values
+        decay_events_df = pd.DataFrame(data, columns=list(self.columns))
+        if include_times:
+            if "Start Time" not in decay_events_df:
+                decay_events_df["Start Time"] = self.start_times
+            if "End Time" not in decay_events_df:
+                decay_events_df["End Time"] = self.end_times
+        return decay_events_df
+
+    def take(self, indices):
+        """
+        Selects events by position.
+
+        Args:
+            indices (numpy.ndarray): Positions (or a boolean mask) of the events to keep.
+
+        Returns:
+            EventCatalog: The selected events, still sorted by start time if `indices` is sorted.
+        """
+        return EventCatalog(
+            self.start_times[indices], self.end_times[indices],
+            {name: values[indices] for name, values in self.columns.items()}, self.column_kinds, self.elements,
+        )
+
+    def overlap_indices(self, start_time, end_time):
+        """
+        Finds the events that overlap a time range, using the interval index.
+
+        Args:
+            start_time (pd.Timestamp): Start of the range (inclusive).
+            end_time (pd.Timestamp): End of the range (inclusive).
+
+        Returns:
+            numpy.ndarray: Sorted positions of the events with start <= end_time and end >= start_time.
+        """
+        start_time = pd.Timestamp(start_time).to_datetime64()
+        end_time = pd.Timestamp(end_time).to_datetime64()
+        # Events past `last` start after the range; events before `first` (and every event
+        # before them) end before it
+        first = np.searchsorted(self._max_end_times, start_time, side="left")
+        last = np.searchsorted(self.start_times, end_time, side="right")
+        candidates = np.arange(first, max(first, last))
+        return candidates[self.end_times[candidates] >= start_time]
+
+    def overlapping(self, start_time, end_time):
+        """
+        Returns:
+            EventCatalog: The events that overlap [start_time, end_time].
+        """
+        return self.take(self.overlap_indices(start_time, end_time))
+
+    def within(self, start_time, end_time):
+        """
+        Returns:
+            EventCatalog: The events that lie entirely inside [start_time, end_time].
+        """
+        start_time = pd.Timestamp(start_time).to_datetime64()
+        end_time = pd.Timestamp(end_time).to_datetime64()
+        first = np.searchsorted(self.start_times, start_time, side="left")
+        last = np.searchsorted(self.start_times, end_time, side="right")
+        candidates = np.arange(first, max(first, last))
+        return self.take(candidates[self.end_times[candidates] <= end_time])
+
+    def containing(self, time):
+        """
+        Returns:
+            EventCatalog: The events in progress at `time`.
+        """
+        return self.overlapping(time, time)
+
+    def element_mask(self, element_name, column="Non-Decaying Elements"):
+        """
+        Flags the events whose element set in `column` contains an element.
+
+        Args:
+            element_name (str): The element to look for.
+            column (str): A bitmask column.
+
+        Returns:
+            numpy.ndarray: Boolean array with one entry per event.
+        """
+        if self.column_kinds.get(column) != SET_COLUMN:
+            raise KeyError(f"{column!r} is not an element set column")
+        if element_name not in self.elements:
+            raise KeyError(f"{element_name!r} is not in the catalog's element vocabulary {self.elements}")
+        bit = np.uint64(1) << np.uint64(self.elements.index(element_name))
+        return (self.columns[column] & bit) != 0
+
+    def with_element(self, element_name, column="Non-Decaying Elements"):
+        """
+        Returns:
+            EventCatalog: The events whose element set in `column` contains `element_name`.
+        """
+        return self.take(self.element_mask(element_name, column))
+
+    def decaying(self, element_name):
+        """
+        Selects the events in which an element decays, i.e. is not among the "Non-Decaying Elements".
+
+        The answer is only meaningful for elements in the vocabulary, so build the catalog with
+        `elements` set to every element of the cube.
+
+        Returns:
+            EventCatalog: The events in which `element_name` decays.
+        """
+        return self.take(~self.element_mask(element_name))
+
+    def of_type(self, *decay_types):
+        """
+        Returns:
+            EventCatalog: The events whose "Decay Type" is one of `decay_types`.
+        """
+        if "Decay Type" not in self.columns:
+            raise KeyError("The catalog has no 'Decay Type' column; see classify_decay_events")
+        return self.take(np.isin(self.columns["Decay Type"], decay_types))
+
+    def _element_names(self, mask):
+        return [element_name for i, element_name in enumerate(self.elements) if int(mask) >> i & 1]
+
+
+def _column_kind(values, name):
+    """
+    Guesses whether an object column holds element lists, Timestamp pairs or plain values.
+    """
+    if not (pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)):
+        return VALUE_COLUMN
+    sample = values.dropna()
+    if len(sample) == 0:
+        return _KNOWN_COLUMN_KINDS.get(name, VALUE_COLUMN)
+    first = sample.iloc[0]
+    if isinstance(first, (list, set, frozenset)) or (isinstance(first, str) and first.startswith("[")):
+        return SET_COLUMN
+    if isinstance(first, tuple) and len(first) == 2 and all(value is None or isinstance(value, pd.Timestamp) for value in first):
+        return TIME_PAIR_COLUMN
+    if isinstance(first, str) and (first.startswith("(Timestamp(") or first == "(None, None)"):
+        return TIME_PAIR_COLUMN
+    return VALUE_COLUMN
+
+
+def _parse_element_list(value):
+    if isinstance(value, str):
+        return ast.literal_eval(value)
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return []
+    return list(value)
+
+
+def _parse_time_pair(value):
+    if isinstance(value, str):
+        times = [match.group(1) for match in _TIMESTAMP_PATTERN.finditer(value)]
+    elif value is None or (isinstance(value, float) and np.isnan(value)):
+        times = [None, None]
+    else:
+        times = list(value)
+    return [np.datetime64("NaT", "ns") if time is None else pd.Timestamp(time).to_datetime64() for time in times]
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+
+from cube import as_cube
+from event_windows import EventWindows
+
+"""The classifier below labels each cataloged decay as exponential, power-law or
+irregular. An exponential decay is a straight line in log flux against time
+(log-y space), a power law a straight line in log flux against log time since
+onset (log-log space). For every event the Pearson r of every contiguous
+sub-window of at least `min_window_hours` is computed in both spaces from
+prefix sums of x, y, x², y² and xy, as whole (start, stop) matrices, so each
+window costs a handful of arithmetic operations instead of a regression fit.
+The most negative r of each space decides the type."""
+
+
+DECAY_TYPES = ("Exponential Decay", "Power-Law Decay", "Irregular Decay")
+
+CLASSIFICATION_COLUMNS = (
+    "Decay Type",
+    "Best Log-Y R-value",
+    "Best Log-Log R-value",
+    "Best Log-Y Window Times",
+    "Best Log-Log Window Times",
+)
+
+
+def best_decay_windows(flux_values, time_hours, min_window_hours):
+    """
+    Finds the sub-window of one event's flux that decays most linearly in log-y and in log-log space.
+
+    Windows are ranked by signed r² (r·|r|), which orders them like r without a square
+    root per window; only the r of the two winning windows is computed.
+
+    Args:
+        flux_values (numpy.ndarray): Positive flux values of the event.
+        time_hours (numpy.ndarray): Their times in hours since the event start.
+        min_window_hours (float): Shortest window span considered.
+
+    Returns:
+        numpy.ndarray: Best (most negative) r in log-y and log-log space, 0 without a candidate window.
+        list: (first, last) sample index of each best window, None without a candidate window.
+    """
+    best_r = np.zeros(2)
+    best_windows = [None, None]
+    num_samples = len(flux_values)
+    if num_samples < 3:
+        return best_r, best_windows
+
+    # Only starts that leave room for a full window and stops that end one can be candidates,
+    # so work on that rectangle of [first, stop) pairs
+    last_first = np.searchsorted(time_hours, time_hours[-1] - min_window_hours, side="right") - 1
+    first_stop = np.searchsorted(time_hours, time_hours[0] + min_window_hours, side="left") + 1
+    if last_first < 0 or first_stop > num_samples:
+        return best_r, best_windows
+    first = np.arange(last_first + 1)[:, None]
+    stop = np.arange(first_stop, num_samples + 1)[None, :]
+    candidate = (stop - first >= 3) & (time_hours[stop - 1] - time_hours[first] >= min_window_hours)
+    if not candidate.any():
+        return best_r, best_windows
+    inverse_count = 1 / np.maximum(stop - first, 1)
+
+    def window_sums(values):
+        prefix = np.concatenate(([0], np.cumsum(values)))
+        return prefix[first_stop:][None, :] - prefix[:last_first + 1][:, None]
+
+    # Centred on the mean so the prefix-sum differences keep their precision
+    log_flux = np.log10(flux_values)
+    y_values = log_flux - log_flux.mean()
+    sum_y = window_sums(y_values)
+    ssym = window_sums(y_values * y_values) - sum_y * sum_y * inverse_count
+    # Flat windows leave rounding noise instead of an exact zero; treat them as having no spread
+    ssym[ssym < 1e-12] = 0
+
+    for space, x_values in enumerate((time_hours, np.log10(time_hours + 1))):
+        x_values = x_values - x_values.mean()
+        sum_x = window_sums(x_values)
+        ssxm = window_sums(x_values * x_values) - sum_x * sum_x * inverse_count
+        ssxym = window_sums(x_values * y_values) - sum_x * sum_y * inverse_count
+
+        denominator = ssxm * ssym
+        usable = candidate & (denominator > 0)
+        if not usable.any():
+            continue
+        with np.errstate(divide="ignore", invalid="ignore"):
+            signed_r_squared = np.where(usable, ssxym * np.abs(ssxym) / denominator, np.inf)
+        a, b = np.unravel_index(np.argmin(signed_r_squared), signed_r_squared.shape)
+        best_r[space] = np.clip(ssxym[a, b] / np.sqrt(denominator[a, b]), -1, 1)
+        best_windows[space] = (int(a), int(first_stop + b - 1))
+    return best_r, best_windows
+
+
+def classify_decay_events(decay_events_df, data_3d, datetime_values, element_mapping, energy_level, element_name="He",
+                          min_window_hours=48, r_value_threshold=0.9):
+    """
+    Adds decay type columns to a decay event catalog.
+
+    A decay is exponential when its best log-y window correlates more strongly than its
+    best log-log window and |r| exceeds `r_value_threshold`, power-law in the opposite
+    case, and irregular when neither window reaches the threshold. Log-log space uses
+    log10(hours since the event start + 1) as x.
+
+    Args:
+        decay_events_df (pd.DataFrame): Decay events from `compute_decay_events_for_all_data`.
+        data_3d (numpy.ndarray or SISCube): The 3D data cube (energy, time, element).
+        datetime_values (numpy.ndarray): Array of datetime64 values (None if `data_3d` is a SISCube).
+        element_mapping (dict): Element name to array index mapping (None if `data_3d` is a SISCube).
+        energy_level (int): The energy level to analyze.
+        element_name (str): The element whose flux is classified.
+        min_window_hours (float): Shortest sub-window considered, in hours.
+        r_value_threshold (float): Minimum |r| of the best window for a decay to be exponential or power-law.
+
+    Returns:
+        pd.DataFrame: A copy of `decay_events_df` with the columns in `CLASSIFICATION_COLUMNS`. The window
+            times are (start, end) tuples of pd.Timestamp, (None, None) when the event has no candidate window.
+    """
+    cube = as_cube(data_3d, datetime_values, element_mapping)
+    event_windows = EventWindows.from_catalog(decay_events_df, cube, energy_levels=[energy_level], elements=[element_name])
+    flux, times, starts, stops = event_windows.element_series(energy_level, element_name)
+
+    decay_types, best_r_values, best_window_times = [], [], []
+    for event in range(len(decay_events_df)):
+        event_flux = flux[starts[event]:stops[event]]
+        # Non-positive values cannot be log-transformed; the -999.9 fill values are already left out
+        valid = event_flux > 0
+        event_times = times[starts[event]:stops[event]][valid]
+        time_hours = (event_times - event_windows.start_times[event]) / np.timedelta64(1, "h")
+
+        best_r, best_windows = best_decay_windows(event_flux[valid], time_hours, min_window_hours)
+        best_r_values.append(best_r)
+        best_window_times.append([
+            (pd.Timestamp(event_times[window[0]]), pd.Timestamp(event_times[window[1]])) if window is not None else (None, None)
+            for window in best_windows
+        ])
+
+        log_y_r, log_log_r = best_r
+        if min(log_y_r, log_log_r) > -r_value_threshold:
+            decay_types.append("Irregular Decay")
+        elif log_y_r < log_log_r:
+            decay_types.append("Exponential Decay")
+        else:
+            decay_types.append("Power-Law Decay")
+
+    best_r_values = np.array(best_r_values).reshape(-1, 2)
+    classified_df = decay_events_df.copy()
+    classified_df["Decay Type"] = decay_types
+    classified_df["Best Log-Y R-value"] = best_r_values[:, 0]
+    classified_df["Best Log-Log R-value"] = best_r_values[:, 1]
+    classified_df["Best Log-Y Window Times"] = [window_times[0] for window_times in best_window_times]
+    classified_df["Best Log-Log Window Times"] = [window_times[1] for window_times in best_window_times]
+    return classified_df
@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+from load import load_all_sis_data
+
+
+class SISCube:
+    """
+    A time-indexed SIS data cube.
+
+    Wraps the (energy, time, element) flux array returned by `load_all_sis_data` together
+    with its sorted time axis, the element mapping and a validity mask (`flux != -999.9`).
+    Time ranges are located with binary search on the time axis, and `window` returns a
+    cube over a time range that shares memory with this one, so per-event work scales
+    with the length of the event rather than the length of the mission.
+
+    Every function in `identification.py` and `graph.py` that takes
+    `data_3d, datetime_values, element_mapping` also accepts a cube as `data_3d`, in
+    which case `datetime_values` and `element_mapping` can be passed as None.
+
+    Args:
+        data_3d (numpy.ndarray): The 3D data cube (energy, time, element).
+        datetime_values (numpy.ndarray): Sorted array of datetime64 values.
+        element_mapping (dict): Element name to array index mapping.
+        valid_mask (numpy.ndarray): Optional precomputed validity mask.
+        smoothed_log_flux (dict): Optional precomputed results of `smoothed_log_flux`,
+            keyed by (energy_level, element_name).
+    """
+
+    def __init__(self, data_3d, datetime_values, element_mapping, valid_mask=None, smoothed_log_flux=None):
+        datetime_values = np.asarray(datetime_values)
+        if datetime_values.dtype != np.dtype("datetime64[ns]"):
+            datetime_values = pd.DatetimeIndex(datetime_values).to_numpy(dtype="datetime64[ns]")
+
+        self.data_3d = data_3d
+        self.datetime_values = datetime_values
+        self.element_mapping = element_mapping
+        self._valid_mask = valid_mask
+        self._smoothed_log_flux = dict(smoothed_log_flux or {})
+
+    @classmethod
+    def from_folder(cls, folder_path, **kwargs):
+        """
+        Loads a folder of SIS data files into a cube.
+
+        Args:
+            folder_path (str): The path to the folder containing the SIS data files.
+            **kwargs: Passed on to `load_all_sis_data`.
+
+        Returns:
+            SISCube: The loaded cube.
+        """
+        return cls(*load_all_sis_data(folder_path, **kwargs))
+
+    @property
+    def valid_mask(self):
+        """
+        numpy.ndarray: Boolean (energy, time, element) array, False where the flux is -999.9.
+        Computed on first use and kept for the lifetime of the cube.
+        """
+        if self._valid_mask is None:
+            self._valid_mask = self.data_3d != -999.9
+        return self._valid_mask
+
+    def __len__(self):
+        return len(self.datetime_values)
+
+    def time_slice(self, start_time, end_time):
+        """
+        Finds the samples between two times with binary search.
+
+        Args:
+            start_time (pd.Timestamp): Start of the range (inclusive).
+            end_time (pd.Timestamp): End of the range (inclusive).
+
+        Returns:
+            slice: The index range of the samples inside [start_time, end_time].
+        """
+        first_index = np.searchsorted(self.datetime_values, pd.Timestamp(start_time).to_datetime64(), side="left")
+        last_index = np.searchsorted(self.datetime_values, pd.Timestamp(end_time).to_datetime64(), side="right")
+        return slice(first_index, max(first_index, last_index))
+
+    def window(self, start_time, end_time):
+        """
+        Returns the part of the cube between two times without copying it.
+
+        Args:
+            start_time (pd.Timestamp): Start of the range (inclusive).
+            end_time (pd.Timestamp): End of the range (inclusive).
+
+        Returns:
+            SISCube: A cube whose arrays are views into this one.
+        """
+        time_slice = self.time_slice(start_time, end_time)
+        valid_mask = self._valid_mask[:, time_slice, :] if self._valid_mask is not None else None
+        return SISCube(self.data_3d[:, time_slice, :], self.datetime_values[time_slice], self.element_mapping, valid_mask)
+
+    def valid_series(self, energy_level, element_name):
+        """
+        Extracts one element's valid flux values and their times.
+
+        Args:
+            energy_level (int): The energy level (starting at 1).
+            element_name (str): The element name.
+
+        Returns:
+            numpy.ndarray: Flux values with the -999.9 entries removed.
+            numpy.ndarray: The corresponding datetime64 values.
+        """
+        element_index = self.element_mapping[element_name]
+        valid_data_mask = self.valid_mask[energy_level - 1, :, element_index]
+        return self.data_3d[energy_level - 1, :, element_index][valid_data_mask], self.datetime_values[valid_data_mask]
+
+    def smoothed_log_flux(self, energy_level, element_name, cache=True):
+        """
+        Log-transforms and smooths one element's valid flux series, as the decay detection does.
+
+        The result does not depend on any detection parameter, so it is kept on the cube and
+        reused by later calls.
+
+        Args:
+            energy_level (int): The energy level (starting at 1).
+            element_name (str): The element name.
+            cache (bool): Whether to keep a newly computed result on the cube.
+
+        Returns:
+            numpy.ndarray: Smoothed log10 flux, one value per entry of `valid_series`.
+        """
+        key = (energy_level, element_name)
+        if key in self._smoothed_log_flux:
+            return self._smoothed_log_flux[key]
+
+        # Imported here because identification.py imports this module
+        from identification import _smoothed_log_flux
+
+        log_flux_data = _smoothed_log_flux(self.valid_series(energy_level, element_name)[0])
+        if cache:
+            self._smoothed_log_flux[key] = log_flux_data
+        return log_flux_data
+
+
+def as_cube(data_3d, datetime_values=None, element_mapping=None):
+    """
+    Returns `data_3d` if it already is a cube, otherwise wraps the three arrays in one.
+
+    Args:
+        data_3d (numpy.ndarray or SISCube): The 3D data cube (energy, time, element) or a cube.
+        datetime_values (numpy.ndarray): Array of datetime64 values, ignored for a cube.
+        element_mapping (dict): Element name to array index mapping, ignored for a cube.
+
+    Returns:
+        SISCube: The cube.
+    """
+    if isinstance(data_3d, SISCube):
+        return data_3d
+    return SISCube(data_3d, datetime_values, element_mapping)
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+from cube import as_cube
+from event_windows import EventWindows
+from parallel import bounded_map, resolve_max_workers
+
+"""Charge states are inferred from how the e-folding time of a decay changes with
+energy. The fit below is an ordinary least-squares line through ln(flux) against
+time for every event, element and energy channel: tau = -1 / slope, with its
+standard error propagated from the slope's. Instead of one fit per series, the
+event windows are extracted once with `EventWindows`, where every (energy,
+element) series of all events is one contiguous ragged block. The regression sums
+of every (series, event) segment of a chunk of series are taken with
+`np.add.reduceat`, so the whole chunk is fitted at once. Chunks are spread over a
+process pool."""
+
+
+FIT_COLUMNS = (
+    "Event",
+    "Element",
+    "Energy Level",
+    "Samples",
+    "Slope",
+    "Decay Time",
+    "Decay Time Error",
+    "R-value",
+)
+
+# Upper limit on the number of flux values fitted per chunk
+MAX_VALUES_PER_CHUNK = 4_000_000
+
+
+def fit_decay_constants(decay_events_df, data_3d, datetime_values, element_mapping, energy_levels=None, elements=None,
+                        max_workers=None):
+    """
+    Fits the e-folding time of every event, element and energy channel in a catalog.
+
+    Args:
+        decay_events_df (pd.DataFrame): Decay events from `compute_decay_events_for_all_data`.
+        data_3d (numpy.ndarray or SISCube): The 3D data cube (energy, time, element).
+        datetime_values (numpy.ndarray): Array of datetime64 values (None if `data_3d` is a SISCube).
+        element_mapping (dict): Element name to array index mapping (None if `data_3d` is a SISCube).
+        energy_levels (list): Energy levels to fit (starting at 1), defaults to all channels in the cube.
+        elements (list): Elements to fit, defaults to all elements in cube order.
+        max_workers (int): Number of worker processes. Defaults to one per CPU, 1 runs in the current process.
+
+    Returns:
+        pd.DataFrame: One row per event, element and energy level with the columns in `FIT_COLUMNS`.
+            "Event" is the catalog's "Event Number" (or the row position counted from 1, as in graph.py),
+            "Slope" is in ln(flux) per hour, and "Decay Time" and "Decay Time Error" are in hours.
+            Fits with fewer than three valid samples, or a slope that is not negative, have NaN decay times.
+    """
+    cube = as_cube(data_3d, datetime_values, element_mapping)
+    if energy_levels is None:
+        energy_levels = list(range(1, cube.data_3d.shape[0] + 1))
+    if elements is None:
+        elements = sorted(cube.element_mapping, key=cube.element_mapping.get)
+
+    num_events = len(decay_events_df)
+    event_windows = EventWindows.from_catalog(decay_events_df, cube, energy_levels=energy_levels, elements=elements)
+    # The series follow each other in (energy level, element) order, with their events back to back
+    series_offsets = event_windows.offsets.reshape(-1, num_events + 1)
+    num_series = len(series_offsets)
+
+    # Group consecutive series into chunks of a bounded number of values
+    chunk_bounds = [0]
+    for series in range(1, num_series):
+        if series_offsets[series, -1] - series_offsets[chunk_bounds[-1], 0] > MAX_VALUES_PER_CHUNK:
+            chunk_bounds.append(series)
+    chunk_bounds.append(num_series)
+
+    def gathered_chunks():
+        for chunk_start, chunk_end in zip(chunk_bounds[:-1], chunk_bounds[1:]):
+            block = slice(series_offsets[chunk_start, 0], series_offsets[chunk_end - 1, -1])
+            lengths = np.diff(series_offsets[chunk_start:chunk_end], axis=1).ravel()
+            event_of_sample = np.repeat(np.tile(np.arange(num_events), chunk_end - chunk_start), lengths)
+            time_hours = (event_windows.times[block] - event_windows.start_times[event_of_sample]) / np.timedelta64(1, "h")
+            yield event_windows.flux[block], time_hours, lengths
+
+    max_workers = resolve_max_workers(max_workers, len(chunk_bounds) - 1)
+    results = list(bounded_map(_fit_chunk, gathered_chunks(), max_workers)) if num_events else []
+
+    # (energy, element, event, quantity) to (event, quantity, energy, element)
+    fits = np.concatenate(results) if results else np.empty((0, 5))
+    fits = fits.reshape(len(energy_levels), len(elements), num_events, 5).transpose(2, 3, 0, 1)
+
+    # Tidy table: one row per (event, energy level, element)
+    event_numbers = decay_events_df["Event Number"].to_numpy() if "Event Number" in decay_events_df else np.arange(1, num_events + 1)
+    grid_event, grid_energy, grid_element = np.meshgrid(
+        np.arange(num_events), np.arange(len(energy_levels)), np.arange(len(elements)), indexing="ij"
+    )
+    samples, slope, decay_time, decay_time_error, r_value = (fits[:, quantity].ravel() for quantity in range(5))
+    return pd.DataFrame({
+        "Event": event_numbers[grid_event.ravel()],
+        "Element": np.asarray(elements, dtype=object)[grid_element.ravel()],
+        "Energy Level": np.asarray(energy_levels)[grid_energy.ravel()],
+        "Samples": samples.astype(int),
+        "Slope": slope,
+        "Decay Time": decay_time,
+        "Decay Time Error": decay_time_error,
+        "R-value": r_value,
+    }, columns=list(FIT_COLUMNS))
+
+
+def _fit_chunk(flux, time_hours, lengths):
+    """
+    Least-squares fits ln(flux) against time for every series segment of a chunk at once.
+
+    Args:
+        flux (numpy.ndarray): The chunk's flux values, one (series, event) segment after the other.
+        time_hours (numpy.ndarray): Hours since the start of the sample's event.
+        lengths (numpy.ndarray): Number of samples of each segment.
+
+    Returns:
+        numpy.ndarray: Array (segment, quantity) with the quantities samples, slope, decay time,
+            decay time error and r-value.
+    """
+    # Non-positive flux drops out of every sum through the weight
+    valid = flux > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_flux = np.where(valid, np.log(np.where(valid, flux, 1)), 0)
+    weight = valid.astype(float)
+    x_values = time_hours * weight
+
+    # np.add.reduceat returns the element at the offset for empty segments, so sum those as zero
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    nonempty = lengths > 0
+
+    def event_sums(values):
+        sums = np.zeros(len(lengths))
+        if nonempty.any():
+            sums[nonempty] = np.add.reduceat(values, offsets[nonempty])
+        return sums
+
+    count = event_sums(weight)
+    sum_x = event_sums(x_values)
+    sum_y = event_sums(log_flux)
+    sum_xx = event_sums(x_values * x_values)
+    sum_xy = event_sums(x_values * log_flux)
+    sum_yy = event_sums(log_flux * log_flux)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ssxm = sum_xx - sum_x * sum_x / count
+        ssym = sum_yy - sum_y * sum_y / count
+        ssxym = sum_xy - sum_x * sum_y / count
+        slope = ssxym / ssxm
+        r_value = np.clip(ssxym / np.sqrt(ssxm * ssym), -1, 1)
+        # Standard error of the slope from the residual variance with n - 2 degrees of freedom
+        residual_variance = np.maximum(ssym - slope * ssxym, 0) / (count - 2)
+        slope_error = np.sqrt(residual_variance / ssxm)
+        decay_time = -1 / slope
+        decay_time_error = slope_error / slope ** 2
+
+    fitted = (count >= 3) & (ssxm > 0)
+    slope[~fitted] = np.nan
+    r_value[~(fitted & (ssym > 0))] = np.nan
+    decaying = fitted & (slope < 0)
+    decay_time[~decaying] = np.nan
+    decay_time_error[~decaying] = np.nan
+    return np.stack((count, slope, decay_time, decay_time_error, r_value), axis=1)
@@ -0,0 +1,181 @@
+import warnings
+
+import numpy as np
+
+from cube import as_cube
+from event_windows import EventWindows
+
+"""DMDT (Δt–ΔF) mappings turn a decay event into a 2D histogram of the time and
+flux differences between every pair of its samples (see README.md). For an event
+of n samples there are n(n-1)/2 pairs. The samples of every event and element
+are extracted once with `EventWindows`, and all (element, event) series of the
+energy level are handled as one ragged flat array. Each series is normalized
+with `reduceat` over its segment, and the NaN samples are dropped. The pairs of
+a chunk of series are then expanded at once, and only the pairs inside the ΔF
+range, a small fraction, are binned further. A single offset `np.bincount`
+fills the histograms of every series in the chunk. The mappings of the catalog
+are written into one stacked array, optionally a memory-mapped `.npy` file that
+can be fed to a CNN directly."""
+
+
+# Bin edges from README.md: Δt in days, ΔF in normalized log flux
+DT_BINS = np.array([0.01, 0.02, 0.04, 0.09, 0.13, 0.17, 0.25, 0.5, 1.1, 2.1, 4.1, 8.1, 15.1, 20.1, 30.1])
+DF_BINS = np.array([-0.1, -0.08, -0.06, -0.04, -0.02, 0, 0.02, 0.04, 0.06, 0.08, 0.1])
+
+# Upper limit on the number of sample pairs expanded at once, bounds temporary memory
+MAX_PAIRS_PER_CHUNK = 2_000_000
+
+
+def _ragged_pairs(lengths):
+    """
+    Every pair of samples within the same series of a ragged flat array.
+
+    Args:
+        lengths (numpy.ndarray): Number of samples of each series; the series follow each other.
+
+    Returns:
+        numpy.ndarray: Flat position of the earlier sample of each pair.
+        numpy.ndarray: Flat position of the later sample, grouped by series and earlier sample.
+    """
+    series_of_sample = np.repeat(np.arange(len(lengths)), lengths)
+    series_stops = np.cumsum(lengths)
+    position = np.arange(series_stops[-1] if len(lengths) else 0)
+    later_samples = series_stops[series_of_sample] - position - 1
+    earlier = np.repeat(position, later_samples)
+    lag = np.arange(len(earlier)) - np.repeat(np.cumsum(later_samples) - later_samples, later_samples) + 1
+    return earlier, earlier + lag
+
+
+def _bin_index(values, edges):
+    """
+    Bins values like np.histogram: half-open bins, with the last bin closed on the right.
+
+    Returns:
+        numpy.ndarray: The bin of each value, -1 for values outside the edges or NaN.
+    """
+    bins = np.searchsorted(edges, values, side="right") - 1
+    bins[values == edges[-1]] = len(edges) - 2
+    bins[(bins < 0) | (bins >= len(edges) - 1) | np.isnan(values)] = -1
+    return bins
+
+
+def normalized_log_flux(flux_values):
+    """
+    Log-transforms flux and scales each series to [0, 1], so mappings do not depend on
+    the absolute flux level of an event.
+
+    Args:
+        flux_values (numpy.ndarray): Array (..., time) of flux values; -999.9 and non-positive values become NaN.
+
+    Returns:
+        numpy.ndarray: Array of the same shape with values in [0, 1] or NaN.
+    """
+    flux_values = np.where(flux_values > 0, flux_values, np.nan)
+    log_flux = np.log10(flux_values)
+    with np.errstate(invalid="ignore"), warnings.catch_warnings():
+        # Elements without valid data in the window give all-NaN rows
+        warnings.simplefilter("ignore", RuntimeWarning)
+        low = np.nanmin(log_flux, axis=-1, keepdims=True) if log_flux.shape[-1] else log_flux
+        high = np.nanmax(log_flux, axis=-1, keepdims=True) if log_flux.shape[-1] else log_flux
+        span = np.where(high > low, high - low, 1.0)
+        return (log_flux - low) / span
+
+
+def compute_dmdt_mappings(decay_events_df, data_3d, datetime_values, element_mapping, energy_level, output_path=None,
+                          elements=None, dt_bins=DT_BINS, df_bins=DF_BINS):
+    """
+    Builds the normalized DMDT mapping of every event and element in a catalog.
+
+    Args:
+        decay_events_df (pd.DataFrame): Decay events from `compute_decay_events_for_all_data`.
+        data_3d (numpy.ndarray or SISCube): The 3D data cube (energy, time, element).
+        datetime_values (numpy.ndarray): Array of datetime64 values (None if `data_3d` is a SISCube).
+        element_mapping (dict): Element name to array index mapping (None if `data_3d` is a SISCube).
+        energy_level (int): The energy level to analyze.
+        output_path (str): Optional `.npy` path; the mappings are then written to a memory-mapped file.
+        elements (list): Elements to map, defaults to all elements in cube order.
+        dt_bins (numpy.ndarray): Δt bin edges in days.
+        df_bins (numpy.ndarray): ΔF bin edges in normalized log flux.
+
+    Returns:
+        numpy.ndarray: float32 array (event, element, ΔF bin, Δt bin); each mapping sums to the
+            fraction of sample pairs that fall inside the bins.
+        list: The element names along the second axis.
+    """
+    cube = as_cube(data_3d, datetime_values, element_mapping)
+    if elements is None:
+        elements = sorted(cube.element_mapping, key=cube.element_mapping.get)
+
+    num_events = len(decay_events_df)
+    num_dt_bins = len(dt_bins) - 1
+    num_df_bins = len(df_bins) - 1
+    bins_per_mapping = num_df_bins * num_dt_bins
+    shape = (num_events, len(elements), num_df_bins, num_dt_bins)
+    if output_path is not None:
+        mappings = np.lib.format.open_memmap(output_path, mode="w+", dtype=np.float32, shape=shape)
+    else:
+        mappings = np.zeros(shape, dtype=np.float32)
+
+    # All (element, event) series of the energy level, one ragged block with series = element * num_events + event
+    event_windows = EventWindows.from_catalog(decay_events_df, cube, energy_levels=[energy_level], elements=elements)
+    offsets = event_windows.offsets[0]
+    lengths = (offsets[:, 1:] - offsets[:, :-1]).ravel()
+    num_series = len(lengths)
+    series_of_sample = np.repeat(np.arange(num_series), lengths)
+
+    # Log flux scaled to [0, 1] per series, as `normalized_log_flux` does; non-positive values become NaN
+    log_flux = np.log10(np.where(event_windows.flux > 0, event_windows.flux, np.nan))
+    low, high = np.full(num_series, np.nan), np.full(num_series, np.nan)
+    nonempty = lengths > 0
+    series_starts = offsets[:, :-1].ravel()[nonempty]
+    if len(series_starts):
+        low[nonempty] = np.fmin.reduceat(log_flux, series_starts)
+        high[nonempty] = np.fmax.reduceat(log_flux, series_starts)
+    span = np.where(high > low, high - low, 1.0)
+    normalized = (log_flux - low[series_of_sample]) / span[series_of_sample]
+
+    # Samples without a valid flux never pair, so drop them before expanding the pairs
+    valid = ~np.isnan(normalized)
+    values = normalized[valid]
+    # Times in days relative to the start of the data, as float for fast differences
+    time_days = (event_windows.times[valid] - cube.datetime_values[0]) / np.timedelta64(1, "D")
+    valid_counts = np.bincount(series_of_sample[valid], minlength=num_series)
+    sample_offsets = np.concatenate(([0], np.cumsum(valid_counts)))
+    pair_counts = valid_counts * (valid_counts - 1) // 2
+    cumulative_pairs = np.concatenate(([0], np.cumsum(pair_counts)))
+    # Normalize by the number of pairs with valid flux, so events of different lengths compare
+    valid_pairs = np.maximum(pair_counts, 1)
+
+    flat_mappings = mappings.reshape(num_events * len(elements), bins_per_mapping)
+    chunk_start = 0
+    while chunk_start < num_series:
+        # Take consecutive series while their pairs stay within budget, at least one series per chunk
+        chunk_end = np.searchsorted(cumulative_pairs, cumulative_pairs[chunk_start] + MAX_PAIRS_PER_CHUNK, side="right") - 1
+        chunk_end = min(max(chunk_end, chunk_start + 1), num_series)
+        sample_start = sample_offsets[chunk_start]
+        chunk_values = values[sample_start:sample_offsets[chunk_end]]
+        chunk_days = time_days[sample_start:sample_offsets[chunk_end]]
+
+        earlier, later = _ragged_pairs(valid_counts[chunk_start:chunk_end])
+        df_values = chunk_values[later] - chunk_values[earlier]
+        # Most pairs fall outside the ΔF range, so only bin the ones inside it
+        inside_df = np.flatnonzero((df_values >= df_bins[0]) & (df_values <= df_bins[-1]))
+        earlier, later = earlier[inside_df], later[inside_df]
+        df_bin = _bin_index(df_values[inside_df], df_bins)
+        dt_bin = _bin_index(chunk_days[later] - chunk_days[earlier], dt_bins)
+
+        # One flat histogram index per (series, ΔF bin, Δt bin), offset by the series' position in the chunk
+        series_of_pair = np.repeat(np.arange(chunk_end - chunk_start), valid_counts[chunk_start:chunk_end])[earlier]
+        inside = (df_bin >= 0) & (dt_bin >= 0)
+        flat_index = series_of_pair * bins_per_mapping + df_bin * num_dt_bins + dt_bin
+        counts = np.bincount(flat_index[inside], minlength=(chunk_end - chunk_start) * bins_per_mapping)
+
+        series = np.arange(chunk_start, chunk_end)
+        flat_mappings[(series % num_events) * len(elements) + series // num_events] = (
+            counts.reshape(-1, bins_per_mapping) / valid_pairs[chunk_start:chunk_end, None]
+        )
+        chunk_start = chunk_end
+
+    if output_path is not None:
+        mappings.flush()
+    return mappings, elements
@@ -0,0 +1,263 @@
+import numpy as np
+import pandas as pd
+
+from catalog import EventCatalog
+from identification import event_times
+
+"""Scores a detected decay catalog against a hand-labeled one, such as
+transformed_data/true_decay_1998.csv. Scoring against a set of known false
+events (transformed_data/2014/false_decay_2014.csv) works the same way, and
+its recall is then the fraction of false events that are detected again.
+
+Detected and labeled events are paired with an overlap join. The labeled events
+are split into classes by length, in powers of two, and sorted by start time
+within each class. A labeled event of a class overlaps a detected event only if
+it starts at most the class's longest length before the detection does, so the
+candidates of each class lie between two binary-search positions. The
+candidates of all detected events are expanded and checked in one vectorized
+pass. A candidate that does not overlap ends before the detection starts, but it
+is at least half as long as the longest of its class, so it covers the instant
+that far before the detection's start. A detection therefore has at most d such
+candidates per class, where d is the largest number of labeled events that
+cover one instant. The join costs O((n + m) log m + k + n·d·c) for k
+overlapping pairs and c length classes, so a long labeled event does not make
+the detections after it scan all the events in between. A detected event is a
+hit if it overlaps a labeled event by at least `min_iou` (intersection over
+union of the time ranges). A labeled event is found if any detection hits it,
+and its best-overlapping hit gives its IoU and boundary offsets.
+
+`evaluate_parameter_sweep` scores every parameter set of a `run_parameter_sweep`
+result with a single join, grouping the metrics with `np.bincount`."""
+
+
+EVALUATION_COLUMNS = (
+    "Detected",
+    "Labeled",
+    "True Positives",
+    "Labeled Found",
+    "Precision",
+    "Recall",
+    "F1",
+    "Mean IoU",
+    "Mean Start Offset Hours",
+    "Mean End Offset Hours",
+    "Mean Absolute Start Offset Hours",
+    "Mean Absolute End Offset Hours",
+)
+
+
+def catalog_times(catalog):
+    """
+    Gets the start and end times of a catalog in any of the forms the pipeline uses.
+
+    Args:
+        catalog (EventCatalog or pd.DataFrame): An event catalog. DataFrames may have "Start Time"
+            and "End Time" columns, or the year and fractional-day columns (see `event_times`).
+
+    Returns:
+        numpy.ndarray: datetime64[ns] start time of each event, in row order.
+        numpy.ndarray: datetime64[ns] end time of each event.
+    """
+    if isinstance(catalog, EventCatalog):
+        return catalog.start_times, catalog.end_times
+    if len(catalog) == 0:
+        return np.empty(0, dtype="datetime64[ns]"), np.empty(0, dtype="datetime64[ns]")
+    if "Start Time" in catalog and "End Time" in catalog:
+        return (pd.DatetimeIndex(catalog["Start Time"]).to_numpy(dtype="datetime64[ns]"),
+                pd.DatetimeIndex(catalog["End Time"]).to_numpy(dtype="datetime64[ns]"))
+    return event_times(catalog)
+
+
+def overlap_pairs(query_starts, query_ends, starts, ends):
+    """
+    Finds every pair of overlapping intervals between two sets, with closed intervals.
+
+    Args:
+        query_starts (numpy.ndarray): Start of each query interval.
+        query_ends (numpy.ndarray): End of each query interval.
+        starts (numpy.ndarray): Start of each indexed interval, in any order.
+        ends (numpy.ndarray): End of each indexed interval.
+
+    Returns:
+        numpy.ndarray: Query index of each overlapping pair, in ascending order.
+        numpy.ndarray: Indexed-interval index of each pair, by start time within each query.
+    """
+    if len(starts) == 0 or len(query_starts) == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+
+    # Length class of every indexed interval: the binary exponent of its length (0 for empty intervals)
+    lengths = np.where(ends >= starts, ends - starts, ends - ends)
+    length_class = np.frexp(lengths.astype(float))[1]
+    order = np.lexsort((starts, length_class))
+    sorted_starts, sorted_ends, sorted_class = starts[order], ends[order], length_class[order]
+    class_bounds = np.flatnonzero(np.concatenate(([True], sorted_class[1:] != sorted_class[:-1], [True])))
+
+    # Candidates of each class start between the query start minus the class's longest length and the query end
+    first_blocks, stop_blocks = [], []
+    for block_start, block_stop in zip(class_bounds[:-1], class_bounds[1:]):
+        block_starts = sorted_starts[block_start:block_stop]
+        longest = lengths[order[block_start:block_stop]].max()
+        first = block_start + np.searchsorted(block_starts, query_starts - longest, side="left")
+        first_blocks.append(first)
+        stop_blocks.append(np.maximum(block_start + np.searchsorted(block_starts, query_ends, side="right"), first))
+    first = np.stack(first_blocks, axis=1).ravel()
+    stop = np.stack(stop_blocks, axis=1).ravel()
+
+    # Expand every (query, class) candidate range [first, stop) into flat arrays, grouped by query
+    counts = stop - first
+    query_index = np.repeat(np.repeat(np.arange(len(query_starts)), len(first_blocks)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    candidate = np.repeat(first, counts) + offsets
+
+    overlapping = sorted_ends[candidate] >= query_starts[query_index]
+    query_index, candidate = query_index[overlapping], candidate[overlapping]
+    by_start = np.lexsort((order[candidate], sorted_starts[candidate], query_index))
+    return query_index[by_start], order[candidate[by_start]]
+
+
+def _best_matches(detected_starts, detected_ends, detected_group, labeled_starts, labeled_ends, min_iou):
+    """
+    Joins detected and labeled events and keeps the best hit of every (group, labeled event).
+
+    Returns:
+        numpy.ndarray: Indices of the detected events that hit any labeled event.
+        tuple: (group, labeled index, detected index, IoU) arrays of the best hit per group and labeled event.
+    """
+    detected, labeled = overlap_pairs(detected_starts, detected_ends, labeled_starts, labeled_ends)
+    intersection = np.minimum(detected_ends[detected], labeled_ends[labeled]) - np.maximum(detected_starts[detected], labeled_starts[labeled])
+    union = np.maximum(detected_ends[detected], labeled_ends[labeled]) - np.minimum(detected_starts[detected], labeled_starts[labeled])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        iou = intersection / union
+    # Intervals that only touch have no intersection and are not hits
+    hit = (intersection > np.timedelta64(0, "ns")) & (iou >= min_iou)
+    detected, labeled, iou = detected[hit], labeled[hit], iou[hit]
+    group = detected_group[detected]
+
+    # Best hit per (group, labeled event): sort by group, labeled event and descending IoU, keep the first
+    order = np.lexsort((-iou, labeled, group))
+    group, labeled, detected, iou = group[order], labeled[order], detected[order], iou[order]
+    first = np.concatenate(([True], (group[1:] != group[:-1]) | (labeled[1:] != labeled[:-1]))) if len(group) else np.empty(0, dtype=bool)
+    return np.unique(detected), (group[first], labeled[first], detected[first], iou[first])
+
+
+def _score_groups(detected_starts, detected_ends, detected_group, num_groups, labeled_starts, labeled_ends, min_iou):
+    """
+    Computes the `EVALUATION_COLUMNS` metrics of every group of detected events.
+
+    Returns:
+        pd.DataFrame: One row per group.
+    """
+    hit_detections, (group, labeled, detected, iou) = _best_matches(
+        detected_starts, detected_ends, detected_group, labeled_starts, labeled_ends, min_iou
+    )
+    start_offset = (detected_starts[detected] - labeled_starts[labeled]) / np.timedelta64(1, "h")
+    end_offset = (detected_ends[detected] - labeled_ends[labeled]) / np.timedelta64(1, "h")
+
+    def group_sum(weights=None):
+        return np.bincount(group, weights=weights, minlength=num_groups).astype(float)
+
+    num_detected = np.bincount(detected_group, minlength=num_groups)
+    true_positives = np.bincount(detected_group[hit_detections], minlength=num_groups)
+    labeled_found = np.bincount(group, minlength=num_groups)
+    num_labeled = len(labeled_starts)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = true_positives / num_detected
+        recall = labeled_found / num_labeled if num_labeled else np.full(num_groups, np.nan)
+        f1 = 2 * precision * recall / (precision + recall)
+        # Nothing found scores 0, also when nothing was detected at all
+        f1 = np.where(recall == 0, 0.0, f1)
+        found = group_sum()
+        metrics = {
+            "Detected": num_detected,
+            "Labeled": np.full(num_groups, num_labeled),
+            "True Positives": true_positives,
+            "Labeled Found": labeled_found,
+            "Precision": precision,
+            "Recall": recall,
+            "F1": f1,
+            "Mean IoU": group_sum(iou) / found,
+            "Mean Start Offset Hours": group_sum(start_offset) / found,
+            "Mean End Offset Hours": group_sum(end_offset) / found,
+            "Mean Absolute Start Offset Hours": group_sum(np.abs(start_offset)) / found,
+            "Mean Absolute End Offset Hours": group_sum(np.abs(end_offset)) / found,
+        }
+    return pd.DataFrame(metrics, columns=list(EVALUATION_COLUMNS))
+
+
+def evaluate_catalog(detected_catalog, labeled_catalog, min_iou=0.0):
+    """
+    Scores a detected catalog against a labeled one.
+
+    Args:
+        detected_catalog (EventCatalog or pd.DataFrame): Detected events, e.g. from `compute_decay_events_for_all_data`.
+        labeled_catalog (EventCatalog or pd.DataFrame): Labeled events, e.g. `true_decay_1998.csv`.
+        min_iou (float): Minimum intersection over union for a detection to count as a hit.
+
+    Returns:
+        dict: The metrics in `EVALUATION_COLUMNS`. Precision is the fraction of detections that hit a
+            labeled event and recall the fraction of labeled events hit. Mean IoU and the offsets
+            (detected minus labeled boundary, in hours) are over the found labeled events, using
+            each one's best-overlapping detection; they are NaN when nothing was found.
+    """
+    detected_starts, detected_ends = catalog_times(detected_catalog)
+    labeled_starts, labeled_ends = catalog_times(labeled_catalog)
+    scores = _score_groups(detected_starts, detected_ends, np.zeros(len(detected_starts), dtype=int), 1,
+                           labeled_starts, labeled_ends, min_iou)
+    return {column: scores[column].iloc[0].item() for column in EVALUATION_COLUMNS}
+
+
+def match_events(detected_catalog, labeled_catalog, min_iou=0.0):
+    """
+    Pairs every labeled event with its best-overlapping detection, for inspection.
+
+    Args:
+        detected_catalog (EventCatalog or pd.DataFrame): Detected events.
+        labeled_catalog (EventCatalog or pd.DataFrame): Labeled events.
+        min_iou (float): Minimum intersection over union for a detection to count as a hit.
+
+    Returns:
+        pd.DataFrame: One row per labeled event (in row order) with "Labeled Index", "Detected Index"
+            (row position in the detected catalog, -1 if not found), "IoU", "Start Offset Hours"
+            and "End Offset Hours" (NaN if not found).
+    """
+    detected_starts, detected_ends = catalog_times(detected_catalog)
+    labeled_starts, labeled_ends = catalog_times(labeled_catalog)
+    _, (_, labeled, detected, iou) = _best_matches(
+        detected_starts, detected_ends, np.zeros(len(detected_starts), dtype=int), labeled_starts, labeled_ends, min_iou
+    )
+    matches = pd.DataFrame({
+        "Labeled Index": np.arange(len(labeled_starts)),
+        "Detected Index": -1,
+        "IoU": np.nan,
+        "Start Offset Hours": np.nan,
+        "End Offset Hours": np.nan,
+    })
+    matches.loc[labeled, "Detected Index"] = detected
+    matches.loc[labeled, "IoU"] = iou
+    matches.loc[labeled, "Start Offset Hours"] = (detected_starts[detected] - labeled_starts[labeled]) / np.timedelta64(1, "h")
+    matches.loc[labeled, "End Offset Hours"] = (detected_ends[detected] - labeled_ends[labeled]) / np.timedelta64(1, "h")
+    return matches
+
+
+def evaluate_parameter_sweep(events_df, summary_df, labeled_catalog, min_iou=0.0):
+    """
+    Scores every parameter set of a `run_parameter_sweep` result against a labeled catalog.
+
+    Args:
+        events_df (pd.DataFrame): All decay events of the sweep, with a "Parameter Set" column.
+        summary_df (pd.DataFrame): The sweep's summary, one row per parameter set.
+        labeled_catalog (EventCatalog or pd.DataFrame): Labeled events.
+        min_iou (float): Minimum intersection over union for a detection to count as a hit.
+
+    Returns:
+        pd.DataFrame: `summary_df` with the columns in `EVALUATION_COLUMNS` added.
+    """
+    num_groups = int(summary_df["Parameter Set"].max()) + 1 if len(summary_df) else 0
+    detected_starts, detected_ends = catalog_times(events_df)
+    detected_group = events_df["Parameter Set"].to_numpy(dtype=int) if len(events_df) else np.empty(0, dtype=int)
+    labeled_starts, labeled_ends = catalog_times(labeled_catalog)
+
+    scores = _score_groups(detected_starts, detected_ends, detected_group, num_groups, labeled_starts, labeled_ends, min_iou)
+    scores["Parameter Set"] = np.arange(num_groups)
+    return summary_df.merge(scores, on="Parameter Set", how="left")
@@ -0,0 +1,266 @@
+import numpy as np
+import pandas as pd
+
+from cube import as_cube
+
+"""The samples of every catalog event, cut out of the cube once. Counting the
+decaying elements of an event, plotting it and extracting features from it all
+read the valid flux of one (event, energy level, element) series. With
+`EventWindows`, those series are gathered in one pass into two flat buffers:
+flux values and their times. Each series is a contiguous slice of the buffers.
+Series are ordered by energy level, then element, then event, so all events of
+one series also form one contiguous block. The buffers grow with the total
+length of the events, not of the mission. Every accessor returns read-only
+views, so consumers share the data without copying it.
+
+Each event is stored with its extended window (`extend_days` before and after).
+The event's own window is a sub-slice of that, so plots with context and
+analyses of the bare event read the same buffers:
+
+    event_windows = EventWindows.from_catalog(decay_events_df, cube, extend_days=1)
+    export_all_decay_events(decay_events_df, cube, None, None, 1, 1, True, "out_img", event_windows=event_windows)
+    flux, times = event_windows.series(0, 1, "O", extended=False)
+"""
+
+
+# Ends are inclusive, so this keeps the samples before end + 1 s, the same samples as `event_index_ranges`
+CATALOG_END_TOLERANCE = np.timedelta64(1, "s") - np.timedelta64(1, "ns")
+
+
+class EventWindow:
+    """
+    The series of one event, with the `valid_series` and `element_mapping` of a cube window.
+
+    Attributes:
+        start_time (pd.Timestamp): Start of the event, without the extension.
+        end_time (pd.Timestamp): End of the event, without the extension.
+        element_mapping (dict): The extracted elements.
+    """
+
+    def __init__(self, event_windows, event, extended):
+        self._event_windows = event_windows
+        self._event = event
+        self._extended = extended
+        self.start_time = pd.Timestamp(event_windows.start_times[event])
+        self.end_time = pd.Timestamp(event_windows.end_times[event])
+        self.element_mapping = event_windows.element_mapping
+
+    def valid_series(self, energy_level, element_name):
+        """
+        Args:
+            energy_level (int): The energy level (starting at 1).
+            element_name (str): The element name.
+
+        Returns:
+            numpy.ndarray: Flux values of the event with the -999.9 entries removed, as a read-only view.
+            numpy.ndarray: The corresponding datetime64 values, as a read-only view.
+        """
+        return self._event_windows.series(self._event, energy_level, element_name, self._extended)
+
+
+class EventWindows:
+    """
+    The valid flux series of a set of events, extracted once into flat buffers.
+
+    Args:
+        data_3d (numpy.ndarray or SISCube): The 3D data cube (energy, time, element).
+        datetime_values (numpy.ndarray): Array of datetime64 values (None if `data_3d` is a SISCube).
+        element_mapping (dict): Element name to array index mapping (None if `data_3d` is a SISCube).
+        start_times (numpy.ndarray): datetime64 start of each event (inclusive).
+        end_times (numpy.ndarray): datetime64 end of each event (inclusive).
+        extend_days (float): Number of days to extend each event before and after.
+        energy_levels (list): Energy levels to extract. Defaults to every level in the cube.
+        elements (list): Elements to extract. Defaults to every element in the cube, in cube order.
+        end_tolerance (numpy.timedelta64): Padding added to every end time, see `from_catalog`.
+
+    Attributes:
+        start_times (numpy.ndarray): datetime64[ns] start of each event.
+        end_times (numpy.ndarray): datetime64[ns] end of each event.
+        extend_days (float): The extension of the stored windows.
+        energy_levels (list): The extracted energy levels.
+        element_mapping (dict): Extracted element name to its position among the extracted elements.
+        first_index (numpy.ndarray): Index of the first sample of each extended window on the cube's time axis.
+        stop_index (numpy.ndarray): Index one past the last sample of each extended window.
+        flux (numpy.ndarray): Flat buffer of all valid flux values.
+        times (numpy.ndarray): Flat buffer of their datetime64 values.
+        offsets (numpy.ndarray): (energy level, element, event + 1) positions of every extended series in the buffers.
+        core_offsets (numpy.ndarray): (energy level, element, event, 2) start and stop of every event's own window.
+    """
+
+    def __init__(self, data_3d, datetime_values, element_mapping, start_times, end_times, extend_days=0,
+                 energy_levels=None, elements=None, end_tolerance=np.timedelta64(0, "ns")):
+        cube = as_cube(data_3d, datetime_values, element_mapping)
+        if energy_levels is None:
+            energy_levels = range(1, cube.data_3d.shape[0] + 1)
+        if elements is None:
+            elements = sorted(cube.element_mapping, key=cube.element_mapping.get)
+
+        self.start_times = np.asarray(start_times, dtype="datetime64[ns]")
+        self.end_times = np.asarray(end_times, dtype="datetime64[ns]")
+        self.extend_days = extend_days
+        self.energy_levels = list(energy_levels)
+        self.element_mapping = {element_name: position for position, element_name in enumerate(elements)}
+        self._level_positions = {energy_level: position for position, energy_level in enumerate(self.energy_levels)}
+
+        # Extended and bare window of every event on the cube's time axis, both inclusive of their end
+        time_axis = cube.datetime_values
+        extension = np.timedelta64(int(round(extend_days * 86400e9)), "ns")
+        padded_end_times = self.end_times + end_tolerance
+        self.first_index = np.searchsorted(time_axis, self.start_times - extension, side="left")
+        self.stop_index = np.maximum(np.searchsorted(time_axis, padded_end_times + extension, side="right"), self.first_index)
+        core_first = np.clip(np.searchsorted(time_axis, self.start_times, side="left"), self.first_index, self.stop_index)
+        core_stop = np.clip(np.searchsorted(time_axis, padded_end_times, side="right"), core_first, self.stop_index)
+
+        # Expand every extended window [first, stop) into one flat array of time indices
+        num_events = len(self.start_times)
+        lengths = self.stop_index - self.first_index
+        event_of_sample = np.repeat(np.arange(num_events), lengths)
+        sample_index = self.first_index[event_of_sample] + (
+            np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        )
+        before_core = sample_index < core_first[event_of_sample]
+        before_core_end = sample_index < core_stop[event_of_sample]
+
+        num_series = len(self.energy_levels) * len(elements)
+        self.offsets = np.zeros((len(self.energy_levels), len(elements), num_events + 1), dtype=np.int64)
+        self.core_offsets = np.zeros((len(self.energy_levels), len(elements), num_events, 2), dtype=np.int64)
+        flux_blocks, time_blocks = [], []
+        total = 0
+        for level_position, energy_level in enumerate(self.energy_levels):
+            for element_position, element_name in enumerate(elements):
+                element_index = cube.element_mapping[element_name]
+                valid = cube.valid_mask[energy_level - 1, sample_index, element_index]
+                valid_index = sample_index[valid]
+                flux_blocks.append(cube.data_3d[energy_level - 1, valid_index, element_index])
+                time_blocks.append(time_axis[valid_index])
+
+                # Every series starts where the previous one ends, and its events follow each other
+                counts = np.bincount(event_of_sample[valid], minlength=num_events)
+                event_offsets = total + np.concatenate(([0], np.cumsum(counts)))
+                self.offsets[level_position, element_position] = event_offsets
+                self.core_offsets[level_position, element_position, :, 0] = event_offsets[:-1] + np.bincount(
+                    event_of_sample[valid & before_core], minlength=num_events)
+                self.core_offsets[level_position, element_position, :, 1] = event_offsets[:-1] + np.bincount(
+                    event_of_sample[valid & before_core_end], minlength=num_events)
+                total = event_offsets[-1]
+
+        self.flux = np.concatenate(flux_blocks) if num_series else np.empty(0, dtype=cube.data_3d.dtype)
+        self.times = np.concatenate(time_blocks) if num_series else np.empty(0, dtype="datetime64[ns]")
+        # Consumers get views into the buffers, which must not change under them
+        self.flux.flags.writeable = False
+        self.times.flags.writeable = False
+
+    @classmethod
+    def from_catalog(cls, decay_events_df, data_3d, datetime_values=None, element_mapping=None, extend_days=0,
+                     energy_levels=None, elements=None):
+        """
+        Extracts the events of a decay event catalog.
+
+        The catalog's fractional days are derived from whole seconds, so an event's last sample can lie
+        a fraction of a second after the stored end time. Ends are padded by one second to keep that
+        sample, as in `event_index_ranges`.
+
+        Args:
+            decay_events_df (pd.DataFrame): The decay event catalog (see `event_times`).
+            data_3d (numpy.ndarray or SISCube): The 3D data cube (energy, time, element).
+            datetime_values (numpy.ndarray): Array of datetime64 values (None if `data_3d` is a SISCube).
+            element_mapping (dict): Element name to array index mapping (None if `data_3d` is a SISCube).
+            extend_days (float): Number of days to extend each event before and after.
+            energy_levels (list): Energy levels to extract. Defaults to every level in the cube.
+            elements (list): Elements to extract. Defaults to every element in the cube.
+
+        Returns:
+            EventWindows: The events in catalog row order.
+        """
+        # Imported here because identification.py imports this module
+        from identification import event_times
+
+        start_times, end_times = event_times(decay_events_df)
+        return cls(data_3d, datetime_values, element_mapping, start_times, end_times, extend_days, energy_levels, elements,
+                   end_tolerance=CATALOG_END_TOLERANCE)
+
+    def __len__(self):
+        return len(self.start_times)
+
+    def __iter__(self):
+        return (self.event(event) for event in range(len(self)))
+
+    @property
+    def nbytes(self):
+        """
+        int: Memory held by the buffers and offsets, in bytes.
+        """
+        return self.flux.nbytes + self.times.nbytes + self.offsets.nbytes + self.core_offsets.nbytes
+
+    def _series_bounds(self, energy_level, element_name):
+        """
+        Returns:
+            numpy.ndarray: Offsets of the series' events in the buffers, see `offsets`.
+            numpy.ndarray: Start and stop of the series' bare event windows, see `core_offsets`.
+        """
+        try:
+            level_position = self._level_positions[energy_level]
+            element_position = self.element_mapping[element_name]
+        except KeyError:
+            raise KeyError(f"energy level {energy_level} of {element_name} was not extracted") from None
+        return self.offsets[level_position, element_position], self.core_offsets[level_position, element_position]
+
+    def series(self, event, energy_level, element_name, extended=True):
+        """
+        Gets one event's valid series without copying it.
+
+        Args:
+            event (int): Position of the event.
+            energy_level (int): The energy level (starting at 1).
+            element_name (str): The element name.
+            extended (bool): Whether to include the `extend_days` before and after the event.
+
+        Returns:
+            numpy.ndarray: Flux values with the -999.9 entries removed, as a read-only view.
+            numpy.ndarray: The corresponding datetime64 values, as a read-only view.
+        """
+        offsets, core_offsets = self._series_bounds(energy_level, element_name)
+        if extended:
+            start, stop = offsets[event], offsets[event + 1]
+        else:
+            start, stop = core_offsets[event]
+        return self.flux[start:stop], self.times[start:stop]
+
+    def event(self, event, extended=True):
+        """
+        Gets one event as an object that can stand in for a cube window.
+
+        Args:
+            event (int): Position of the event.
+            extended (bool): Whether its series include the `extend_days` before and after the event.
+
+        Returns:
+            EventWindow: The event.
+        """
+        if not -len(self) <= event < len(self):
+            raise IndexError(f"event {event} out of range for {len(self)} events")
+        return EventWindow(self, event % len(self), extended)
+
+    def element_series(self, energy_level, element_name, extended=True):
+        """
+        Gets one series of every event as a single ragged block, for extractors that work on all events at once
+        (e.g. with `np.add.reduceat`).
+
+        Args:
+            energy_level (int): The energy level (starting at 1).
+            element_name (str): The element name.
+            extended (bool): Whether the event ranges include the `extend_days` before and after each event.
+
+        Returns:
+            numpy.ndarray: Flux values of all events, as a read-only view.
+            numpy.ndarray: The corresponding datetime64 values, as a read-only view.
+            numpy.ndarray: Start of each event in the block.
+            numpy.ndarray: Stop of each event in the block.
+        """
+        offsets, core_offsets = self._series_bounds(energy_level, element_name)
+        block = slice(offsets[0], offsets[-1])
+        if extended:
+            starts, stops = offsets[:-1], offsets[1:]
+        else:
+            starts, stops = core_offsets[:, 0], core_offsets[:, 1]
+        return self.flux[block], self.times[block], starts - offsets[0], stops - offsets[0]
@@ -0,0 +1,414 @@
+import json
+import logging
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from load import _source_fingerprint, load_all_sis_data
+
+"""Per-channel flux statistics: quantiles, fill and zero fractions, and the mean
+and standard deviation of log10 flux for every (energy, element) pair of a cube.
+They are what threshold selection needs, e.g. the Q1 helium cutoff that
+preprocessing_1998.ipynb derives with `np.percentile`.
+
+Quantiles skip -999.9 fill values and zeros, as that cutoff does. The "exact"
+method sorts one energy channel at a time, for all elements at once, and
+interpolates between order statistics like `np.percentile`. The "histogram"
+method makes one chunked pass over the time axis. It counts the log10 flux of
+every series into fixed bins, so its memory use does not depend on the length
+of the data, and it works on memory-mapped cubes that do not fit in RAM. Every
+order statistic it reads off the bins is within one bin width (0.005 decades) of
+the exact one, so its quantiles of positive flux within `HISTOGRAM_LOG_RANGE` are
+within a factor of 10 ** 0.005 of the exact ones, i.e. 1.16 %.
+
+`cached_flux_statistics` stores the result next to the loader's cache, keyed on
+the same source-file fingerprint, so picking a threshold for any channel is a
+lookup after the first run."""
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_QUANTILES = (0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99)
+
+# Multipliers applied to the Q1 cutoffs to account for abundance (see preprocessing_1998.ipynb)
+Q1_MULTIPLIERS = {"He": 3, "O": 2.25}
+
+# log10 flux range and bin count of the "histogram" method; values outside go to the edge bins
+HISTOGRAM_LOG_RANGE = (-12.0, 8.0)
+HISTOGRAM_BINS = 4000
+
+# Number of time samples per chunk of the "histogram" method
+HISTOGRAM_CHUNK_SAMPLES = 65536
+
+# Bump when the layout of the saved statistics or the way they are computed changes
+STATS_FORMAT_VERSION = 2
+
+STATS_FILENAME = "flux_stats.npz"
+
+_SUMMARY_FIELDS = ("count", "fill_fraction", "zero_fraction", "log_mean", "log_std", "minimum", "maximum")
+
+
+class FluxStatistics:
+    """
+    Statistics of every (energy, element) series of a cube, from `compute_flux_statistics`.
+
+    Every array below has shape (energy, element) except `quantiles`, which has the
+    quantile levels as an extra first axis.
+
+    Args:
+        element_mapping (dict): Element name to array index mapping.
+        quantile_levels (numpy.ndarray): The quantile levels, in [0, 1].
+        quantiles (numpy.ndarray): Quantiles of the valid, non-zero flux; NaN for series without such values.
+        count (numpy.ndarray): Number of valid, non-zero values.
+        fill_fraction (numpy.ndarray): Fraction of -999.9 fill values.
+        zero_fraction (numpy.ndarray): Fraction of zeros.
+        log_mean (numpy.ndarray): Mean of log10 flux over the positive values.
+        log_std (numpy.ndarray): Standard deviation of log10 flux over the positive values.
+        minimum (numpy.ndarray): Smallest valid, non-zero value.
+        maximum (numpy.ndarray): Largest valid, non-zero value.
+        method (str): "exact" or "histogram".
+    """
+
+    def __init__(self, element_mapping, quantile_levels, quantiles, count, fill_fraction, zero_fraction, log_mean, log_std,
+                 minimum, maximum, method):
+        self.element_mapping = dict(element_mapping)
+        self.quantile_levels = np.asarray(quantile_levels, dtype=float)
+        self.quantiles = quantiles
+        self.count = count
+        self.fill_fraction = fill_fraction
+        self.zero_fraction = zero_fraction
+        self.log_mean = log_mean
+        self.log_std = log_std
+        self.minimum = minimum
+        self.maximum = maximum
+        self.method = method
+
+    def quantile(self, q, energy_level, element_name):
+        """
+        Looks up one quantile.
+
+        Args:
+            q (float): A quantile level that was computed, e.g. 0.25.
+            energy_level (int): The energy level (starting at 1).
+            element_name (str): The element name.
+
+        Returns:
+            float: The quantile, NaN if the series has no valid, non-zero values.
+        """
+        return float(self.quantiles[self._level_index(q), energy_level - 1, self.element_mapping[element_name]])
+
+    def thresholds(self, q, energy_level, multipliers=None):
+        """
+        Looks up one quantile of every element, scaled by a per-element multiplier.
+
+        Args:
+            q (float): A quantile level that was computed.
+            energy_level (int): The energy level (starting at 1).
+            multipliers (dict): Factor applied to each element's quantile (1 if not listed).
+
+        Returns:
+            dict: Element name to threshold, for the elements with valid data.
+        """
+        multipliers = multipliers or {}
+        values = self.quantiles[self._level_index(q), energy_level - 1]
+        return {
+            element_name: float(values[element_index]) * multipliers.get(element_name, 1)
+            for element_name, element_index in self.element_mapping.items()
+            if self.count[energy_level - 1, element_index] > 0
+        }
+
+    def q1_thresholds(self, energy_level, multipliers=Q1_MULTIPLIERS):
+        """
+        Returns:
+            dict: The Q1 cutoff of every element with valid data, as in preprocessing_1998.ipynb.
+        """
+        return self.thresholds(0.25, energy_level, multipliers)
+
+    def to_dataframe(self):
+        """
+        Returns:
+            pd.DataFrame: One row per energy level and element, with the summary columns and one
+                "Q<level>" column per quantile level.
+        """
+        num_energies = self.count.shape[0]
+        elements = sorted(self.element_mapping, key=self.element_mapping.get)
+        energy_index, element_index = np.meshgrid(np.arange(num_energies), np.arange(len(elements)), indexing="ij")
+        table = {
+            "Energy Level": energy_index.ravel() + 1,
+            "Element": np.asarray(elements, dtype=object)[element_index.ravel()],
+        }
+        for field in _SUMMARY_FIELDS:
+            table[field.replace("_", " ").title()] = getattr(self, field).ravel()
+        for level, values in zip(self.quantile_levels, self.quantiles):
+            table[f"Q{level:g}"] = values.ravel()
+        return pd.DataFrame(table)
+
+    def save(self, path, metadata=None):
+        """
+        Saves the statistics as an `.npz` file.
+
+        Args:
+            path (str or file): The file to write.
+            metadata (dict): JSON-serializable values stored with the statistics, e.g. a source fingerprint.
+        """
+        np.savez(
+            path,
+            format_version=np.array(STATS_FORMAT_VERSION),
+            metadata=np.array(json.dumps({"element_mapping": self.element_mapping, "method": self.method, **(metadata or {})})),
+            quantile_levels=self.quantile_levels,
+            quantiles=self.quantiles,
+            **{field: getattr(self, field) for field in _SUMMARY_FIELDS},
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads statistics saved with `save`.
+
+        Returns:
+            FluxStatistics: The statistics.
+            dict: The metadata stored with them.
+        """
+        with np.load(path, allow_pickle=False) as saved:
+            if int(saved["format_version"]) != STATS_FORMAT_VERSION:
+                raise ValueError(f"{path} has statistics format {int(saved['format_version'])}, expected {STATS_FORMAT_VERSION}")
+            metadata = json.loads(str(saved["metadata"]))
+            statistics = cls(metadata["element_mapping"], saved["quantile_levels"], saved["quantiles"],
+                             *(saved[field] for field in _SUMMARY_FIELDS), metadata["method"])
+        return statistics, metadata
+
+    def _level_index(self, q):
+        matches = np.flatnonzero(np.isclose(self.quantile_levels, q))
+        if len(matches) == 0:
+            raise ValueError(f"Quantile {q} was not computed; available levels are {self.quantile_levels.tolist()}")
+        return matches[0]
+
+
+def compute_flux_statistics(data_3d, element_mapping, quantiles=DEFAULT_QUANTILES, method="exact",
+                            chunk_samples=HISTOGRAM_CHUNK_SAMPLES):
+    """
+    Computes the statistics of every (energy, element) series of a cube.
+
+    Args:
+        data_3d (numpy.ndarray): The 3D data cube (energy, time, element), may be memory-mapped.
+        element_mapping (dict): Element name to array index mapping.
+        quantiles (tuple): Quantile levels to compute, in [0, 1].
+        method (str): "exact" for `np.percentile`-equal quantiles, or "histogram" for one chunked
+            pass with bounded memory and quantiles within one log10 bin (1.16 %) of the exact ones.
+        chunk_samples (int): Number of time samples per chunk.
+
+    Returns:
+        FluxStatistics: The statistics.
+    """
+    if method not in ("exact", "histogram"):
+        raise ValueError(f"Unknown method {method!r}, expected 'exact' or 'histogram'")
+    quantile_levels = np.asarray(quantiles, dtype=float)
+    num_energies, num_samples, num_elements = data_3d.shape
+    shape = (num_energies, num_elements)
+
+    # Counts and moments are sums, so both methods accumulate them chunk by chunk
+    fill_count = np.zeros(shape)
+    zero_count = np.zeros(shape)
+    count = np.zeros(shape)
+    positive_count = np.zeros(shape)
+    log_sum = np.zeros(shape)
+    log_square_sum = np.zeros(shape)
+    minimum = np.full(shape, np.inf)
+    maximum = np.full(shape, -np.inf)
+    if method == "histogram":
+        log_low, log_high = HISTOGRAM_LOG_RANGE
+        bin_width = (log_high - log_low) / HISTOGRAM_BINS
+        # Bin 0 holds the negative values, bins 1.. the log10 bins of the positive values
+        histogram = np.zeros(num_energies * num_elements * (HISTOGRAM_BINS + 1), dtype=np.int64)
+        series_offset = np.arange(num_energies * num_elements).reshape(shape) * (HISTOGRAM_BINS + 1)
+
+    for chunk_start in range(0, num_samples, chunk_samples):
+        chunk = np.asarray(data_3d[:, chunk_start:chunk_start + chunk_samples, :], dtype=float)
+        fill = chunk == -999.9
+        zero = chunk == 0
+        valid = ~fill & ~zero
+        positive = valid & (chunk > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_flux = np.log10(np.where(positive, chunk, 1.0))
+
+        fill_count += fill.sum(axis=1)
+        zero_count += zero.sum(axis=1)
+        count += valid.sum(axis=1)
+        positive_count += positive.sum(axis=1)
+        log_sum += log_flux.sum(axis=1)
+        log_square_sum += (log_flux * log_flux).sum(axis=1)
+        minimum = np.minimum(minimum, np.where(valid, chunk, np.inf).min(axis=1, initial=np.inf))
+        maximum = np.maximum(maximum, np.where(valid, chunk, -np.inf).max(axis=1, initial=-np.inf))
+
+        if method == "histogram":
+            bins = np.clip(((log_flux - log_low) / bin_width).astype(np.int64), 0, HISTOGRAM_BINS - 1) + 1
+            bins = np.where(positive, bins, 0) + series_offset[:, None, :]
+            histogram += np.bincount(bins[valid], minlength=len(histogram))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_mean = log_sum / positive_count
+        log_std = np.sqrt(np.maximum(log_square_sum / positive_count - log_mean ** 2, 0))
+    has_values = count > 0
+    minimum[~has_values] = np.nan
+    maximum[~has_values] = np.nan
+
+    if method == "exact":
+        quantile_values = _exact_quantiles(data_3d, quantile_levels, count)
+    else:
+        quantile_values = _histogram_quantiles(histogram.reshape(shape + (HISTOGRAM_BINS + 1,)), quantile_levels, count,
+                                               minimum, maximum, log_low, bin_width)
+
+    return FluxStatistics(element_mapping, quantile_levels, quantile_values, count.astype(np.int64),
+                          fill_count / max(num_samples, 1), zero_count / max(num_samples, 1), log_mean, log_std,
+                          minimum, maximum, method)
+
+
+def compute_q1_thresholds(data_3d, element_mapping, energy_level, multipliers=Q1_MULTIPLIERS):
+    """
+    Computes the Q1 flux cutoff of every element, as in preprocessing_1998.ipynb.
+
+    Args:
+        data_3d (numpy.ndarray): The 3D data cube (energy, time, element).
+        element_mapping (dict): Element name to array index mapping.
+        energy_level (int): The energy level to compute the cutoffs for.
+        multipliers (dict): Factor applied to each element's cutoff (1 if not listed).
+
+    Returns:
+        dict: Element name to Q1 cutoff, for the elements with valid data.
+    """
+    # Statistics of the one energy channel, which is then level 1 of the slice
+    statistics = compute_flux_statistics(data_3d[energy_level - 1:energy_level], element_mapping, quantiles=(0.25,))
+    return statistics.q1_thresholds(1, multipliers)
+
+
+def _exact_quantiles(data_3d, quantile_levels, count):
+    """
+    Interpolates quantiles between sorted values like `np.percentile`, one energy channel at a time.
+
+    Returns:
+        numpy.ndarray: Array (quantile, energy, element), NaN for series without values.
+    """
+    num_energies, _, num_elements = data_3d.shape
+    quantile_values = np.full((len(quantile_levels), num_energies, num_elements), np.nan)
+    for energy in range(num_energies):
+        channel = np.asarray(data_3d[energy], dtype=float)
+        # Sorting puts the NaN of the skipped values after every valid one
+        channel = np.sort(np.where((channel != -999.9) & (channel != 0), channel, np.nan), axis=0)
+        series_count = count[energy].astype(np.int64)
+        position = quantile_levels[:, None] * np.maximum(series_count - 1, 0)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, np.maximum(series_count - 1, 0))
+        fraction = position - lower
+        lower_values = np.take_along_axis(channel, lower, axis=0)
+        upper_values = np.take_along_axis(channel, upper, axis=0)
+        values = lower_values + fraction * (upper_values - lower_values)
+        quantile_values[:, energy] = np.where(series_count > 0, values, np.nan)
+    return quantile_values
+
+
+def _histogram_quantiles(histogram, quantile_levels, count, minimum, maximum, log_low, bin_width):
+    """
+    Reads quantiles off the log10 histograms. Like `np.percentile`, each quantile interpolates
+    linearly between the two order statistics around its rank, and each of those is placed
+    within its bin by its rank among the bin's values.
+
+    Returns:
+        numpy.ndarray: Array (quantile, energy, element), NaN for series without values.
+    """
+    cumulative = np.cumsum(histogram, axis=-1)
+    # 0-based rank of each quantile, as `np.percentile` places it
+    rank = quantile_levels[:, None, None] * np.maximum(count - 1, 0)
+    rank_below = np.floor(rank)
+    rank_above = np.minimum(rank_below + 1, np.maximum(count - 1, 0))
+
+    def order_statistic(order_rank):
+        # Index of the bin holding each rank: the first bin whose cumulative count exceeds it
+        bin_index = (cumulative[None] <= order_rank[..., None]).sum(axis=-1)
+        bin_index = np.minimum(bin_index, histogram.shape[-1] - 1)
+        # Values in the bin hold the ranks before .. before + in_bin - 1
+        in_bin = np.take_along_axis(histogram[None], bin_index[..., None], axis=-1)[..., 0]
+        before = np.take_along_axis(cumulative[None], bin_index[..., None], axis=-1)[..., 0] - in_bin
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = np.clip((order_rank - before + 0.5) / in_bin, 0, 1)
+            values = 10.0 ** (log_low + (bin_index - 1 + fraction) * bin_width)
+        # Ranks among the negative values report the smallest value; keep every value inside the data range
+        values = np.where(bin_index == 0, minimum, values)
+        return np.clip(values, minimum, maximum)
+
+    below = order_statistic(rank_below)
+    values = below + (rank - rank_below) * (order_statistic(rank_above) - below)
+    return np.where(count > 0, values, np.nan)
+
+
+def cached_flux_statistics(folder_path, cache_dir=None, quantiles=DEFAULT_QUANTILES, method="exact", max_workers=None):
+    """
+    Returns the statistics of a dataset folder, computing them only when the source files change.
+
+    The statistics are kept as `flux_stats.npz` in the loader's cache folder and are keyed on
+    the same fingerprint of the source files (names, sizes and modification times), plus the
+    quantile levels and method.
+
+    Args:
+        folder_path (str): The path to the folder containing the SIS data files.
+        cache_dir (str): The cache folder. Defaults to a `.sis_cache` folder inside `folder_path`, as for `load_all_sis_data`.
+        quantiles (tuple): Quantile levels to compute.
+        method (str): "exact" or "histogram", see `compute_flux_statistics`.
+        max_workers (int): Number of processes used to parse the files if the data has to be loaded.
+
+    Returns:
+        FluxStatistics: The statistics.
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(folder_path, ".sis_cache")
+    filenames = [filename for filename in sorted(os.listdir(folder_path)) if filename.endswith(".txt")]
+    key = {
+        "source_files": _source_fingerprint(folder_path, filenames),
+        "quantiles": [float(q) for q in quantiles],
+        "method": method,
+    }
+    stats_path = os.path.join(cache_dir, STATS_FILENAME)
+
+    try:
+        statistics, metadata = FluxStatistics.load(stats_path)
+        if all(metadata.get(name) == value for name, value in key.items()):
+            return statistics
+    except (OSError, ValueError, KeyError):
+        pass
+
+    # A warm load memory-maps the cached cube, so this does not read it into RAM up front
+    data_3d, _, element_mapping = load_all_sis_data(folder_path, cache_dir=cache_dir, max_workers=max_workers)
+    statistics = compute_flux_statistics(data_3d, element_mapping, quantiles, method)
+    try:
+        _replace_statistics(stats_path, statistics, key)
+    except OSError as error:
+        # E.g. a read-only dataset folder: the computed statistics are still valid
+        logger.warning("Could not write the flux statistics cache to %s: %s", cache_dir, error)
+    return statistics
+
+
+def _replace_statistics(path, statistics, metadata):
+    """
+    Saves statistics to a temporary file next to `path` and renames it to `path`.
+
+    Each writer gets its own temporary file, so concurrent runs on one folder do not collide.
+
+    Args:
+        path (str): The `.npz` file to replace.
+        statistics (FluxStatistics): The statistics to save.
+        metadata (dict): The metadata stored with them.
+
+    Raises:
+        OSError: If the cache folder cannot be written.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    file_descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".npz.tmp")
+    try:
+        with os.fdopen(file_descriptor, "wb") as f:
+            statistics.save(f, metadata)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
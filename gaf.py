@@ -0,0 +1,165 @@
+import numpy as np
+
+from cube import as_cube
+from dmdt import normalized_log_flux
+from event_windows import EventWindows
+from parallel import bounded_map, resolve_max_workers
+
+"""Gramian Angular Fields (GAFs) encode a time series as an image (see README.md).
+Each event window is resampled to a fixed number of points, scaled to [-1, 1] and
+read as the angles phi = arccos(x); the summation field (GASF) holds
+cos(phi_i + phi_j) and the difference field (GADF) sin(phi_i - phi_j). Both are
+outer products of the cos and sin vectors, computed for a whole chunk of series
+at once.
+
+Events are processed in chunks of bounded size and every chunk is written into
+a memory-mapped `.npy` dataset as soon as it is done, so memory use depends on
+the chunk size and not on the number of events. Chunks are spread over a process
+pool; the parent resamples the event windows and the workers build and write the
+images. The windows are cut out of the cube once with `EventWindows`, as for the
+DMDT mappings."""
+
+
+GAF_METHODS = ("GASF", "GADF")
+
+# Number of points each event window is resampled to, and so the image side length
+GAF_SIZE = 64
+
+# Upper limit on the size of the images of one chunk, in bytes
+MAX_CHUNK_BYTES = 64 * 1024 * 1024
+
+
+def resample_event(window_days, element_series, image_size=GAF_SIZE):
+    """
+    Resamples the series of one event onto `image_size` evenly spaced times.
+
+    Args:
+        window_days (tuple): Times of the first and last sample of the event window as floats (e.g. days),
+            None for a window without samples.
+        element_series (list): (times, values) of each element, with values NaN where invalid.
+        image_size (int): Number of points to resample to.
+
+    Returns:
+        numpy.ndarray: Array (element, image_size), all NaN for elements with fewer than two valid samples.
+    """
+    resampled = np.full((len(element_series), image_size), np.nan)
+    if window_days is None:
+        return resampled
+    grid = np.linspace(window_days[0], window_days[1], image_size)
+    for element, (times, values) in enumerate(element_series):
+        valid = ~np.isnan(values)
+        if np.count_nonzero(valid) >= 2:
+            resampled[element] = np.interp(grid, times[valid], values[valid])
+    return resampled
+
+
+def gramian_angular_fields(series):
+    """
+    Computes the GASF and GADF of a batch of series.
+
+    Args:
+        series (numpy.ndarray): Array (..., n) of series; each is min-max scaled to [-1, 1] first.
+
+    Returns:
+        numpy.ndarray: float32 array (..., 2, n, n) holding the GASF and the GADF, NaN for series
+            that contain NaN.
+    """
+    series = np.asarray(series, dtype=float)
+    with np.errstate(invalid="ignore"):
+        low = series.min(axis=-1, keepdims=True)
+        high = series.max(axis=-1, keepdims=True)
+        span = np.where(high > low, high - low, 1.0)
+        cos_phi = np.clip(2 * (series - low) / span - 1, -1, 1)
+    cos_phi = cos_phi.astype(np.float32)
+    sin_phi = np.sqrt(1 - cos_phi ** 2)
+    cos_i, cos_j = cos_phi[..., :, None], cos_phi[..., None, :]
+    sin_i, sin_j = sin_phi[..., :, None], sin_phi[..., None, :]
+
+    images = np.empty(series.shape[:-1] + (2, series.shape[-1], series.shape[-1]), dtype=np.float32)
+    gasf, gadf = images[..., 0, :, :], images[..., 1, :, :]
+    # cos(phi_i + phi_j) = cos_i cos_j - sin_i sin_j
+    np.multiply(cos_i, cos_j, out=gasf)
+    gasf -= sin_i * sin_j
+    # sin(phi_i - phi_j) = sin_i cos_j - cos_i sin_j
+    np.multiply(sin_i, cos_j, out=gadf)
+    gadf -= cos_i * sin_j
+    return images
+
+
+def compute_gaf_images(decay_events_df, data_3d, datetime_values, element_mapping, energy_level, output_path,
+                       elements=None, image_size=GAF_SIZE, max_workers=None):
+    """
+    Builds the GASF and GADF of every event and element in a catalog into a `.npy` dataset.
+
+    The series are log10 flux scaled per event, as for the DMDT mappings, and the
+    event windows are extracted from the catalog with `EventWindows` like `compute_dmdt_mappings`.
+
+    Args:
+        decay_events_df (pd.DataFrame): Decay events from `compute_decay_events_for_all_data`.
+        data_3d (numpy.ndarray or SISCube): The 3D data cube (energy, time, element).
+        datetime_values (numpy.ndarray): Array of datetime64 values (None if `data_3d` is a SISCube).
+        element_mapping (dict): Element name to array index mapping (None if `data_3d` is a SISCube).
+        energy_level (int): The energy level to analyze.
+        output_path (str): Path of the `.npy` file the images are written to.
+        elements (list): Elements to encode, defaults to all elements in cube order.
+        image_size (int): Number of points each event is resampled to.
+        max_workers (int): Number of worker processes. Defaults to one per CPU, 1 runs in the current process.
+
+    Returns:
+        numpy.ndarray: Read-only memory-mapped float32 array (event, element, method, image_size, image_size),
+            with the methods in `GAF_METHODS` order; NaN images for elements with fewer than two valid samples.
+        list: The element names along the second axis.
+    """
+    cube = as_cube(data_3d, datetime_values, element_mapping)
+    if elements is None:
+        elements = sorted(cube.element_mapping, key=cube.element_mapping.get)
+
+    num_events = len(decay_events_df)
+    shape = (num_events, len(elements), len(GAF_METHODS), image_size, image_size)
+    np.lib.format.open_memmap(output_path, mode="w+", dtype=np.float32, shape=shape).flush()
+
+    event_windows = EventWindows.from_catalog(decay_events_df, cube, energy_levels=[energy_level], elements=elements)
+    def to_days(times):
+        # Times in days relative to the start of the data
+        return (times - cube.datetime_values[0]) / np.timedelta64(1, "D")
+
+    element_blocks = []
+    for element_name in elements:
+        flux, times, starts, stops = event_windows.element_series(energy_level, element_name)
+        element_blocks.append((flux, to_days(times), starts, stops))
+
+    def event_series(event):
+        # The resampling grid spans the whole window, including samples no element has valid flux for
+        first, stop = event_windows.first_index[event], event_windows.stop_index[event]
+        window_days = tuple(to_days(cube.datetime_values[[first, stop - 1]])) if stop > first else None
+        return window_days, [
+            (days[starts[event]:stops[event]], normalized_log_flux(flux[starts[event]:stops[event]]))
+            for flux, days, starts, stops in element_blocks
+        ]
+
+    image_bytes = len(elements) * len(GAF_METHODS) * image_size * image_size * 4
+    chunk_size = max(1, MAX_CHUNK_BYTES // max(image_bytes, 1))
+
+    def resampled_chunks():
+        for chunk_start in range(0, num_events, chunk_size):
+            chunk_events = range(chunk_start, min(chunk_start + chunk_size, num_events))
+            series = np.stack([
+                resample_event(*event_series(event), image_size) for event in chunk_events
+            ]) if len(elements) else np.empty((len(chunk_events), 0, image_size))
+            yield output_path, chunk_start, series
+
+    max_workers = resolve_max_workers(max_workers, -(-num_events // chunk_size))
+    for _ in bounded_map(_write_gaf_chunk, resampled_chunks(), max_workers):
+        pass
+
+    return np.load(output_path, mmap_mode="r"), elements
+
+
+def _write_gaf_chunk(output_path, chunk_start, series):
+    """
+    Computes the images of a chunk of resampled events and writes them into the dataset.
+    """
+    images = np.load(output_path, mmap_mode="r+")
+    images[chunk_start:chunk_start + len(series)] = gramian_angular_fields(series)
+    images.flush()
+    del images
@@ -1,20 +1,53 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+import matplotlib.ticker as mticker
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from matplotlib.transforms import Bbox, offset_copy
+
+from cube import as_cube
+from event_windows import EventWindows
+from identification import event_times
+from parallel import resolve_max_workers
 
 
-def plot_all_decay_events(decay_events_df, data_3d, datetime_values, element_mapping, energy_level, extend_days, useLogScale):
+def _setup_event_axis(ax):
+    """
+    Applies the day-of-year time axis shared by all event plots.
+    """
+    ax.grid(True)
+
+    # Set major ticks to daily
+    ax.xaxis.set_major_locator(mdates.DayLocator())
+    ax.xaxis.set_major_formatter(mdates.DateFormatter("%j"))
+
+    # Set minor ticks to half-daily
+    ax.xaxis.set_minor_locator(mdates.HourLocator(byhour=12))
+
+
+def plot_all_decay_events(decay_events_df, data_3d, datetime_values, element_mapping, energy_level, extend_days, useLogScale,
+                          event_windows=None):
     """
     Args:
         decay_events_df (pd.DataFrame): DataFrame containing decay event details.
-        data_3d (numpy.ndarray): The 3D data cube (energy, time, element).
-        datetime_values (numpy.ndarray): Array of datetime objects for the time axis.
-        element_mapping (dict): Dictionary mapping element names to array indices.
+        data_3d (numpy.ndarray or SISCube): The 3D data cube (energy, time, element).
+        datetime_values (numpy.ndarray): Array of datetime64 values for the time axis (None if `data_3d` is a SISCube).
+        element_mapping (dict): Dictionary mapping element names to array indices (None if `data_3d` is a SISCube).
         energy_level (int): The energy level to analyze.
         extend_days (int): Number of days to extend the time range before and after the event.
+        event_windows (EventWindows): Optional windows of the same events, extracted with `extend_days`.
     """
 
+    cube = as_cube(data_3d, datetime_values, element_mapping)
+
     num_events = len(decay_events_df)
     if num_events == 0:
         print("No decay events found to plot.")
@@ -24,36 +57,23 @@ def plot_all_decay_events(decay_events_df, data_3d, datetime_values, element_map
     num_rows = int(np.ceil(num_events / num_cols))
 
     #add key at top
-    fig, axes = plt.subplots(num_rows, num_cols, figsize=(20, 4 * num_rows), sharey=True)
+    fig, axes = plt.subplots(num_rows, num_cols, figsize=(20, 4 * num_rows), sharey=True, squeeze=False)
     fig.subplots_adjust(hspace=0.5, top=0.95)  
 
     lines = []
     labels = []
 
-    for i, row in decay_events_df.iterrows():
-        ax = axes[i // num_cols, i % num_cols]
-
-        start_time = pd.to_datetime(
-            f"{int(row['Start Year'])}-{row['Start Fractional Day']:.5f}", format="%Y-%j.%f"
-        )
-        end_time = pd.to_datetime(
-            f"{int(row['End Year'])}-{row['End Fractional Day']:.5f}", format="%Y-%j.%f"
-        )
+    # Every event's window, extended by extend_days before and after
+    event_windows = _resolve_event_windows(decay_events_df, cube, extend_days, [energy_level], event_windows)
 
-        # Extend time range by extend_days before and after
-        extended_start_time = start_time - pd.Timedelta(days=extend_days)
-        extended_end_time = end_time + pd.Timedelta(days=extend_days)
-
-        time_mask = (datetime_values >= extended_start_time) & (
-            datetime_values <= extended_end_time
-        )
+    for i in range(num_events):
+        ax = axes[i // num_cols, i % num_cols]
 
-        for element_name, element_index in element_mapping.items():
-            element_flux = data_3d[energy_level - 1, time_mask, element_index]
+        window = event_windows.event(i)
+        start_time, end_time = window.start_time, window.end_time
 
-            valid_data_mask = element_flux != -999.9
-            element_flux = element_flux[valid_data_mask]
-            element_time = datetime_values[time_mask][valid_data_mask]
+        for element_name in cube.element_mapping:
+            element_flux, element_time = window.valid_series(energy_level, element_name)
 
             line, = ax.plot(element_time, element_flux, label=f"{element_name}")
             if element_name not in labels:
@@ -67,14 +87,7 @@ def plot_all_decay_events(decay_events_df, data_3d, datetime_values, element_map
         if i % num_cols == 0:
             ax.set_ylabel("Log Flux (particles/(cm² Sr sec MeV/nucleon))")
         ax.set_title(f"Event {i+1} ({start_time.year})")
-        ax.grid(True)
-
-        # Set major ticks to daily
-        ax.xaxis.set_major_locator(mdates.DayLocator())
-        ax.xaxis.set_major_formatter(mdates.DateFormatter("%j"))
-
-        # Set minor ticks to half-daily
-        ax.xaxis.set_minor_locator(mdates.HourLocator(byhour=12))
+        _setup_event_axis(ax)
 
         # Rotate x-axis labels for better readability
         plt.setp(ax.get_xticklabels(), rotation=45, ha="right")
@@ -98,30 +111,30 @@ def plot_all_decay_events(decay_events_df, data_3d, datetime_values, element_map
 
 
 
-def plot_decay_events_per_element(decay_events_df, data_3d, datetime_values, element_mapping, energy_levels, extend_days, useLogScale):
+def plot_decay_events_per_element(decay_events_df, data_3d, datetime_values, element_mapping, energy_levels, extend_days, useLogScale,
+                                  event_windows=None):
     """
     Args:
         decay_events_df (pd.DataFrame): DataFrame containing decay event details.
-        data_3d (numpy.ndarray): The 3D data cube (energy, time, element).
-        datetime_values (numpy.ndarray): Array of datetime objects for the time axis.
-        element_mapping (dict): Dictionary mapping element names to array indices.
+        data_3d (numpy.ndarray or SISCube): The 3D data cube (energy, time, element).
+        datetime_values (numpy.ndarray): Array of datetime64 values for the time axis (None if `data_3d` is a SISCube).
+        element_mapping (dict): Dictionary mapping element names to array indices (None if `data_3d` is a SISCube).
         energy_levels (int): Number of energy levels to analyze (starting from the lowest).
         extend_days (int): Number of days to extend the time range before and after the event.
         useLogScale (bool): Whether to use a logarithmic scale for the y-axis.
+        event_windows (EventWindows): Optional windows of the same events, extracted with `extend_days`.
     """
-    
-    for idx, row in decay_events_df.iterrows():
-        event_number = row["Event Number"]
-        
-        start_time = pd.to_datetime(f"{int(row['Start Year'])}-{row['Start Fractional Day']:.5f}", format="%Y-%j.%f")
-        end_time = pd.to_datetime(f"{int(row['End Year'])}-{row['End Fractional Day']:.5f}", format="%Y-%j.%f")
+    if len(decay_events_df) == 0:
+        print("No decay events found to plot.")
+        return
 
-        extended_start_time = start_time - pd.Timedelta(days=extend_days)
-        extended_end_time = end_time + pd.Timedelta(days=extend_days)
-        
-        time_mask = (datetime_values >= extended_start_time) & (datetime_values <= extended_end_time)
+    cube = as_cube(data_3d, datetime_values, element_mapping)
+    event_windows = _resolve_event_windows(decay_events_df, cube, extend_days, range(1, energy_levels + 1), event_windows)
+
+    for event_number, window in zip(decay_events_df["Event Number"], event_windows):
+        start_time, end_time = window.start_time, window.end_time
         
-        num_elements = len(element_mapping)
+        num_elements = len(cube.element_mapping)
         num_cols = 3
         num_rows = int(np.ceil(num_elements / num_cols))
         
@@ -132,14 +145,11 @@ def plot_decay_events_per_element(decay_events_df, data_3d, datetime_values, ele
         lines = []
         labels = []
         
-        for i, (element_name, element_index) in enumerate(element_mapping.items()):
+        for i, element_name in enumerate(cube.element_mapping):
             ax = axes[i]
             
             for level in range(energy_levels):
-                element_flux = data_3d[level, time_mask, element_index]
-                valid_data_mask = element_flux != -999.9
-                element_flux = element_flux[valid_data_mask]
-                element_time = datetime_values[time_mask][valid_data_mask]
+                element_flux, element_time = window.valid_series(level + 1, element_name)
                 
                 line, = ax.plot(element_time, element_flux, label=f"Energy Level {level+1}")
                 
@@ -153,11 +163,7 @@ def plot_decay_events_per_element(decay_events_df, data_3d, datetime_values, ele
             ax.set_xlabel("Day of Year")
             ax.set_ylabel("Log Flux" if useLogScale else "Flux")
             ax.set_title(f"{element_name}")
-            ax.grid(True)
-
-            ax.xaxis.set_major_locator(mdates.DayLocator())
-            ax.xaxis.set_major_formatter(mdates.DateFormatter("%j"))
-            ax.xaxis.set_minor_locator(mdates.HourLocator(byhour=12))
+            _setup_event_axis(ax)
             plt.setp(ax.get_xticklabels(), rotation=45, ha="right")
             ax.axvline(start_time, color="black", linestyle="--", linewidth=1)
             ax.axvline(end_time, color="black", linestyle="--", linewidth=1)
@@ -176,37 +182,378 @@ def plot_decay_events_per_element(decay_events_df, data_3d, datetime_values, ele
 
 
 
+# Headless export. The functions below render the same plots as `plot_all_decay_events`
+# and `plot_decay_events_per_element` straight to PNG files with the Agg canvas, without
+# pyplot or an interactive backend. The parent process cuts the event windows out of the
+# cube and workers in a process pool render them. Each worker builds the figure and axes
+# of a layout once and only swaps the lines, titles and limits for every following page,
+# since creating axes and their tick machinery is most of matplotlib's cost. A manifest in
+# the output folder holds a digest of the data and layout behind each image, and images
+# whose digest has not changed are not rendered again.
+
+# Bump to re-render every image after changing how the figures look
+RENDER_VERSION = 3
+
+# Most labeled days on the time axis of an exported panel. Longer windows are labeled every
+# few days, since drawing the ticks and their labels is most of the time an image takes
+MAX_EXPORT_DAY_TICKS = 8
+
+RENDER_MANIFEST = "render_manifest.json"
+
+# Figures of the current pool worker, keyed by layout. Workers exit with their pool, so
+# the figures live as long as one export; serial exports keep theirs in a local dict
+_render_figures = {}
+
+
+def export_all_decay_events(decay_events_df, data_3d, datetime_values, element_mapping, energy_level, extend_days, useLogScale,
+                            output_dir, events_per_page=20, dpi=100, max_workers=None, event_windows=None):
+    """
+    Renders the plots of `plot_all_decay_events` to fixed-size PNG pages without showing them.
+
+    Args:
+        decay_events_df (pd.DataFrame): DataFrame containing decay event details.
+        data_3d (numpy.ndarray or SISCube): The 3D data cube (energy, time, element).
+        datetime_values (numpy.ndarray): Array of datetime64 values for the time axis (None if `data_3d` is a SISCube).
+        element_mapping (dict): Dictionary mapping element names to array indices (None if `data_3d` is a SISCube).
+        energy_level (int): The energy level to analyze.
+        extend_days (int): Number of days to extend the time range before and after the event.
+        useLogScale (bool): Whether to use a logarithmic scale for the y-axis.
+        output_dir (str): Folder the pages are written to, as `decay_events_page_<n>.png`.
+        events_per_page (int): Number of events per page, in rows of 5.
+        dpi (int): Resolution of the PNG files.
+        max_workers (int): Number of worker processes. Defaults to one per CPU, 1 renders in the current process.
+        event_windows (EventWindows): Optional windows of the same events, extracted with `extend_days`.
+
+    Returns:
+        list: Paths of all pages, including the ones that were already up to date.
+    """
+    cube = as_cube(data_3d, datetime_values, element_mapping)
+    element_names = list(cube.element_mapping)
+    event_windows = _resolve_event_windows(decay_events_df, cube, extend_days, [energy_level], event_windows)
+
+    num_cols = 5
+    num_rows = int(np.ceil(events_per_page / num_cols))
+    layout = {
+        "num_rows": num_rows, "num_cols": num_cols, "figsize": (20, 4 * num_rows), "dpi": dpi,
+        "use_log_scale": bool(useLogScale), "sharey": True, "series_labels": element_names,
+        "y_label": "Log Flux (particles/(cm² Sr sec MeV/nucleon))", "y_label_first_column_only": True,
+        "figure_legend": True,
+    }
+
+    jobs = []
+    for page_start in range(0, len(event_windows), events_per_page):
+        panels = []
+        for event in range(page_start, min(page_start + events_per_page, len(event_windows))):
+            window = event_windows.event(event)
+            panels.append({
+                "title": f"Event {event + 1} ({window.start_time.year})",
+                "start_time": window.start_time,
+                "end_time": window.end_time,
+                "series": [window.valid_series(energy_level, element_name) for element_name in element_names],
+            })
+        page_path = os.path.join(output_dir, f"decay_events_page_{page_start // events_per_page + 1:03d}.png")
+        jobs.append({"path": page_path, "layout": layout, "panels": panels, "suptitle": None})
+
+    return _render_jobs(jobs, output_dir, max_workers)
+
+
+def export_decay_events_per_element(decay_events_df, data_3d, datetime_values, element_mapping, energy_levels, extend_days,
+                                    useLogScale, output_dir, dpi=100, max_workers=None, event_windows=None):
+    """
+    Renders the plots of `plot_decay_events_per_element` to one PNG per event without showing them.
+
+    Args:
+        decay_events_df (pd.DataFrame): DataFrame containing decay event details.
+        data_3d (numpy.ndarray or SISCube): The 3D data cube (energy, time, element).
+        datetime_values (numpy.ndarray): Array of datetime64 values for the time axis (None if `data_3d` is a SISCube).
+        element_mapping (dict): Dictionary mapping element names to array indices (None if `data_3d` is a SISCube).
+        energy_levels (int): Number of energy levels to analyze (starting from the lowest).
+        extend_days (int): Number of days to extend the time range before and after the event.
+        useLogScale (bool): Whether to use a logarithmic scale for the y-axis.
+        output_dir (str): Folder the images are written to, as `decay_event_<event number>.png`.
+        dpi (int): Resolution of the PNG files.
+        max_workers (int): Number of worker processes. Defaults to one per CPU, 1 renders in the current process.
+        event_windows (EventWindows): Optional windows of the same events, extracted with `extend_days`.
+
+    Returns:
+        list: Paths of all images, including the ones that were already up to date.
+    """
+    cube = as_cube(data_3d, datetime_values, element_mapping)
+    element_names = list(cube.element_mapping)
+    event_windows = _resolve_event_windows(decay_events_df, cube, extend_days, range(1, energy_levels + 1), event_windows)
+    event_numbers = decay_events_df["Event Number"] if "Event Number" in decay_events_df else range(1, len(decay_events_df) + 1)
+
+    num_cols = 3
+    num_rows = int(np.ceil(len(element_names) / num_cols))
+    layout = {
+        "num_rows": num_rows, "num_cols": num_cols, "figsize": (20, 4 * num_rows), "dpi": dpi,
+        "use_log_scale": bool(useLogScale), "sharey": True,
+        "series_labels": [f"Energy Level {level + 1}" for level in range(energy_levels)],
+        "y_label": "Log Flux" if useLogScale else "Flux", "y_label_first_column_only": False,
+        "figure_legend": False,
+    }
+
+    jobs = []
+    for event_number, window in zip(event_numbers, event_windows):
+        start_time = window.start_time
+        panels = [{
+            "title": f"{element_name}",
+            "start_time": start_time,
+            "end_time": window.end_time,
+            "series": [window.valid_series(level + 1, element_name) for level in range(energy_levels)],
+        } for element_name in element_names]
+        jobs.append({
+            "path": os.path.join(output_dir, f"decay_event_{event_number}.png"),
+            "layout": layout,
+            "panels": panels,
+            "suptitle": f"Decay Event {event_number} ({start_time.year})",
+        })
+
+    return _render_jobs(jobs, output_dir, max_workers)
+
+
+def _resolve_event_windows(decay_events_df, cube, extend_days, energy_levels, event_windows):
+    """
+    Checks that given event windows fit the catalog, or extracts the catalog's windows from the cube.
+
+    Returns:
+        EventWindows: The extended window of every catalog event.
+    """
+    if event_windows is None:
+        return EventWindows.from_catalog(decay_events_df, cube, extend_days=extend_days, energy_levels=energy_levels)
+    if len(event_windows) != len(decay_events_df) or event_windows.extend_days != extend_days:
+        raise ValueError("event_windows were extracted for different events or a different extend_days")
+    return event_windows
+
+
+def _job_digest(job):
+    """
+    Digest of everything that goes into an image, used to skip images that are up to date.
+    """
+    digest = hashlib.sha1(f"{RENDER_VERSION} {json.dumps(job['layout'], sort_keys=True)} {job['suptitle']}".encode())
+    for panel in job["panels"]:
+        digest.update(f"{panel['title']} {panel['start_time']} {panel['end_time']}".encode())
+        for flux, times in panel["series"]:
+            digest.update(np.ascontiguousarray(flux).tobytes())
+            digest.update(np.ascontiguousarray(times).tobytes())
+    return digest.hexdigest()
+
+
+def _render_jobs(jobs, output_dir, max_workers):
+    """
+    Renders the jobs whose images are missing or out of date and updates the manifest.
+
+    Returns:
+        list: The image paths of all jobs.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, RENDER_MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    digests = [_job_digest(job) for job in jobs]
+    stale = [
+        job for job, digest in zip(jobs, digests)
+        if manifest.get(os.path.basename(job["path"])) != digest or not os.path.exists(job["path"])
+    ]
+
+    max_workers = resolve_max_workers(max_workers, len(stale))
+    if max_workers <= 1:
+        # Reuse figures within this export only, and release them when it is done
+        figures = {}
+        try:
+            for job in stale:
+                _render_job(job, figures)
+        finally:
+            for fig, *_ in figures.values():
+                fig.clear()
+    elif stale:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(_render_job, stale, chunksize=max(1, len(stale) // (4 * max_workers))))
+
+    for job, digest in zip(jobs, digests):
+        manifest[os.path.basename(job["path"])] = digest
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    return [job["path"] for job in jobs]
+
+
+def _render_figure(layout, figures):
+    """
+    Returns the figure for a layout from `figures`, creating its axes and legend on first use.
+    """
+    key = json.dumps(layout, sort_keys=True)
+    if key not in figures:
+        fig = Figure(figsize=layout["figsize"], dpi=layout["dpi"])
+        FigureCanvasAgg(fig)
+        axes = fig.subplots(layout["num_rows"], layout["num_cols"], sharey=layout["sharey"], squeeze=False).ravel()
+        colors = [f"C{i % 10}" for i in range(len(layout["series_labels"]))]
+
+        for i, ax in enumerate(axes):
+            if layout["use_log_scale"]:
+                ax.set_yscale("log")
+            ax.set_xlabel("Day of Year")
+            if not layout["y_label_first_column_only"] or i % layout["num_cols"] == 0:
+                ax.set_ylabel(layout["y_label"])
+            _setup_event_axis(ax)
+            # No minor ticks: the half-day and log-decade subdivisions cost more to draw than the
+            # data lines, and the grid only follows the labeled days and decades anyway
+            ax.xaxis.set_minor_locator(mticker.NullLocator())
+            ax.yaxis.set_minor_locator(mticker.NullLocator())
+            # Rotated like the interactive plots; "xtick" mode right-aligns them, and unlike
+            # setting the labels directly it also applies to ticks created for later pages
+            ax.tick_params(axis="x", labelrotation=45, labelrotation_mode="xtick")
+            # Fixed label and title positions: the rotated day numbers always take the same
+            # space, so matplotlib does not have to measure every tick label to place them
+            ax.xaxis.set_label_coords(0.5, 0, transform=offset_copy(ax.transAxes, fig, y=-36, units="points"))
+            ax.yaxis.set_label_coords(0, 0.5, transform=offset_copy(ax.transAxes, fig, x=-40, units="points"))
+
+        # The series lines and the two event boundaries of every panel, whose data is swapped for each page
+        lines = [[ax.plot([], [], color=color)[0] for color in colors] for ax in axes]
+        boundaries = [[ax.axvline(0, color="black", linestyle="--", linewidth=1) for _ in range(2)] for ax in axes]
+
+        handles = [Line2D([], [], color=color) for color in colors]
+        if layout["figure_legend"]:
+            fig.legend(handles, layout["series_labels"], loc="upper center", ncol=len(handles), bbox_to_anchor=(0.5, 0.995))
+            fig.subplots_adjust(left=0.05, right=0.98, bottom=0.07, top=0.93, hspace=0.6, wspace=0.08)
+        else:
+            axes[0].legend(handles, layout["series_labels"], loc="upper right", bbox_to_anchor=(1, 1))
+            fig.subplots_adjust(left=0.05, right=0.98, bottom=0.07, top=0.9, hspace=0.6, wspace=0.15)
+        figures[key] = (fig, axes, lines, boundaries)
+    return figures[key]
+
+
+def _render_job(job, figures=None):
+    """
+    Draws one page or event image with the reusable figure of its layout and writes it to disk.
+
+    Args:
+        job (dict): The image to render, see `_render_jobs`.
+        figures (dict): Figures to reuse, keyed by layout. Defaults to the pool worker's `_render_figures`.
+    """
+    if figures is None:
+        figures = _render_figures
+    fig, axes, lines, boundaries = _render_figure(job["layout"], figures)
+
+    panels = job["panels"] + [None] * (len(axes) - len(job["panels"]))
+    for ax, panel_lines, panel_boundaries, panel in zip(axes, lines, boundaries, panels):
+        if panel is None:
+            # Hidden panels share the y-axis too, so drop the previous page's data from its limits.
+            # relim() would keep the smallest positive value that log scaling pads the limits from
+            for line in panel_lines:
+                line.set_data([], [])
+            ax.dataLim = Bbox.null()
+            ax.set_visible(False)
+            continue
+        ax.set_visible(True)
+
+        for line, (flux, times) in zip(panel_lines, panel["series"]):
+            line.set_data(times, flux)
+        ax.set_title(panel["title"], y=1)
+        # Lines to separate out extra days added before and after each event on plot
+        for line, boundary in zip(panel_boundaries, (panel["start_time"], panel["end_time"])):
+            line.set_xdata([boundary, boundary])
+        ax.relim()
+
+    for ax in axes:
+        ax.autoscale_view()
+        if ax.get_visible():
+            span_days = np.diff(ax.get_xlim())[0]
+            ax.xaxis.set_major_locator(mdates.DayLocator(interval=max(1, int(np.ceil(span_days / MAX_EXPORT_DAY_TICKS)))))
+
+    if job["suptitle"] is not None:
+        fig.suptitle(job["suptitle"], fontsize=16)
+    # Fast zlib setting: the files come out somewhat larger but encode several times quicker
+    fig.savefig(job["path"], pil_kwargs={"compress_level": 1})
+
+
+
+
+
 import plotly.graph_objects as go
-import pandas as pd
 from plotly.subplots import make_subplots
 
-def create_interactive_plot_with_events(data_3d, datetime_values, element_mapping, energy_level, start_time, end_time, output_html, decay_events_df):
+def _min_max_downsample(times, values, range_start, range_end, num_bins):
+    """
+    Reduces a series to the smallest and largest sample of each of `num_bins` equal time bins.
+
+    Keeping both extremes of every bin preserves peaks, dips and the envelope of the curve,
+    so the plot looks the same at screen resolution with at most 2 * num_bins points.
+
+    Args:
+        times (numpy.ndarray): Sorted datetime64 values.
+        values (numpy.ndarray): The values at those times.
+        range_start (numpy.datetime64): Start of the binned range.
+        range_end (numpy.datetime64): End of the binned range.
+        num_bins (int): Number of time bins.
+
+    Returns:
+        numpy.ndarray: The kept times, in time order.
+        numpy.ndarray: The kept values.
+    """
+    if len(values) <= 2 * num_bins or range_end <= range_start:
+        return times, values
+
+    # Bins are the same for every series of the plot, so their extremes line up
+    bin_width = (range_end - range_start) / num_bins
+    sample_bin = np.clip((times - range_start) // bin_width, 0, num_bins - 1)
+    bin_starts = np.flatnonzero(np.r_[True, sample_bin[1:] != sample_bin[:-1]])
+    bin_lengths = np.diff(np.r_[bin_starts, len(values)])
+    bin_of_sample = np.repeat(np.arange(len(bin_starts)), bin_lengths)
+
+    # First sample of each bin that attains the bin's minimum or maximum
+    keep = np.zeros(len(values), dtype=bool)
+    for bin_extreme in (np.minimum.reduceat(values, bin_starts), np.maximum.reduceat(values, bin_starts)):
+        at_extreme = np.flatnonzero(values == bin_extreme[bin_of_sample])
+        keep[at_extreme[np.unique(bin_of_sample[at_extreme], return_index=True)[1]]] = True
+    return times[keep], values[keep]
+
+
+def create_interactive_plot_with_events(data_3d, datetime_values, element_mapping, energy_level, start_time, end_time, output_html, decay_events_df,
+                                        max_points_per_series=None, use_webgl=False, include_plotlyjs=True, show=True):
     """
     Creates an interactive Plotly plot of flux data with start (green) and stop (red) lines for events 
     from the provided decay_events_df DataFrame.
+
+    For long time ranges, `max_points_per_series` keeps the HTML file small and quick to load:
+    every series is reduced to the minimum and maximum of equal time bins, so its size no longer
+    grows with the length of the range. The event lines of all events are always drawn as one
+    trace per kind, with gaps between events.
     
     Args:
-        data_3d (numpy.ndarray): The 3D data cube (energy, time, element).
-        datetime_values (numpy.ndarray): Array of datetime objects.
-        element_mapping (dict): Element name to array index mapping.
+        data_3d (numpy.ndarray or SISCube): The 3D data cube (energy, time, element).
+        datetime_values (numpy.ndarray): Array of datetime64 values (None if `data_3d` is a SISCube).
+        element_mapping (dict): Element name to array index mapping (None if `data_3d` is a SISCube).
         energy_level (int): The energy level to analyze.
         start_time (pd.Timestamp): Start time for the plot range.
         end_time (pd.Timestamp): End time for the plot range.
         output_html (str): Path to the output HTML file.
         decay_events_df (pd.DataFrame): DataFrame containing decay events with columns 'Start Year', 'End Year', 
-                                        'Start Fractional Day', 'End Fractional Day', 'Start Hour', 'End Hour'.
+                                        'Start Fractional Day', 'End Fractional Day'.
+        max_points_per_series (int): Upper limit on the points plotted per element, None plots every sample.
+        use_webgl (bool): Whether to draw the series with WebGL (`go.Scattergl`), which stays smooth with many points.
+        include_plotlyjs (bool or str): Passed to `fig.write_html`; "cdn" loads plotly.js from the web
+            instead of embedding its ~4 MB in the file.
+        show (bool): Whether to open the plot after writing the HTML file.
     """
-    # Time mask
-    time_mask = (datetime_values >= start_time) & (datetime_values <= end_time)
-    
-    # Helium flux
-    helium_index = element_mapping['He']
-    helium_flux = data_3d[energy_level - 1, time_mask, helium_index]
-    
-    # Omit bad data points
-    valid_data_mask = helium_flux != -999.9
-    helium_flux = helium_flux[valid_data_mask]
-    helium_time = datetime_values[time_mask][valid_data_mask]
+    # View of the cube within the plot range
+    window = as_cube(data_3d, datetime_values, element_mapping).window(start_time, end_time)
+    range_start = pd.Timestamp(start_time).to_datetime64()
+    range_end = pd.Timestamp(end_time).to_datetime64()
+    scatter = go.Scattergl if use_webgl else go.Scatter
+
+    def plotted_series(element_name):
+        element_flux, element_time = window.valid_series(energy_level, element_name)
+        if max_points_per_series is not None:
+            element_time, element_flux = _min_max_downsample(element_time, element_flux, range_start, range_end,
+                                                             max(1, max_points_per_series // 2))
+        return element_flux, element_time
+
+    # Helium flux, omitting bad data points
+    helium_flux, helium_time = window.valid_series(energy_level, 'He')
 
     if len(helium_flux) == 0:
         print("No valid helium data in the specified time range.")
@@ -216,40 +563,32 @@ def create_interactive_plot_with_events(data_3d, datetime_values, element_mappin
     fig = make_subplots(rows=1, cols=1)
 
     # Plot the helium flux data
-    fig.add_trace(go.Scatter(x=helium_time, y=helium_flux, mode='lines', name='Helium Flux', line=dict(color='blue')))
+    plotted_helium_flux, plotted_helium_time = plotted_series('He')
+    fig.add_trace(scatter(x=plotted_helium_time, y=plotted_helium_flux, mode='lines', name='Helium Flux', line=dict(color='blue')))
     
-    # Plot the start and stop lines for decay events from decay_events_df
-    for _, row in decay_events_df.iterrows():
-        start_year = int(row['Start Year'])
-        end_year = int(row['End Year'])
-        start_frac_day = row['Start Fractional Day']
-        end_frac_day = row['End Fractional Day']
-        start_hour = row['Start Hour']
-        end_hour = row['End Hour']
-        
-        # Convert fractional days and hours to datetime
-        start_datetime = pd.to_datetime(f'{start_year}-01-01') + pd.to_timedelta(start_frac_day - 1, unit='D') + pd.to_timedelta(start_hour, unit='h')
-        end_datetime = pd.to_datetime(f'{end_year}-01-01') + pd.to_timedelta(end_frac_day - 1, unit='D') + pd.to_timedelta(end_hour, unit='h')
-        
-        fig.add_trace(go.Scatter(x=[start_datetime, start_datetime], y=[min(helium_flux), max(helium_flux)], 
-                                 mode='lines', name='Decay Start', line=dict(color='green', dash='dash'), showlegend=False))
-        fig.add_trace(go.Scatter(x=[end_datetime, end_datetime], y=[min(helium_flux), max(helium_flux)], 
-                                 mode='lines', name='Decay End', line=dict(color='red', dash='dash'), showlegend=False))
+    # Plot the start and stop lines of the events in the plot range, each kind as a single
+    # trace of vertical segments separated by gaps. An empty catalog draws only the flux.
+    if len(decay_events_df):
+        event_starts, event_ends = event_times(decay_events_df)
+        in_range = (event_ends >= range_start) & (event_starts <= range_end)
+        flux_range = [helium_flux.min(), helium_flux.max(), None]
+        for boundaries, name, color in ((event_starts[in_range], 'Decay Start', 'green'), (event_ends[in_range], 'Decay End', 'red')):
+            boundary_times = pd.DatetimeIndex(boundaries)
+            x_values = [boundary_time for boundary_time in boundary_times for _ in range(3)]
+            fig.add_trace(go.Scatter(x=x_values, y=flux_range * len(boundary_times), mode='lines', name=name,
+                                     line=dict(color=color, dash='dash'), showlegend=False, connectgaps=False))
     
     # Plot other elements
-    for element_name, element_index in element_mapping.items():
+    for element_name in window.element_mapping:
         if element_name == 'He':
             continue
         
-        element_flux = data_3d[energy_level - 1, time_mask, element_index]
-        valid_data_mask = element_flux != -999.9
-        element_flux = element_flux[valid_data_mask]
-        element_time = datetime_values[time_mask][valid_data_mask]
+        element_flux, element_time = plotted_series(element_name)
 
         if len(element_flux) == 0:
             continue
         
-        fig.add_trace(go.Scatter(x=element_time, y=element_flux, mode='lines', name=f'{element_name} Flux'))
+        fig.add_trace(scatter(x=element_time, y=element_flux, mode='lines', name=f'{element_name} Flux'))
 
     # Update layout for better visibility and horizontal scrolling
     fig.update_layout(
@@ -265,5 +604,6 @@ def create_interactive_plot_with_events(data_3d, datetime_values, element_mappin
     )
 
     # Save and show the plot
-    fig.write_html(output_html)
-    fig.show()
\ No newline at end of file
+    fig.write_html(output_html, include_plotlyjs=include_plotlyjs)
+    if show:
+        fig.show()
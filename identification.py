@@ -1,7 +1,12 @@
+import logging
+
 import numpy as np
 import pandas as pd
 from scipy.ndimage import gaussian_filter1d
-from scipy.stats import linregress
+
+from cube import as_cube
+from event_windows import EventWindows
+from instrumentation import resolve_stats
 
 """The function below uses a sliding window approach, where a fixed-size w
 indow (specified by `window_size`) is moved across the logarithmic flux data. 
@@ -19,99 +24,209 @@ is within the current segment being considered. If the segments are close enough
 This merging is done iteratively to cover all identified decay periods."""
 
 
+logger = logging.getLogger(__name__)
+
 
-def identify_exponential_decays(flux_data, time_data, window_size, slope_threshold, r_value_threshold):
+def _smoothed_log_flux(flux_data):
     """
-    Identifies exponential decay segments in flux data using linear regression.
+    Log-transforms and smooths flux data the way the decay detection expects it.
 
     Args:
         flux_data (numpy.ndarray): Array of flux values.
-        time_data (numpy.ndarray): Array of corresponding datetime values.
-        window_size (int): Size of the sliding window for linear regression (in hours).
-        slope_threshold (float): Threshold for the slope to identify a decay.
-        r_value_threshold (float): Minimum correlation coefficient (r-value) for considering a fit.
 
     Returns:
-        list: List of tuples containing start and end times of decay segments.
+        numpy.ndarray: Gaussian-smoothed log10 flux, NaN where the flux is non-positive.
     """
     # Replace non-positive flux values with NaN for logarithmic transformation
     flux_data = np.where(flux_data > 0, flux_data, np.nan)
-    
+
     # Log-transform the flux data
     log_flux_data = np.log10(flux_data)
-    
+
     # Apply Gaussian smoothing to the log-transformed flux data
-    log_flux_data = gaussian_filter1d(log_flux_data, sigma=1)
+    return gaussian_filter1d(log_flux_data, sigma=1)
 
-    decays = []
-    # Iterate over the data using a sliding window
-    for i in range(len(log_flux_data) - window_size):
-        window = log_flux_data[i:i + window_size]
-        
-        # Skip windows with NaN values
-        if np.isnan(window).any():
+
+def _sliding_window_regression(log_flux_data, window_size, chunk_size=65536, stats=None):
+    """
+    Computes the least-squares slope and r-value of every sliding window in one batched pass.
+
+    This gives the same numbers as running `scipy.stats.linregress(np.arange(window_size), window)`
+    on each window, but works on blocks of windows at a time instead of one Python call per window.
+    Only the window starts `0 .. len(log_flux_data) - window_size - 1` are evaluated, matching the
+    original loop.
+
+    Args:
+        log_flux_data (numpy.ndarray): Smoothed log flux values.
+        window_size (int): Size of the sliding window (in samples).
+        chunk_size (int): Number of windows evaluated per block, bounds the temporary memory used.
+        stats (PipelineStats): Optional stats that count the windows evaluated, skipped and regressed.
+
+    Returns:
+        numpy.ndarray: Slope of each window, NaN for windows containing NaN values.
+        numpy.ndarray: r-value of each window, NaN for windows containing NaN values.
+    """
+    num_windows = max(len(log_flux_data) - window_size, 0)
+    slopes = np.full(num_windows, np.nan)
+    r_values = np.full(num_windows, np.nan)
+    if num_windows == 0:
+        return slopes, r_values
+
+    # Mask out windows containing NaN values in bulk with a running count of NaNs
+    nan_counts = np.concatenate(([0], np.cumsum(np.isnan(log_flux_data))))
+    valid_windows = (nan_counts[window_size:window_size + num_windows] - nan_counts[:num_windows]) == 0
+
+    stats = resolve_stats(stats)
+    if stats.enabled:
+        num_valid = int(np.count_nonzero(valid_windows))
+        stats.count("windows_evaluated", num_windows)
+        stats.count("nan_windows_skipped", num_windows - num_valid)
+        stats.count("regressions", num_valid)
+
+    # The x values are the same for every window, so their centred sums are computed once
+    x_centered = np.arange(window_size) - (window_size - 1) / 2
+    ssxm = np.dot(x_centered, x_centered) / window_size
+
+    windows = np.lib.stride_tricks.sliding_window_view(log_flux_data, window_size)
+    for block_start in range(0, num_windows, chunk_size):
+        block_end = min(block_start + chunk_size, num_windows)
+        block_valid = np.flatnonzero(valid_windows[block_start:block_end]) + block_start
+        if len(block_valid) == 0:
             continue
-        
-        # Perform linear regression on the windowed data
-        slope, intercept, r_value, p_value, std_err = linregress(np.arange(window_size), window)
-        
-        # Check if the slope and correlation coefficient meet the decay criteria
-        if slope < slope_threshold and abs(r_value) > r_value_threshold:
-            start_time = time_data[i]
-            end_time = time_data[i + window_size - 1]
-            decays.append((start_time, end_time))
 
-    # Merge overlapping decay segments
-    merged_decays = []
-    for start, end in decays:
-        if merged_decays and start <= merged_decays[-1][1] + (time_data[1] - time_data[0]):
-            merged_decays[-1] = (merged_decays[-1][0], max(merged_decays[-1][1], end))
-        else:
-            merged_decays.append((start, end))
+        # Centre each window on its mean before forming the cross products, as linregress does
+        block = windows[block_valid]
+        block = block - block.mean(axis=1, keepdims=True)
+        ssxym = block @ x_centered / window_size
+        ssym = np.einsum("ij,ij->i", block, block) / window_size
+
+        slopes[block_valid] = ssxym / ssxm
+        # linregress reports r = 0 for constant windows and clips r to [-1, 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = ssxym / np.sqrt(ssxm * ssym)
+        r_values[block_valid] = np.clip(np.where(ssym == 0, 0.0, r), -1.0, 1.0)
+
+    return slopes, r_values
+
+
+def _decay_window_mask(log_flux_data, window_size, slope_threshold, r_value_threshold, stats=None):
+    """
+    Flags every sliding window whose regression meets the decay criteria.
+
+    Args:
+        log_flux_data (numpy.ndarray): Smoothed log flux values.
+        window_size (int): Size of the sliding window (in samples).
+        slope_threshold (float): Threshold for the slope to identify a decay.
+        r_value_threshold (float): Minimum correlation coefficient (r-value) for considering a fit.
+        stats (PipelineStats): Optional stats passed on to `_sliding_window_regression`.
+
+    Returns:
+        numpy.ndarray: Boolean array with one entry per window start.
+    """
+    slopes, r_values = _sliding_window_regression(log_flux_data, window_size, stats=stats)
+    # NaN windows compare as False, so they are skipped here
+    return (slopes < slope_threshold) & (np.abs(r_values) > r_value_threshold)
+
+
+def _merge_decay_windows(window_starts, time_data, window_size):
+    """
+    Merges overlapping or adjacent decay windows into continuous segments.
+
+    Args:
+        window_starts (numpy.ndarray): Sorted start indices of the windows that met the decay criteria.
+        time_data (numpy.ndarray): Array of corresponding datetime values.
+        window_size (int): Size of the sliding window (in samples).
+
+    Returns:
+        list: List of tuples containing start and end times of decay segments.
+    """
+    if len(window_starts) == 0:
+        return []
+
+    start_times = time_data[window_starts]
+    end_times = time_data[window_starts + window_size - 1]
+
+    # A window starts a new segment when it begins more than one time step after the previous
+    # window ended. Window ends grow with the start index, so each segment ends where its last window ends.
+    time_step = time_data[1] - time_data[0]
+    new_segment = np.concatenate(([True], start_times[1:] > end_times[:-1] + time_step))
+    segment_first = np.flatnonzero(new_segment)
+    segment_last = np.concatenate((segment_first[1:], [len(window_starts)])) - 1
+
+    return list(zip(start_times[segment_first], end_times[segment_last]))
+
+
+def identify_exponential_decays(flux_data, time_data, window_size, slope_threshold, r_value_threshold, stats=None):
+    """
+    Identifies exponential decay segments in flux data using linear regression.
+
+    Args:
+        flux_data (numpy.ndarray): Array of flux values.
+        time_data (numpy.ndarray): Array of corresponding datetime values.
+        window_size (int): Size of the sliding window for linear regression (in hours).
+        slope_threshold (float): Threshold for the slope to identify a decay.
+        r_value_threshold (float): Minimum correlation coefficient (r-value) for considering a fit.
+        stats (PipelineStats): Optional stats that record the window counters.
+
+    Returns:
+        list: List of tuples containing start and end times of decay segments.
+    """
+    # Log-transform and smooth the flux data
+    log_flux_data = _smoothed_log_flux(flux_data)
 
-    return merged_decays
+    # Evaluate every sliding window at once and keep the ones that meet the decay criteria
+    decay_windows = _decay_window_mask(log_flux_data, window_size, slope_threshold, r_value_threshold, stats=stats)
+
+    # Merge overlapping decay segments
+    return _merge_decay_windows(np.flatnonzero(decay_windows), time_data, window_size)
 
 
-def count_elements_decaying_in_window(data_3d, datetime_values, element_mapping, energy_level, start_time, end_time, window_size_for_decay_count, slope_threshold, r_value_threshold):
+def count_elements_decaying_in_window(data_3d, datetime_values, element_mapping, energy_level, start_time, end_time, window_size_for_decay_count, slope_threshold, r_value_threshold, stats=None):
     """
     Counts the number of elements with exponential decays within a given time window.
     
     Args:
-        data_3d (numpy.ndarray): The 3D data cube (energy, time, element).
-        datetime_values (numpy.ndarray): Array of datetime objects.
-        element_mapping (dict): Element name to array index mapping.
+        data_3d (numpy.ndarray or SISCube): The 3D data cube (energy, time, element).
+        datetime_values (numpy.ndarray): Array of datetime64 values (None if `data_3d` is a SISCube).
+        element_mapping (dict): Element name to array index mapping (None if `data_3d` is a SISCube).
         energy_level (int): The energy level to analyze.
         start_time (pd.Timestamp): Start time for the time window.
         end_time (pd.Timestamp): End time for the time window.
         window_size_for_decay_count (int): Size of the sliding window for decay detection (in hours).
         slope_threshold (float): Threshold for the slope to identify a decay.
         r_value_threshold (float): Minimum correlation coefficient (r-value) for considering a fit.
+        stats (PipelineStats): Optional stats that record the window counters.
 
     Returns:
         set: The set of elements that decay within the time window.
     """
-    # Create a time mask to filter data within the specified time window
-    time_mask = (datetime_values >= start_time) & (datetime_values <= end_time)
+    # View of the cube within the specified time window
+    window = as_cube(data_3d, datetime_values, element_mapping).window(start_time, end_time)
+    return _decaying_elements(window, energy_level, window_size_for_decay_count, slope_threshold, r_value_threshold, stats)
+
+
+def _decaying_elements(window, energy_level, window_size_for_decay_count, slope_threshold, r_value_threshold, stats):
+    """
+    Finds the elements (excluding helium) with a decay in a cube window or an `EventWindow`.
+
+    Returns:
+        set: The set of elements that decay within the window.
+    """
     decaying_elements = set()
 
     # Iterate through each element (excluding helium) to check for decays
-    for element_name, element_index in element_mapping.items():
+    for element_name in window.element_mapping:
         if element_name == 'He':
             continue
 
-        # Extract the flux data for the current element within the time window
-        element_flux = data_3d[energy_level - 1, time_mask, element_index]
-        
-        # Mask invalid data values
-        valid_data_mask = element_flux != -999.9
-        element_flux = element_flux[valid_data_mask]
-        element_time = datetime_values[time_mask][valid_data_mask]
+        # Extract the valid flux data for the current element within the time window
+        element_flux, element_time = window.valid_series(energy_level, element_name)
 
         if len(element_flux) == 0:
             continue
 
         # Identify decay segments for the current element
-        decays = identify_exponential_decays(element_flux, element_time, window_size_for_decay_count, slope_threshold, r_value_threshold)
+        decays = identify_exponential_decays(element_flux, element_time, window_size_for_decay_count, slope_threshold, r_value_threshold, stats=stats)
         
         # If decays are found, add the element to the decaying elements set
         if len(decays) > 0:
@@ -120,7 +235,213 @@ def count_elements_decaying_in_window(data_3d, datetime_values, element_mapping,
     return decaying_elements
 
 
-def compute_decay_events_for_all_data(data_3d, datetime_values, element_mapping, energy_level, he_flux_threshold, min_duration_hours, window_size, window_size_for_decay_count, slope_threshold, r_value_threshold):
+class DecaySegmentIndex:
+    """
+    Precomputed decay windows for every (energy level, element) pair over the whole timeline.
+
+    Building the index runs the sliding-window regression once per series. Asking which
+    elements decay inside an event window then becomes an interval lookup instead of
+    re-running `identify_exponential_decays` on each element's slice, and gives the same
+    answer as `count_elements_decaying_in_window`.
+
+    Windows in the interior of an event window are looked up in the index. The Gaussian
+    smoothing of a slice reflects at its edges, so the few windows within the smoothing
+    radius of either edge are recomputed from the slice itself.
+
+    Args:
+        data_3d (numpy.ndarray or SISCube): The 3D data cube (energy, time, element).
+        datetime_values (numpy.ndarray): Array of datetime64 values (None if `data_3d` is a SISCube).
+        element_mapping (dict): Element name to array index mapping (None if `data_3d` is a SISCube).
+        window_size (int): Size of the sliding window for decay detection (in hours).
+        slope_threshold (float): Threshold for the slope to identify a decay.
+        r_value_threshold (float): Minimum correlation coefficient (r-value) for considering a fit.
+        energy_levels (list): Energy levels to index. Defaults to every level in the cube.
+    """
+
+    # Reach of gaussian_filter1d(sigma=1): samples this close to a slice edge are smoothed differently
+    SMOOTHING_RADIUS = 4
+
+    def __init__(self, data_3d, datetime_values, element_mapping, window_size, slope_threshold, r_value_threshold, energy_levels=None):
+        self.cube = as_cube(data_3d, datetime_values, element_mapping)
+        self.window_size = window_size
+        self.slope_threshold = slope_threshold
+        self.r_value_threshold = r_value_threshold
+
+        if energy_levels is None:
+            energy_levels = range(1, self.cube.data_3d.shape[0] + 1)
+        self.energy_levels = list(energy_levels)
+
+        # (energy_level, element_name) -> (index of the first sample, index of the last sample)
+        # of every decay window, both on the full time axis
+        self._decay_windows = {}
+        for energy_level in self.energy_levels:
+            for element_name, element_index in self.cube.element_mapping.items():
+                valid_positions = np.flatnonzero(self.cube.valid_mask[energy_level - 1, :, element_index])
+
+                # Reuse the cube's smoothed series if it has one, without keeping all of them around
+                log_flux_data = self.cube.smoothed_log_flux(energy_level, element_name, cache=False)
+                window_starts = np.flatnonzero(_decay_window_mask(log_flux_data, window_size, slope_threshold, r_value_threshold))
+
+                self._decay_windows[energy_level, element_name] = (
+                    valid_positions[window_starts],
+                    valid_positions[window_starts + window_size - 1],
+                )
+
+    def decaying_elements(self, energy_level, start_time, end_time, exclude=("He",)):
+        """
+        Finds the elements with at least one decay window inside a time range.
+
+        Args:
+            energy_level (int): The energy level to analyze.
+            start_time (pd.Timestamp): Start time for the time window.
+            end_time (pd.Timestamp): End time for the time window.
+            exclude (tuple): Element names to leave out (helium by default, as in
+                `count_elements_decaying_in_window`).
+
+        Returns:
+            set: The set of elements that decay within the time window.
+        """
+        # Full-axis index range covered by [start_time, end_time]
+        time_slice = self.cube.time_slice(start_time, end_time)
+
+        decaying_elements = set()
+        for element_name, element_index in self.cube.element_mapping.items():
+            if element_name in exclude:
+                continue
+
+            element_flux = self.cube.data_3d[energy_level - 1, time_slice, element_index]
+            valid_positions = np.flatnonzero(self.cube.valid_mask[energy_level - 1, time_slice, element_index])
+            if self._slice_has_decay(energy_level, element_name, element_flux[valid_positions], valid_positions + time_slice.start):
+                decaying_elements.add(element_name)
+
+        return decaying_elements
+
+    def _slice_has_decay(self, energy_level, element_name, element_flux, valid_positions):
+        """
+        Checks whether `identify_exponential_decays` would find a decay in one element's slice.
+
+        Args:
+            energy_level (int): The energy level to analyze.
+            element_name (str): The element to check.
+            element_flux (numpy.ndarray): The valid flux values of the slice.
+            valid_positions (numpy.ndarray): Full-axis indices of those values.
+
+        Returns:
+            bool: True if any window of the slice meets the decay criteria.
+        """
+        window_size = self.window_size
+        radius = self.SMOOTHING_RADIUS
+        num_samples = len(element_flux)
+        criteria = (window_size, self.slope_threshold, self.r_value_threshold)
+
+        # Short slices are cheap enough to evaluate directly
+        if num_samples < window_size + 4 * radius:
+            return _decay_window_mask(_smoothed_log_flux(element_flux), *criteria).any()
+
+        # Interior windows (starts radius .. num_samples - window_size - radius) come from the index.
+        # Both arrays grow with the window start, so the first window starting inside the
+        # interior is also the first one that can end inside it.
+        window_first, window_last = self._decay_windows[energy_level, element_name]
+        k = np.searchsorted(window_first, valid_positions[radius], side="left")
+        if k < len(window_first) and window_last[k] <= valid_positions[num_samples - radius - 1]:
+            return True
+
+        # Windows starting in the first `radius` samples, smoothed with the slice's left edge
+        head = element_flux[:window_size + 2 * radius]
+        if _decay_window_mask(_smoothed_log_flux(head), *criteria)[:radius].any():
+            return True
+
+        # The last windows the slice evaluates, smoothed with its right edge
+        tail = element_flux[num_samples - window_size - 2 * radius + 1:]
+        return _decay_window_mask(_smoothed_log_flux(tail), *criteria)[radius:].any()
+
+
+def _shift_segment_starts(helium_flux, helium_time, start_indices, end_indices):
+    """
+    Moves segment starts back in time while the flux at the start is above the flux at the end and keeps falling.
+
+    Each step goes back by a twelfth of the segment's duration (at least 8 hours) to the last
+    sample at or before that time, and is taken only if the flux there is lower. All segments
+    step together, so each round is one vectorized binary search over the segments that are
+    still moving.
+
+    Args:
+        helium_flux (numpy.ndarray): Valid helium flux values.
+        helium_time (numpy.ndarray): Their sorted datetime64 values.
+        start_indices (numpy.ndarray): Index of each segment's first sample.
+        end_indices (numpy.ndarray): Index of each segment's last sample.
+
+    Returns:
+        numpy.ndarray: Index of each segment's refined first sample.
+        numpy.ndarray: Number of steps tried for each segment, 0 where the start was not shifted.
+    """
+    start_indices = np.array(start_indices, dtype=np.int64)
+    end_flux = helium_flux[end_indices]
+    duration_hours = (helium_time[end_indices] - helium_time[start_indices]) / np.timedelta64(1, "h")
+    shift_duration = np.maximum(8, duration_hours / 12).astype(np.int64).astype("timedelta64[h]")
+    shift_iterations = np.zeros(len(start_indices), dtype=np.int64)
+
+    active = np.flatnonzero(helium_flux[start_indices] > end_flux)
+    while len(active):
+        shift_iterations[active] += 1
+        current = start_indices[active]
+        # Last sample not later than the shifted start
+        shifted = np.searchsorted(helium_time, helium_time[current] - shift_duration[active], side="right") - 1
+        # Stop at the beginning of the data or where the flux no longer falls
+        moves = shifted >= 0
+        moves[moves] = helium_flux[shifted[moves]] < helium_flux[current[moves]]
+        active = active[moves]
+        start_indices[active] = shifted[moves]
+        active = active[helium_flux[start_indices[active]] > end_flux[active]]
+
+    return start_indices, shift_iterations
+
+
+def _durations_above_threshold(helium_flux, helium_time, start_indices, end_indices, he_flux_threshold):
+    """
+    Measures how long the helium flux stays above a threshold within each segment.
+
+    The duration runs from the segment's first sample at or above the threshold to the last
+    such sample that follows the previous one within an hour; segments without such a pair
+    have a duration of 0. The samples [start, end) of all segments are gathered into one flat
+    array, so the cost is proportional to the total length of the segments.
+
+    Args:
+        helium_flux (numpy.ndarray): Valid helium flux values.
+        helium_time (numpy.ndarray): Their sorted datetime64 values.
+        start_indices (numpy.ndarray): Index of each segment's first sample.
+        end_indices (numpy.ndarray): Index one past each segment's last considered sample.
+        he_flux_threshold (float): Minimum helium flux threshold.
+
+    Returns:
+        numpy.ndarray: Duration above the threshold of each segment, in hours.
+    """
+    num_segments = len(start_indices)
+    lengths = np.maximum(np.asarray(end_indices) - start_indices, 0)
+    segment = np.repeat(np.arange(num_segments), lengths)
+    sample = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(start_indices, lengths)
+
+    above = helium_flux[sample] >= he_flux_threshold
+    segment, above_times = segment[above], helium_time[sample[above]]
+
+    # Samples that follow the previous above-threshold sample of the same segment within an hour
+    continuous = np.flatnonzero((segment[1:] == segment[:-1]) & (np.diff(above_times) <= np.timedelta64(1, "h"))) + 1
+
+    durations = np.zeros(num_segments)
+    if len(continuous):
+        first_above = np.full(num_segments, np.datetime64("NaT", "ns"))
+        # Segments are in order, so the first sample of each segment's run is its first above-threshold sample
+        first_positions = np.flatnonzero(np.concatenate(([True], segment[1:] != segment[:-1])))
+        first_above[segment[first_positions]] = above_times[first_positions]
+        # Assigning in order leaves the last continuous sample of each segment
+        last_continuous = np.full(num_segments, np.datetime64("NaT", "ns"))
+        last_continuous[segment[continuous]] = above_times[continuous]
+        has_duration = ~np.isnat(last_continuous)
+        durations[has_duration] = (last_continuous[has_duration] - first_above[has_duration]) / np.timedelta64(1, "h")
+    return durations
+
+
+def compute_decay_events_for_all_data(data_3d, datetime_values, element_mapping, energy_level, he_flux_threshold, min_duration_hours, window_size, window_size_for_decay_count, slope_threshold, r_value_threshold, decay_index=None, stats=None):
     """
     Computes decay events for all available data, keeping only events where helium flux stays above the threshold
     for the specified duration, and counts the number of elements with exponential decays in each window.
@@ -128,9 +449,9 @@ def compute_decay_events_for_all_data(data_3d, datetime_values, element_mapping,
     This function utilizes "identify_exponential_decays" and "count_elements_decaying_in_window"
     
     Args:
-        data_3d (numpy.ndarray): The 3D data cube (energy, time, element).
-        datetime_values (numpy.ndarray): Array of datetime objects.
-        element_mapping (dict): Element name to array index mapping.
+        data_3d (numpy.ndarray or SISCube): The 3D data cube (energy, time, element).
+        datetime_values (numpy.ndarray): Array of datetime64 values (None if `data_3d` is a SISCube).
+        element_mapping (dict): Element name to array index mapping (None if `data_3d` is a SISCube).
         energy_level (int): The energy level to analyze.
         he_flux_threshold (float): Minimum helium flux threshold.
         min_duration_hours (int): Minimum duration (hours) above threshold.
@@ -138,133 +459,182 @@ def compute_decay_events_for_all_data(data_3d, datetime_values, element_mapping,
         window_size_for_decay_count (int): Size of the sliding window for counting decaying elements (in hours).
         slope_threshold (float): Threshold for the slope to identify a decay.
         r_value_threshold (float): Minimum correlation coefficient (r-value) for considering a fit.
+        decay_index (DecaySegmentIndex): Optional precomputed index built with `window_size_for_decay_count`
+            and the same thresholds. When given, decaying elements are looked up instead of recomputed per event.
+        stats (PipelineStats): Optional stats that collect the time spent in each stage (log_smooth,
+            regression_scan, merge, start_shift, threshold_duration, event_windows, element_counting) and counters of
+            the windows evaluated, NaN windows skipped, regressions, segments, shift iterations and events.
 
     Returns:
         pd.DataFrame: DataFrame with decay event details including the number of elements decaying and non-decaying elements.
     """
-    print("STARTING...")
+    if decay_index is not None and (
+        decay_index.window_size != window_size_for_decay_count
+        or decay_index.slope_threshold != slope_threshold
+        or decay_index.r_value_threshold != r_value_threshold
+        or energy_level not in decay_index.energy_levels
+    ):
+        raise ValueError("decay_index was built with different parameters or energy levels")
 
-    # Extract helium flux data
-    helium_index = element_mapping['He']
-    helium_flux = data_3d[energy_level - 1, :, helium_index]
-    
-    # Mask invalid helium flux data
-    valid_data_mask = helium_flux != -999.9
-    helium_flux = helium_flux[valid_data_mask]
-    helium_time = datetime_values[valid_data_mask]
+    stats = resolve_stats(stats)
+    logger.info("Computing decay events at energy level %d", energy_level)
+
+    cube = as_cube(data_3d, datetime_values, element_mapping)
+
+    # Extract the valid helium flux data
+    helium_flux, helium_time = cube.valid_series(energy_level, 'He')
     
     if len(helium_flux) == 0:
-        print("No valid helium data available.")
+        logger.warning("No valid helium data available.")
         return pd.DataFrame()
     
-    # Identify decay segments in helium flux data
-    decay_segments = identify_exponential_decays(helium_flux, helium_time, window_size, slope_threshold, r_value_threshold)
+    # Identify decay segments in helium flux data, as identify_exponential_decays does,
+    # reusing the cube's smoothed helium series across calls
+    with stats.stage("log_smooth"):
+        helium_log_flux = cube.smoothed_log_flux(energy_level, 'He')
+    with stats.stage("regression_scan"):
+        decay_windows = _decay_window_mask(helium_log_flux, window_size, slope_threshold, r_value_threshold, stats=stats)
+    with stats.stage("merge"):
+        decay_segments = _merge_decay_windows(np.flatnonzero(decay_windows), helium_time, window_size)
+    stats.count("segments", len(decay_segments))
+    logger.info("Found %d helium decay segments", len(decay_segments))
     decay_event_details = []
 
     # Set of all elements excluding helium
-    all_elements = set(element_mapping.keys()) - {'He'}
-
-    for event_number, (start, end) in enumerate(decay_segments):
-        current_event_duration_hours = (end - start) / np.timedelta64(1, 'h')
-
-
-        start_index = np.where(helium_time == start)[0][0]
-        end_index = np.where(helium_time == end)[0][0]
-        
-        start_flux = helium_flux[start_index]
-        end_flux = helium_flux[end_index]
-
-        if start_flux > end_flux:
-            print("start shifting")
-            shift_duration = pd.Timedelta(hours=max(8, int(current_event_duration_hours / 12)))
-            previous_start_flux = start_flux 
-            
-            while start_flux > end_flux:
-                print(f"Current start flux: {start_flux}")
-                print(f"End flux: {end_flux}")
-
-                shifted_start = start - shift_duration
-                
-                # Find the closest time in helium_time that's not later than shifted_start
-                shifted_start_index = np.where(helium_time <= shifted_start)[0]
-                
-                if len(shifted_start_index) == 0:
-                    print("Reached the beginning of the data. Stopping shift.")
-                    break
-                
-                shifted_start_index = shifted_start_index[-1]
-                shifted_start = helium_time[shifted_start_index]
-                new_start_flux = helium_flux[shifted_start_index]
-                
-                print(f"Shifted start time: {shifted_start}")
-                print(f"New start flux: {new_start_flux}")
-                
-                if new_start_flux < previous_start_flux:
-                    start = shifted_start
-                    start_flux = new_start_flux
-                    previous_start_flux = new_start_flux
-                    start_index = shifted_start_index
-                else:
-                    print("Flux increased. Stopping shift.")
-                    break
-
-
-        # Check how long helium flux remains above the threshold
-        above_threshold_mask = helium_flux[start_index:end_index] >= he_flux_threshold
-        above_threshold_times = helium_time[start_index:end_index][above_threshold_mask]
-
-        duration_above_threshold = 0
-        if len(above_threshold_times) > 1:
-            time_differences = np.diff(above_threshold_times)
-            continuous_periods = np.where(time_differences <= pd.Timedelta(hours=1))[0]
-            if len(continuous_periods) > 0:
-                duration_above_threshold = (
-                    above_threshold_times[continuous_periods[-1] + 1] - above_threshold_times[0]
-                ).total_seconds() / 3600
+    all_elements = set(cube.element_mapping.keys()) - {'He'}
+
+    # Refine every segment at once: shift starts back while the flux keeps falling toward
+    # the start, then measure how long the helium flux stays above the threshold
+    segment_starts = np.array([start for start, _ in decay_segments], dtype="datetime64[ns]")
+    segment_ends = np.array([end for _, end in decay_segments], dtype="datetime64[ns]")
+    # helium_time is sorted, so segment boundaries are found by binary search
+    start_indices = np.searchsorted(helium_time, segment_starts)
+    end_indices = np.searchsorted(helium_time, segment_ends)
+    with stats.stage("start_shift"):
+        start_indices, shift_iterations = _shift_segment_starts(helium_flux, helium_time, start_indices, end_indices)
+    stats.count("events_shifted", np.count_nonzero(shift_iterations))
+    stats.count("shift_iterations", shift_iterations.sum())
+    if logger.isEnabledFor(logging.DEBUG):
+        for event_number in np.flatnonzero(shift_iterations):
+            logger.debug("Event %d: start shifted from %s to %s after %d iterations", event_number + 1,
+                         segment_starts[event_number], helium_time[start_indices[event_number]], shift_iterations[event_number])
+    with stats.stage("threshold_duration"):
+        durations_above_threshold = _durations_above_threshold(helium_flux, helium_time, start_indices, end_indices, he_flux_threshold)
+
+    # Only events that meet the minimum duration requirement are recorded, so only those need
+    # their decaying elements counted
+    recorded = np.flatnonzero(durations_above_threshold >= min_duration_hours)
+    if decay_index is None:
+        # The windows of all recorded events, cut out of the cube in one pass
+        with stats.stage("event_windows"):
+            event_windows = EventWindows(cube, None, None, helium_time[start_indices[recorded]], helium_time[end_indices[recorded]],
+                                         energy_levels=[energy_level], elements=sorted(all_elements))
+
+    for position, event_number in enumerate(recorded):
+        start = pd.Timestamp(helium_time[start_indices[event_number]])
+        end = pd.Timestamp(helium_time[end_indices[event_number]])
 
         # Count the number of elements decaying in the current time window
-        decaying_elements = count_elements_decaying_in_window(
-            data_3d, datetime_values, element_mapping, energy_level, start, end, window_size_for_decay_count, slope_threshold, r_value_threshold
-        )
+        with stats.stage("element_counting"):
+            if decay_index is not None:
+                decaying_elements = decay_index.decaying_elements(energy_level, start, end)
+            else:
+                decaying_elements = _decaying_elements(event_windows.event(position), energy_level, window_size_for_decay_count,
+                                                       slope_threshold, r_value_threshold, stats)
 
         # Identify non-decaying elements
         non_decaying_elements = all_elements - decaying_elements
         non_decaying_elements_list = list(non_decaying_elements)
 
-        # Record the event if it meets the minimum duration requirement
-        if duration_above_threshold >= min_duration_hours:
-            start_year = start.year
-            end_year = end.year
-            start_frac_day = (
-                start.timetuple().tm_yday
-                + start.hour / 24
-                + start.minute / 1440
-                + start.second / 86400
-            )
-            end_frac_day = (
-                end.timetuple().tm_yday
-                + end.hour / 24
-                + end.minute / 1440
-                + end.second / 86400
-            )
-            start_hour = start.hour + start.minute / 60 + start.second / 3600
-            end_hour = end.hour + end.minute / 60 + end.second / 3600
-
-            # Append event details to the decay event list
-            decay_event_details.append(
-                {
-                    "Event Number": event_number + 1,
-                    "Start Year": start_year,
-                    "End Year": end_year,
-                    "Start Fractional Day": start_frac_day,
-                    "End Fractional Day": end_frac_day,
-                    "Start Hour": start_hour,
-                    "End Hour": end_hour,
-                    "Elements Decaying": len(decaying_elements) + 1,
-                    "Non-Decaying Elements": non_decaying_elements_list,
-                }
-            )
+        # Record the event
+        start_year = start.year
+        end_year = end.year
+        start_frac_day = (
+            start.timetuple().tm_yday
+            + start.hour / 24
+            + start.minute / 1440
+            + start.second / 86400
+        )
+        end_frac_day = (
+            end.timetuple().tm_yday
+            + end.hour / 24
+            + end.minute / 1440
+            + end.second / 86400
+        )
+        start_hour = start.hour + start.minute / 60 + start.second / 3600
+        end_hour = end.hour + end.minute / 60 + end.second / 3600
+
+        # Append event details to the decay event list
+        decay_event_details.append(
+            {
+                "Event Number": event_number + 1,
+                "Start Year": start_year,
+                "End Year": end_year,
+                "Start Fractional Day": start_frac_day,
+                "End Fractional Day": end_frac_day,
+                "Start Hour": start_hour,
+                "End Hour": end_hour,
+                "Elements Decaying": len(decaying_elements) + 1,
+                "Non-Decaying Elements": non_decaying_elements_list,
+            }
+        )
 
+    stats.count("events_recorded", len(decay_event_details))
+    logger.info("Recorded %d of %d decay segments as events", len(decay_event_details), len(decay_segments))
 
     # Convert the decay event details list to a DataFrame for further analysis
     return pd.DataFrame(decay_event_details)
+
+
+def event_times(decay_events_df):
+    """
+    Rebuilds event start and end times from a decay event catalog.
+
+    The catalog stores each boundary as a year and a fractional day of year (1-based),
+    which this converts for all rows at once.
+
+    Args:
+        decay_events_df (pd.DataFrame): DataFrame with 'Start Year', 'End Year',
+            'Start Fractional Day' and 'End Fractional Day' columns. An empty catalog may
+            have no columns at all, as `compute_decay_events_for_all_data` returns it.
+
+    Returns:
+        numpy.ndarray: datetime64[ns] start time of each event.
+        numpy.ndarray: datetime64[ns] end time of each event.
+    """
+    if len(decay_events_df) == 0:
+        return np.empty(0, dtype="datetime64[ns]"), np.empty(0, dtype="datetime64[ns]")
+
+    def to_datetime64(years, fractional_days):
+        year_start = (np.asarray(years, dtype="int64") - 1970).astype("datetime64[Y]").astype("datetime64[ns]")
+        offset_ns = np.round((np.asarray(fractional_days, dtype=float) - 1) * 86400e9).astype("int64")
+        return year_start + offset_ns.astype("timedelta64[ns]")
+
+    return (
+        to_datetime64(decay_events_df["Start Year"], decay_events_df["Start Fractional Day"]),
+        to_datetime64(decay_events_df["End Year"], decay_events_df["End Fractional Day"]),
+    )
+
+
+def event_index_ranges(decay_events_df, datetime_values, extend_days=0):
+    """
+    Locates the samples of every catalog event on a time axis with binary search.
+
+    The catalog's fractional days are derived from whole seconds, so an event's last
+    sample can lie a fraction of a second after the stored end time. The end is padded
+    by one second to keep that sample.
+
+    Args:
+        decay_events_df (pd.DataFrame): The decay event catalog (see `event_times`).
+        datetime_values (numpy.ndarray): Sorted array of datetime64 values.
+        extend_days (float): Number of days to extend each event before and after.
+
+    Returns:
+        numpy.ndarray: Index of the first sample of each event.
+        numpy.ndarray: Index one past the last sample of each event.
+    """
+    start_times, end_times = event_times(decay_events_df)
+    extension = np.timedelta64(int(round(extend_days * 86400e9)), "ns")
+    first_index = np.searchsorted(datetime_values, start_times - extension, side="left")
+    stop_index = np.searchsorted(datetime_values, end_times + extension + np.timedelta64(1, "s"), side="left")
+    return first_index, np.maximum(stop_index, first_index)
@@ -0,0 +1,148 @@
+import contextlib
+import json
+import logging
+import time
+
+"""Stage timers and counters for the decay detection. Pass a `PipelineStats` as
+the `stats` argument of `compute_decay_events_for_all_data` (or the functions it
+calls) and read it afterwards, either as a dict or as JSON:
+
+    stats = PipelineStats()
+    decay_events_df = compute_decay_events_for_all_data(..., stats=stats)
+    stats.log_summary()
+    stats.to_json("transformed_data/detection_stats.json")
+
+Without a stats object the functions use `DISABLED_STATS`, whose methods do
+nothing, so the instrumentation costs a method call per stage and nothing more."""
+
+
+class PipelineStats:
+    """
+    Accumulates wall time per stage and named counters over one or more runs.
+
+    Attributes:
+        seconds (dict): Stage name to total wall time in seconds.
+        calls (dict): Stage name to number of times the stage was entered.
+        counters (dict): Counter name to total count.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+        self.counters = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Times the enclosed block and adds it to the stage's total.
+
+        Args:
+            name (str): The stage name.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name, amount=1):
+        """
+        Adds to a counter.
+
+        Args:
+            name (str): The counter name.
+            amount (int): The amount to add.
+        """
+        self.counters[name] = self.counters.get(name, 0) + int(amount)
+
+    def merge(self, other):
+        """
+        Adds the timings and counters of another stats object to this one, e.g. from a worker process.
+
+        Args:
+            other (PipelineStats or dict): Stats object, or its `as_dict()` output.
+
+        Returns:
+            PipelineStats: This object.
+        """
+        other = other.as_dict() if isinstance(other, PipelineStats) else other
+        for name, stage in other["stages"].items():
+            self.seconds[name] = self.seconds.get(name, 0.0) + stage["seconds"]
+            self.calls[name] = self.calls.get(name, 0) + stage["calls"]
+        for name, amount in other["counters"].items():
+            self.count(name, amount)
+        return self
+
+    def as_dict(self):
+        """
+        Returns:
+            dict: {"stages": {name: {"seconds", "calls"}}, "counters": {name: count}}, in first-seen order.
+        """
+        return {
+            "stages": {name: {"seconds": seconds, "calls": self.calls[name]} for name, seconds in self.seconds.items()},
+            "counters": dict(self.counters),
+        }
+
+    def to_json(self, path=None, indent=2):
+        """
+        Serializes the stats as JSON.
+
+        Args:
+            path (str): File to write to. If None, only the string is returned.
+            indent (int): JSON indentation.
+
+        Returns:
+            str: The JSON document.
+        """
+        document = json.dumps(self.as_dict(), indent=indent)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(document)
+        return document
+
+    def log_summary(self, logger=None, level=logging.INFO):
+        """
+        Logs one line per stage and one for the counters.
+
+        Args:
+            logger (logging.Logger): Logger to write to, defaults to this module's logger.
+            level (int): Logging level of the summary.
+        """
+        logger = logger or logging.getLogger(__name__)
+        if not logger.isEnabledFor(level):
+            return
+        for name, seconds in sorted(self.seconds.items(), key=lambda item: -item[1]):
+            logger.log(level, "%-20s %9.3f s  %7d calls", name, seconds, self.calls[name])
+        if self.counters:
+            logger.log(level, "counters: %s", ", ".join(f"{name}={amount}" for name, amount in self.counters.items()))
+
+
+class _DisabledStats:
+    """
+    Stand-in for PipelineStats when no stats are collected; every method is a no-op.
+    """
+
+    enabled = False
+
+    # nullcontext can be entered any number of times, so one instance serves every stage
+    _no_op = contextlib.nullcontext()
+
+    def stage(self, name):
+        return self._no_op
+
+    def count(self, name, amount=1):
+        pass
+
+
+DISABLED_STATS = _DisabledStats()
+
+
+def resolve_stats(stats):
+    """
+    Returns:
+        PipelineStats: `stats`, or `DISABLED_STATS` if it is None.
+    """
+    return DISABLED_STATS if stats is None else stats
@@ -0,0 +1,56 @@
+import collections
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+"""Process-pool helpers shared by the modules that spread work over CPUs. Every
+`max_workers` argument in the repository means the same thing: None uses one
+process per CPU, and 1 (or a single task) runs in the current process without a
+pool. `bounded_map` is for work whose arguments are produced on the fly and are
+large, such as gathered event samples. It keeps only a few tasks per worker in
+flight, so the arguments never pile up in memory waiting for a free worker."""
+
+
+def resolve_max_workers(max_workers, num_tasks=None):
+    """
+    Turns a `max_workers` argument into a process count.
+
+    Args:
+        max_workers (int): Requested number of processes, None for one per CPU.
+        num_tasks (int): Number of tasks to spread, if known; more processes than tasks are not started.
+
+    Returns:
+        int: The number of processes to use, at least 1. 1 means running in the current process.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if num_tasks is not None:
+        max_workers = min(max_workers, num_tasks)
+    return max(1, max_workers)
+
+
+def bounded_map(function, argument_tuples, max_workers, tasks_per_worker=2):
+    """
+    Calls `function(*arguments)` for every argument tuple on a process pool, yielding the results in order.
+
+    Args:
+        function (callable): A picklable function, e.g. defined at module level.
+        argument_tuples (iterable): Argument tuples, typically from a generator.
+        max_workers (int): Number of worker processes, see `resolve_max_workers`; 1 runs in the current process.
+        tasks_per_worker (int): Tasks submitted per worker before waiting for the oldest one.
+
+    Returns:
+        iterator: The result of each call.
+    """
+    if max_workers <= 1:
+        for arguments in argument_tuples:
+            yield function(*arguments)
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = collections.deque()
+        for arguments in argument_tuples:
+            if len(pending) >= tasks_per_worker * max_workers:
+                yield pending.popleft().result()
+            pending.append(executor.submit(function, *arguments))
+        while pending:
+            yield pending.popleft().result()
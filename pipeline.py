@@ -0,0 +1,389 @@
+"""Command-line pipeline for the notebook workflow: load -> Q1 thresholds ->
+detect -> filter by "Elements Decaying" -> classify and plot. Each step is a
+stage that declares the stages it reads from and the parameters it uses.
+
+A stage's outputs live in `<work dir>/<stage>/<digest>/`, where the digest is a
+hash of the stage's parameters and the content hashes of its inputs' outputs.
+The load stage is keyed on the same source-file fingerprint as load.py's cache.
+A stage whose digest already has a finished output folder is skipped. Changing
+only the plot settings therefore re-renders the plots without re-running the
+detection. And if a detection parameter changes but the detected catalog does
+not, everything downstream is still reused. Stages whose inputs are ready run
+concurrently on a process pool, such as the classification and the two plot
+exports. Stages started together split the processes that running stages do
+not hold, since several of them start pools of their own.
+
+Detection is a single stage rather than one stage per element. The helium
+series alone defines the events, and the other elements are only checked
+inside the helium windows. Element counting is therefore not independent work
+per element: it needs the helium result first, and it takes a small fraction
+of the detection time. A stage per element would also load the cube in every
+process, which costs more than the counting it would spread out.
+
+    python pipeline.py flux_1998/ --work-dir transformed_data/pipeline --min-elements-decaying 3
+    python pipeline.py flux_1998/ --extend-days 2 --stages plot_events
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from catalog import EventCatalog
+from classification import classify_decay_events
+from cube import SISCube
+from flux_stats import cached_flux_statistics
+from graph import export_all_decay_events, export_decay_events_per_element
+from identification import DecaySegmentIndex, compute_decay_events_for_all_data
+from instrumentation import PipelineStats
+from load import _source_fingerprint, load_all_sis_data
+from parallel import resolve_max_workers
+
+
+logger = logging.getLogger(__name__)
+
+Stage = namedtuple("Stage", ["function", "inputs", "params", "version"])
+
+DEFAULT_PARAMS = {
+    "energy_level": 1,
+    "min_duration_hours": 48,
+    "window_size": 24,
+    "window_size_for_decay_count": 18,
+    "slope_threshold": -0.005,
+    "r_value_threshold": 0.5,
+    "min_elements_decaying": 1,
+    "classify_element": "He",
+    "classify_min_window_hours": 48,
+    "classify_r_value_threshold": 0.9,
+    "extend_days": 1.0,
+    "use_log_scale": True,
+    "events_per_page": 20,
+    "plot_energy_levels": 3,
+    "dpi": 100,
+}
+
+# Name of the record a stage writes last into its output folder; its presence marks the stage as done
+STAGE_RECORD = "stage.json"
+
+
+def _load_stage(folder_path, inputs, params, output_dir, max_workers):
+    """
+    Builds (or validates) load.py's cache of the dataset folder.
+    """
+    load_all_sis_data(folder_path, max_workers=max_workers)
+    return {}
+
+
+def _thresholds_stage(folder_path, inputs, params, output_dir, max_workers):
+    """
+    Looks up the Q1 thresholds of every element in the folder's cached flux statistics.
+    """
+    q1_values = cached_flux_statistics(folder_path, max_workers=max_workers).q1_thresholds(params["energy_level"])
+    with open(os.path.join(output_dir, "thresholds.json"), "w") as f:
+        json.dump(q1_values, f, indent=2, sort_keys=True)
+    return {"thresholds": "thresholds.json"}
+
+
+def _detect_stage(folder_path, inputs, params, output_dir, max_workers):
+    """
+    Runs `compute_decay_events_for_all_data` with the helium Q1 threshold.
+    """
+    cube = SISCube.from_folder(folder_path, max_workers=max_workers)
+    with open(os.path.join(inputs["thresholds"]["dir"], inputs["thresholds"]["outputs"]["thresholds"])) as f:
+        he_flux_threshold = json.load(f)["He"]
+
+    detection_stats = PipelineStats()
+    decay_index = DecaySegmentIndex(cube, None, None, params["window_size_for_decay_count"], params["slope_threshold"],
+                                    params["r_value_threshold"], energy_levels=[params["energy_level"]])
+    decay_events_df = compute_decay_events_for_all_data(
+        cube, None, None, params["energy_level"], he_flux_threshold, params["min_duration_hours"], params["window_size"],
+        params["window_size_for_decay_count"], params["slope_threshold"], params["r_value_threshold"],
+        decay_index=decay_index, stats=detection_stats,
+    )
+    detection_stats.to_json(os.path.join(output_dir, "detection_stats.json"))
+    return _write_catalog(decay_events_df, cube.element_mapping, output_dir, "decay_events")
+
+
+def _filter_stage(folder_path, inputs, params, output_dir, max_workers):
+    """
+    Keeps the events in which at least `min_elements_decaying` elements decay.
+    """
+    catalog = _read_catalog(inputs["detect"])
+    if len(catalog):
+        catalog = catalog.take(np.flatnonzero(catalog.columns["Elements Decaying"] >= params["min_elements_decaying"]))
+    return _write_catalog(catalog.to_dataframe(), catalog.elements, output_dir, "decay_events")
+
+
+def _classify_stage(folder_path, inputs, params, output_dir, max_workers):
+    """
+    Adds the decay type columns of `classify_decay_events`.
+    """
+    cube = SISCube.from_folder(folder_path, max_workers=max_workers)
+    catalog = _read_catalog(inputs["filter"])
+    classified_df = classify_decay_events(
+        catalog.to_dataframe(), cube, None, None, params["energy_level"], params["classify_element"],
+        params["classify_min_window_hours"], params["classify_r_value_threshold"],
+    ) if len(catalog) else catalog.to_dataframe()
+    return _write_catalog(classified_df, cube.element_mapping, output_dir, "classified_decay_events")
+
+
+def _plot_events_stage(folder_path, inputs, params, output_dir, max_workers):
+    """
+    Exports the grid pages of `export_all_decay_events`.
+    """
+    decay_events_df = _read_catalog(inputs["filter"]).to_dataframe()
+    if len(decay_events_df):
+        cube = SISCube.from_folder(folder_path, max_workers=max_workers)
+        export_all_decay_events(
+            decay_events_df, cube, None, None, params["energy_level"], params["extend_days"],
+            params["use_log_scale"], output_dir, params["events_per_page"], params["dpi"], max_workers,
+        )
+    return {}
+
+
+def _plot_elements_stage(folder_path, inputs, params, output_dir, max_workers):
+    """
+    Exports the per-element images of `export_decay_events_per_element`.
+    """
+    decay_events_df = _read_catalog(inputs["filter"]).to_dataframe()
+    if len(decay_events_df):
+        cube = SISCube.from_folder(folder_path, max_workers=max_workers)
+        export_decay_events_per_element(
+            decay_events_df, cube, None, None, params["plot_energy_levels"], params["extend_days"],
+            params["use_log_scale"], output_dir, params["dpi"], max_workers,
+        )
+    return {}
+
+
+# Bump a stage's version when its function changes in a way that changes its outputs
+STAGES = {
+    "load": Stage(_load_stage, (), (), 1),
+    "thresholds": Stage(_thresholds_stage, ("load",), ("energy_level",), 1),
+    "detect": Stage(_detect_stage, ("load", "thresholds"),
+                    ("energy_level", "min_duration_hours", "window_size", "window_size_for_decay_count",
+                     "slope_threshold", "r_value_threshold"), 1),
+    "filter": Stage(_filter_stage, ("detect",), ("min_elements_decaying",), 1),
+    "classify": Stage(_classify_stage, ("load", "filter"),
+                      ("energy_level", "classify_element", "classify_min_window_hours", "classify_r_value_threshold"), 1),
+    "plot_events": Stage(_plot_events_stage, ("load", "filter"),
+                         ("energy_level", "extend_days", "use_log_scale", "events_per_page", "dpi"), 1),
+    "plot_elements": Stage(_plot_elements_stage, ("load", "filter"),
+                           ("plot_energy_levels", "extend_days", "use_log_scale", "dpi"), 1),
+}
+
+
+def run_pipeline(folder_path, work_dir, params=None, targets=None, force=(), max_workers=None):
+    """
+    Runs the stages needed for `targets`, skipping those whose outputs are already in `work_dir`.
+
+    Args:
+        folder_path (str): The dataset folder containing the SIS data files.
+        work_dir (str): Folder holding the outputs of every stage, one subfolder per stage and digest.
+        params (dict): Parameters overriding `DEFAULT_PARAMS`.
+        targets (list): Stages to bring up to date, with everything they depend on. Defaults to all stages.
+        force (tuple): Stages to re-run even if their outputs exist.
+        max_workers (int): Total number of processes. Defaults to one per CPU; 1 runs every stage in the current
+            process. Stages started together split the processes not held by running stages.
+
+    Returns:
+        dict: Stage name to record, with the stage's "dir", "outputs", "digest", "content", "seconds"
+            and "status" ("ran" or "cached").
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    unknown = set(params) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown parameters {sorted(unknown)}")
+    max_workers = resolve_max_workers(max_workers)
+    needed = _stages_needed(targets or list(STAGES))
+
+    records = {}
+    pending = [name for name in STAGES if name in needed]
+    # Future of each running stage to (stage name, number of processes it was given)
+    running = {}
+    executor = ProcessPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+    try:
+        while pending or running:
+            # Collect every stage whose inputs are done; cache hits may make more stages ready
+            to_run = []
+            ready = [name for name in pending if all(dependency in records for dependency in STAGES[name].inputs)]
+            while ready:
+                for name in ready:
+                    pending.remove(name)
+                    stage_params = {key: params[key] for key in STAGES[name].params}
+                    digest = _stage_digest(name, folder_path, stage_params, records)
+                    output_dir = os.path.join(work_dir, name, digest[:16])
+                    record = None if name in force else _read_record(output_dir, digest)
+                    if record is not None:
+                        records[name] = {**record, "dir": output_dir, "status": "cached"}
+                        logger.info("%-14s cached  %s", name, output_dir)
+                        continue
+                    os.makedirs(output_dir, exist_ok=True)
+                    to_run.append((_run_stage, name, folder_path, {key: records[key] for key in STAGES[name].inputs},
+                                   stage_params, output_dir, digest))
+                ready = [name for name in pending if all(dependency in records for dependency in STAGES[name].inputs)]
+
+            if executor is None:
+                for call in to_run:
+                    _finish_stage(records, call[1], call[0](*call[1:], max_workers=1))
+                continue
+            # Stages that load the cube or render plots start pools of their own, so the processes not
+            # held by running stages are split among the new ones instead of each getting all of them
+            if to_run:
+                free_workers = max_workers - sum(workers for _, workers in running.values())
+                share = max(1, free_workers // len(to_run))
+                for call in to_run:
+                    running[executor.submit(*call, max_workers=share)] = (call[1], share)
+                    logger.debug("%-14s started with %d processes", call[1], share)
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, _ = running.pop(future)
+                _finish_stage(records, name, future.result())
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return records
+
+
+def _stages_needed(targets):
+    """
+    Returns:
+        set: The target stages and every stage they depend on.
+    """
+    needed = set()
+    stack = list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in STAGES:
+            raise ValueError(f"Unknown stage {name!r}, expected one of {list(STAGES)}")
+        if name not in needed:
+            needed.add(name)
+            stack.extend(STAGES[name].inputs)
+    return needed
+
+
+def _stage_digest(name, folder_path, stage_params, records):
+    """
+    Hashes what a stage's outputs depend on: its version, parameters and the content of its inputs.
+    """
+    if name == "load":
+        filenames = [filename for filename in sorted(os.listdir(folder_path)) if filename.endswith(".txt")]
+        inputs = {"source_files": _source_fingerprint(folder_path, filenames), "folder": os.path.abspath(folder_path)}
+    else:
+        inputs = {dependency: records[dependency]["content"] for dependency in STAGES[name].inputs}
+    key = {"stage": name, "version": STAGES[name].version, "params": stage_params, "inputs": inputs}
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _run_stage(name, folder_path, inputs, stage_params, output_dir, digest, max_workers=1):
+    """
+    Runs one stage and hashes its outputs; called in a worker process or the current one.
+
+    Returns:
+        dict: The stage record (see `run_pipeline`), without its status.
+    """
+    start = time.perf_counter()
+    outputs = STAGES[name].function(folder_path, inputs, stage_params, output_dir, max_workers)
+    content = hashlib.sha256()
+    for key in sorted(outputs):
+        content.update(key.encode())
+        _hash_output(content, os.path.join(output_dir, outputs[key]))
+    record = {
+        "stage": name,
+        "digest": digest,
+        "params": stage_params,
+        "inputs": {dependency: inputs[dependency]["digest"] for dependency in inputs},
+        "outputs": outputs,
+        # Stages without output files (the load and plot stages) are identified by their digest alone
+        "content": content.hexdigest() if outputs else digest,
+        "seconds": time.perf_counter() - start,
+    }
+    # Written last and atomically, so an interrupted stage is re-run
+    temp_path = os.path.join(output_dir, STAGE_RECORD + ".tmp")
+    with open(temp_path, "w") as f:
+        json.dump(record, f, indent=2)
+    os.replace(temp_path, os.path.join(output_dir, STAGE_RECORD))
+    return {**record, "dir": output_dir}
+
+
+def _hash_output(content, path):
+    """
+    Adds an output file to a content hash.
+
+    `.npz` archives store write times, so their arrays are hashed instead of the file bytes.
+    """
+    if path.endswith(".npz"):
+        with np.load(path, allow_pickle=False) as arrays:
+            for key in sorted(arrays.files):
+                array = arrays[key]
+                content.update(f"{key}:{array.dtype.str}:{array.shape}".encode())
+                content.update(np.ascontiguousarray(array).tobytes())
+        return
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            content.update(block)
+
+
+def _finish_stage(records, name, record):
+    records[name] = {**record, "status": "ran"}
+    logger.info("%-14s ran     %s (%.2f s)", name, record["dir"], record["seconds"])
+
+
+def _read_record(output_dir, digest):
+    """
+    Returns:
+        dict: The stage record in `output_dir`, or None if the stage has not finished there.
+    """
+    try:
+        with open(os.path.join(output_dir, STAGE_RECORD)) as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return record if record.get("digest") == digest else None
+
+
+def _write_catalog(decay_events_df, elements, output_dir, basename):
+    """
+    Writes a catalog as an EventCatalog `.npz` for the next stages and as CSV for reading.
+    """
+    npz_name, csv_name = f"{basename}.npz", f"{basename}.csv"
+    EventCatalog.from_dataframe(decay_events_df, list(elements)).save(os.path.join(output_dir, npz_name))
+    decay_events_df.to_csv(os.path.join(output_dir, csv_name), index=False)
+    return {"catalog": npz_name, "csv": csv_name}
+
+
+def _read_catalog(record):
+    return EventCatalog.load(os.path.join(record["dir"], record["outputs"]["catalog"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder_path", help="dataset folder, e.g. flux_1998/")
+    parser.add_argument("--work-dir", default="transformed_data/pipeline")
+    parser.add_argument("--stages", nargs="+", default=None, choices=list(STAGES), help="targets, defaults to all stages")
+    parser.add_argument("--force", nargs="+", default=(), choices=list(STAGES), help="stages to re-run regardless of cache")
+    parser.add_argument("--max-workers", type=int, default=None)
+    parser.add_argument("--log-level", default="INFO")
+    for name, default in DEFAULT_PARAMS.items():
+        flag = "--" + name.replace("_", "-")
+        if isinstance(default, bool):
+            parser.add_argument(flag, type=lambda value: value.lower() in ("1", "true", "yes"), default=default)
+        else:
+            parser.add_argument(flag, type=type(default), default=default)
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    params = {name: getattr(args, name) for name in DEFAULT_PARAMS}
+    records = run_pipeline(args.folder_path, args.work_dir, params, args.stages, tuple(args.force), args.max_workers)
+    for name, record in records.items():
+        print(f"{name:<14}{record['status']:<8}{record['dir']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy.ndimage import gaussian_filter1d
+
+from cube import as_cube
+from identification import _decay_window_mask
+
+"""The detector below runs the same sliding-window decay detection as
+`identify_exponential_decays`, but on data that arrives in pieces. It keeps only
+the tail of the series needed to continue: the last few raw samples that the
+Gaussian smoothing of new data still depends on, plus the samples of the windows
+that have not been evaluated yet. A window is evaluated once all of its smoothed
+values are final, that is once the data extends at least the smoothing radius
+past its last sample. Each update therefore costs time proportional to the new
+data plus one window, no matter how long the mission is."""
+
+
+DecayEvent = namedtuple("DecayEvent", ["kind", "start", "end"])
+DecayEvent.__doc__ = """
+A change to a decay segment reported by `StreamingDecayDetector`.
+
+Args:
+    kind (str): "new" for a segment seen for the first time, "extended" when its end
+        moved later, "closed" once no future window can merge into it.
+    start (pd.Timestamp): Start time of the segment.
+    end (pd.Timestamp): Current end time of the segment.
+"""
+
+
+class StreamingDecayDetector:
+    """
+    Incremental decay detection for appended near-real-time data.
+
+    Feed new time slices with `update` and call `flush` at the end of the data. The
+    segments reported as closed are the same as `identify_exponential_decays` returns for
+    the whole series at once.
+
+    Args:
+        window_size (int): Size of the sliding window for linear regression (in hours).
+        slope_threshold (float): Threshold for the slope to identify a decay.
+        r_value_threshold (float): Minimum correlation coefficient (r-value) for considering a fit.
+        energy_level (int): The energy level to analyze when updating from a cube.
+        element_name (str): The element to analyze when updating from a cube.
+        callback (callable): Optional function called with each `DecayEvent` as it is emitted.
+    """
+
+    # Reach of gaussian_filter1d(sigma=1) on either side of a sample
+    SMOOTHING_RADIUS = 4
+
+    def __init__(self, window_size, slope_threshold, r_value_threshold, energy_level=1, element_name="He", callback=None):
+        self.window_size = window_size
+        self.slope_threshold = slope_threshold
+        self.r_value_threshold = r_value_threshold
+        self.energy_level = energy_level
+        self.element_name = element_name
+        self.callback = callback
+
+        # Tail of the log-flux series and its times; _offset is the position of
+        # the first buffered sample in the whole (valid-only) series
+        self._log_flux = np.empty(0)
+        self._times = np.empty(0, dtype="datetime64[ns]")
+        self._offset = 0
+        self._num_samples = 0
+
+        # First window start that has not been evaluated yet
+        self._next_window = 0
+        # Merge tolerance, taken from the first two samples like the batch detection
+        self._time_step = None
+
+        # The open segment as [start, end] and the end last reported for it
+        self._segment = None
+        self._reported_end = None
+        self._finished = False
+
+    def update(self, data_3d, datetime_values=None, element_mapping=None):
+        """
+        Appends a new time slice of the data cube.
+
+        Args:
+            data_3d (numpy.ndarray or SISCube): The new (energy, time, element) slice.
+            datetime_values (numpy.ndarray): Its datetime64 values (None if `data_3d` is a SISCube).
+            element_mapping (dict): Element name to array index mapping (None if `data_3d` is a SISCube).
+
+        Returns:
+            list: The `DecayEvent`s emitted by this update.
+        """
+        flux_data, time_data = as_cube(data_3d, datetime_values, element_mapping).valid_series(self.energy_level, self.element_name)
+        return self.update_series(flux_data, time_data)
+
+    def update_series(self, flux_data, time_data):
+        """
+        Appends new samples of the analyzed series. Values of -999.9 are skipped.
+
+        Args:
+            flux_data (numpy.ndarray): New flux values.
+            time_data (numpy.ndarray): Their datetime values, later than anything seen so far.
+
+        Returns:
+            list: The `DecayEvent`s emitted by this update.
+        """
+        if self._finished:
+            raise ValueError("the detector was flushed and cannot take more data")
+
+        flux_data = np.asarray(flux_data, dtype=float)
+        time_data = pd.DatetimeIndex(time_data).to_numpy(dtype="datetime64[ns]")
+        valid_data_mask = flux_data != -999.9
+        flux_data = flux_data[valid_data_mask]
+        time_data = time_data[valid_data_mask]
+        if len(flux_data) == 0:
+            return []
+
+        if len(self._times) and time_data[0] <= self._times[-1]:
+            raise ValueError("new data must start after the last sample already seen")
+
+        # Replace non-positive flux values with NaN for logarithmic transformation
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_flux_data = np.log10(np.where(flux_data > 0, flux_data, np.nan))
+        self._log_flux = np.concatenate((self._log_flux, log_flux_data))
+        self._times = np.concatenate((self._times, time_data))
+        self._num_samples += len(flux_data)
+        if self._time_step is None and self._num_samples >= 2:
+            self._time_step = self._times[1] - self._times[0]
+
+        # Windows whose samples are all at least the smoothing radius away from the end are final
+        events = self._evaluate(self._num_samples - self.window_size - self.SMOOTHING_RADIUS, final=False)
+        self._trim()
+        return events
+
+    def flush(self):
+        """
+        Evaluates the remaining windows as if the data ended here and closes the open segment.
+
+        Returns:
+            list: The `DecayEvent`s emitted by the flush.
+        """
+        if self._finished:
+            return []
+        # The batch detection does not evaluate the window ending at the last sample
+        events = self._evaluate(self._num_samples - self.window_size - 1, final=True)
+        if self._segment is not None:
+            events.extend(self._emit(self._close_segment()))
+        self._finished = True
+        return events
+
+    def _evaluate(self, last_window, final):
+        """
+        Evaluates windows `_next_window .. last_window` and updates the open segment.
+
+        Args:
+            last_window (int): Last window start to evaluate, in whole-series positions.
+            final (bool): Whether the data ends here, so the smoothing reflects at the end.
+
+        Returns:
+            list: The emitted `DecayEvent`s.
+        """
+        events = []
+        if last_window < self._next_window:
+            return events
+
+        radius = self.SMOOTHING_RADIUS
+        # Smooth from `radius` samples before the first window (or the start of the series,
+        # where the batch smoothing reflects too) to the end of the buffer
+        context_start = max(self._next_window - radius, 0)
+        smoothed = gaussian_filter1d(self._log_flux[context_start - self._offset:], sigma=1)
+        first = self._next_window - context_start
+
+        # _decay_window_mask leaves out the window ending at the last sample it is given,
+        # so pass one sample past the last window to evaluate
+        stop = first + last_window - self._next_window + self.window_size + 1
+        if not final:
+            smoothed = smoothed[:stop]
+        decay_windows = _decay_window_mask(smoothed[first:stop], self.window_size, self.slope_threshold, self.r_value_threshold)
+
+        for window_start in np.flatnonzero(decay_windows) + self._next_window:
+            start_time = self._times[window_start - self._offset]
+            end_time = self._times[window_start + self.window_size - 1 - self._offset]
+            if self._segment is not None and start_time <= self._segment[1] + self._time_step:
+                self._segment[1] = max(self._segment[1], end_time)
+            else:
+                if self._segment is not None:
+                    events.extend(self._close_segment())
+                self._segment = [start_time, end_time]
+                self._reported_end = None
+
+        self._next_window = last_window + 1
+
+        # Later windows start at or after _next_window; if that is already past the merge
+        # tolerance, the open segment can no longer grow
+        if self._segment is not None and self._next_window < self._num_samples:
+            if self._times[self._next_window - self._offset] > self._segment[1] + self._time_step:
+                events.extend(self._close_segment())
+
+        if self._segment is not None:
+            events.extend(self._report_segment())
+        return self._emit(events)
+
+    def _emit(self, events):
+        """
+        Passes events to the callback, if any, and returns them.
+        """
+        if self.callback is not None:
+            for event in events:
+                self.callback(event)
+        return events
+
+    def _report_segment(self):
+        """
+        Emits "new" or "extended" for the open segment if it changed since the last report.
+        """
+        start, end = self._segment
+        if self._reported_end is None:
+            kind = "new"
+        elif end > self._reported_end:
+            kind = "extended"
+        else:
+            return []
+        self._reported_end = end
+        return [DecayEvent(kind, pd.Timestamp(start), pd.Timestamp(end))]
+
+    def _close_segment(self):
+        """
+        Emits the final state of the open segment followed by "closed".
+        """
+        events = self._report_segment()
+        start, end = self._segment
+        events.append(DecayEvent("closed", pd.Timestamp(start), pd.Timestamp(end)))
+        self._segment = None
+        self._reported_end = None
+        return events
+
+    def _trim(self):
+        """
+        Drops buffered samples that no future window or smoothing step needs.
+        """
+        keep_from = max(self._next_window - self.SMOOTHING_RADIUS, 0)
+        drop = keep_from - self._offset
+        if drop > 0:
+            self._log_flux = self._log_flux[drop:]
+            self._times = self._times[drop:]
+            self._offset = keep_from
@@ -0,0 +1,184 @@
+import itertools
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from cube import SISCube, as_cube
+from identification import DecaySegmentIndex, compute_decay_events_for_all_data
+from parallel import resolve_max_workers
+
+"""The sweep below runs `compute_decay_events_for_all_data` once per parameter set
+on a process pool. The data cube, its validity mask and the smoothed log flux of
+every element (which does not depend on any parameter) are written once to
+temporary `.npy` files and memory-mapped by every worker, so the operating system
+shares one copy of the pages instead of pickling the cube into each process.
+Workers also keep the `DecaySegmentIndex` of each element-counting setting they
+have seen, so parameter sets that only change the helium thresholds reuse it."""
+
+
+PARAMETER_NAMES = (
+    "he_flux_threshold",
+    "min_duration_hours",
+    "window_size",
+    "window_size_for_decay_count",
+    "slope_threshold",
+    "r_value_threshold",
+)
+
+# Per-worker state set up by _init_worker
+_worker_cube = None
+_worker_energy_level = None
+_worker_decay_indexes = {}
+
+
+def parameter_grid(param_grid):
+    """
+    Expands a grid of parameter values into a list of parameter sets.
+
+    Args:
+        param_grid (dict): Maps each name in `PARAMETER_NAMES` to a value or a list of values.
+
+    Returns:
+        list: One dict per combination of values.
+    """
+    missing = set(PARAMETER_NAMES) - set(param_grid)
+    if missing:
+        raise ValueError(f"param_grid is missing {sorted(missing)}")
+
+    values = [param_grid[name] if isinstance(param_grid[name], (list, tuple, np.ndarray)) else [param_grid[name]]
+              for name in PARAMETER_NAMES]
+    return [dict(zip(PARAMETER_NAMES, combination)) for combination in itertools.product(*values)]
+
+
+def run_parameter_sweep(data_3d, datetime_values, element_mapping, energy_level, param_grid, max_workers=None):
+    """
+    Runs `compute_decay_events_for_all_data` for every parameter set in a grid.
+
+    Args:
+        data_3d (numpy.ndarray or SISCube): The 3D data cube (energy, time, element).
+        datetime_values (numpy.ndarray): Array of datetime64 values (None if `data_3d` is a SISCube).
+        element_mapping (dict): Element name to array index mapping (None if `data_3d` is a SISCube).
+        energy_level (int): The energy level to analyze.
+        param_grid (dict or list): A grid for `parameter_grid`, or a list of parameter set dicts.
+        max_workers (int): Number of worker processes. Defaults to one per CPU, 1 runs in the current process.
+
+    Returns:
+        pd.DataFrame: All decay events, with a "Parameter Set" column and one column per parameter.
+        pd.DataFrame: One row per parameter set with its parameters, event count and run time.
+    """
+    cube = as_cube(data_3d, datetime_values, element_mapping)
+    parameter_sets = parameter_grid(param_grid) if isinstance(param_grid, dict) else list(param_grid)
+
+    # The log transform and smoothing do not depend on any parameter, so do them once here
+    smoothed_log_flux = {
+        (energy_level, element_name): cube.smoothed_log_flux(energy_level, element_name)
+        for element_name in cube.element_mapping
+    }
+
+    max_workers = resolve_max_workers(max_workers, len(parameter_sets))
+
+    if max_workers <= 1:
+        _set_worker_state(SISCube(cube.data_3d, cube.datetime_values, cube.element_mapping, cube.valid_mask, smoothed_log_flux), energy_level)
+        try:
+            results = [_run_parameter_set(parameter_set) for parameter_set in parameter_sets]
+        finally:
+            # The current process is not a pool worker, so do not keep the cube and indexes after the sweep
+            _set_worker_state(None, None)
+    else:
+        with tempfile.TemporaryDirectory(prefix="sis_sweep_") as shared_dir:
+            shared_files = _write_shared_arrays(shared_dir, cube, smoothed_log_flux)
+            # Keep parameter sets that share an element-counting index next to each other,
+            # so each worker can reuse the indexes it builds
+            order = sorted(range(len(parameter_sets)), key=lambda i: _decay_index_key(parameter_sets[i]))
+            chunksize = max(1, len(parameter_sets) // (4 * max_workers))
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                     initargs=(shared_files, cube.element_mapping, energy_level)) as executor:
+                ordered_results = list(executor.map(_run_parameter_set, [parameter_sets[i] for i in order], chunksize=chunksize))
+            results = [None] * len(parameter_sets)
+            for i, result in zip(order, ordered_results):
+                results[i] = result
+
+    event_tables = []
+    summary_rows = []
+    for set_number, (parameter_set, (decay_events_df, seconds)) in enumerate(zip(parameter_sets, results)):
+        summary_rows.append({"Parameter Set": set_number, **parameter_set, "Events": len(decay_events_df), "Seconds": seconds})
+        if len(decay_events_df):
+            event_tables.append(decay_events_df.assign(**{"Parameter Set": set_number}, **parameter_set))
+
+    columns = ["Parameter Set", *PARAMETER_NAMES]
+    events = pd.concat(event_tables, ignore_index=True) if event_tables else pd.DataFrame(columns=columns)
+    events = events[columns + [c for c in events.columns if c not in columns]]
+    return events, pd.DataFrame(summary_rows)
+
+
+def _decay_index_key(parameter_set):
+    """
+    The parameters a DecaySegmentIndex depends on.
+    """
+    return (parameter_set["window_size_for_decay_count"], parameter_set["slope_threshold"], parameter_set["r_value_threshold"])
+
+
+def _write_shared_arrays(shared_dir, cube, smoothed_log_flux):
+    """
+    Writes the arrays the workers need to `.npy` files they can memory-map.
+
+    Returns:
+        dict: File paths of the cube, time axis, validity mask and smoothed series.
+    """
+    shared_files = {"smoothed_log_flux": {}}
+    for name, array in (("data_3d", cube.data_3d), ("datetime_values", cube.datetime_values), ("valid_mask", cube.valid_mask)):
+        shared_files[name] = os.path.join(shared_dir, f"{name}.npy")
+        np.save(shared_files[name], np.ascontiguousarray(array))
+    for (energy_level, element_name), log_flux_data in smoothed_log_flux.items():
+        path = os.path.join(shared_dir, f"smoothed_{energy_level}_{element_name}.npy")
+        np.save(path, log_flux_data)
+        shared_files["smoothed_log_flux"][energy_level, element_name] = path
+    return shared_files
+
+
+def _init_worker(shared_files, element_mapping, energy_level):
+    """
+    Memory-maps the shared arrays into a cube for this worker process.
+    """
+    smoothed_log_flux = {key: np.load(path, mmap_mode="r") for key, path in shared_files["smoothed_log_flux"].items()}
+    cube = SISCube(
+        np.load(shared_files["data_3d"], mmap_mode="r"),
+        np.load(shared_files["datetime_values"], mmap_mode="r"),
+        element_mapping,
+        np.load(shared_files["valid_mask"], mmap_mode="r"),
+        smoothed_log_flux,
+    )
+    _set_worker_state(cube, energy_level)
+
+
+def _set_worker_state(cube, energy_level):
+    global _worker_cube, _worker_energy_level, _worker_decay_indexes
+    _worker_cube = cube
+    _worker_energy_level = energy_level
+    _worker_decay_indexes = {}
+
+
+def _run_parameter_set(parameter_set):
+    """
+    Runs the decay detection for one parameter set in a worker.
+
+    Returns:
+        pd.DataFrame: The decay events.
+        float: Wall time in seconds, including building a new DecaySegmentIndex if one was needed.
+    """
+    start = time.perf_counter()
+
+    key = _decay_index_key(parameter_set)
+    if key not in _worker_decay_indexes:
+        _worker_decay_indexes[key] = DecaySegmentIndex(_worker_cube, None, None, *key, energy_levels=[_worker_energy_level])
+
+    decay_events_df = compute_decay_events_for_all_data(
+        _worker_cube, None, None, _worker_energy_level,
+        decay_index=_worker_decay_indexes[key],
+        **parameter_set,
+    )
+    return decay_events_df, time.perf_counter() - start
@@ -0,0 +1,184 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+"""Synthetic SIS data for testing and benchmarking without the real archives.
+`generate_sis_cube` builds an (energy, time, element) cube like the one
+`load_all_sis_data` returns: a quiet-time background that falls with energy and
+wanders slowly, SEP events that rise within hours and then decay either
+exponentially or as a power law, runs of -999.9 fill values and a few zeros.
+Decay times grow with energy and differ per element, as they would for different
+charge states. `write_sis_files` writes a cube as one SIS-format text file per
+element (25 header lines, a fractional-year column and 8 energy channels), so the
+loader can be exercised too."""
+
+
+DEFAULT_ELEMENTS = ("H", "He", "C", "N", "O", "Ne", "Mg", "Si", "S", "Fe")
+
+NUM_ENERGY_CHANNELS = 8
+
+SIS_HEADER_LINES = 25
+
+FILL_VALUE = -999.9
+
+
+def generate_sis_cube(hours=24 * 365, start_year=1998, elements=DEFAULT_ELEMENTS, num_events=20, gap_fraction=0.02,
+                      zero_fraction=0.001, seed=0):
+    """
+    Generates an hourly SIS data cube with injected decay events.
+
+    Args:
+        hours (int): Number of hourly samples.
+        start_year (int): Year of the first sample, which falls on January 1st at 00:00.
+        elements (tuple): Element names, in cube order.
+        num_events (int): Number of injected events, spread evenly with random jitter.
+        gap_fraction (float): Approximate fraction of each element's samples set to -999.9, in runs.
+        zero_fraction (float): Fraction of values set to 0.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        numpy.ndarray: The 3D data cube (energy, time, element).
+        numpy.ndarray: Array of datetime64[ns] values.
+        dict: Element name to array index mapping.
+        pd.DataFrame: The injected events, with "Start Time", "Peak Time", "End Time", "Decay Type"
+            ("Exponential Decay" or "Power-Law Decay") and "Decay Time" (e-folding time in hours of the
+            lowest He channel, NaN for power laws), plus the decay phase (peak to end) as catalog columns
+            "Start Year", "Start Fractional Day", "End Year" and "End Fractional Day".
+    """
+    rng = np.random.default_rng(seed)
+    num_elements = len(elements)
+    datetime_values = np.datetime64(f"{start_year}-01-01T00:00", "ns") + np.arange(hours) * np.timedelta64(1, "h")
+
+    # Quiet-time background, falling with energy and scaled by a rough abundance per element
+    energy_scale = 10.0 ** (-0.4 * np.arange(NUM_ENERGY_CHANNELS))
+    element_scale = 10.0 ** rng.uniform(-3, 1, num_elements)
+    drift = np.cumsum(rng.standard_normal((1, hours, num_elements)), axis=1) * 0.01
+    drift -= drift.mean(axis=1, keepdims=True)
+    log_noise = 0.05 * rng.standard_normal((NUM_ENERGY_CHANNELS, hours, num_elements))
+    data_3d = energy_scale[:, None, None] * element_scale[None, None, :] * 10.0 ** (drift + log_noise)
+
+    events = []
+    if num_events:
+        spacing = hours / num_events
+        if spacing < 96:
+            raise ValueError(f"{num_events} events do not fit in {hours} hours (at least 96 hours per event)")
+        # Decay times grow with energy and differ per element, as for different charge states
+        energy_factor = 1 + 0.15 * np.arange(NUM_ENERGY_CHANNELS)
+        element_factor = rng.uniform(0.7, 1.3, num_elements)
+        for event in range(num_events):
+            rise_hours = int(rng.integers(3, 13))
+            decay_hours = int(rng.uniform(48, min(240, 0.8 * spacing - rise_hours)))
+            onset = int(event * spacing + rng.uniform(0, spacing - rise_hours - decay_hours))
+            peak = onset + rise_hours
+            end = peak + decay_hours
+            log_amplitude = rng.uniform(1.5, 3)
+            kind = "Exponential Decay" if rng.random() < 0.5 else "Power-Law Decay"
+
+            # Enhancement over the background in log10, reaching ~0 at the end of the decay
+            decay_time = (np.arange(end - peak) + 1)[None, :, None]
+            if kind == "Exponential Decay":
+                tau = decay_hours / (log_amplitude * np.log(10)) * energy_factor[:, None, None] * element_factor[None, None, :]
+                log_decay = log_amplitude - decay_time / (tau * np.log(10))
+                he_decay_time = tau[0, 0, elements.index("He")] if "He" in elements else np.nan
+            else:
+                t0 = 5.0
+                gamma = log_amplitude / np.log10(1 + decay_hours / t0) / energy_factor[:, None, None] / element_factor[None, None, :]
+                log_decay = log_amplitude - gamma * np.log10(1 + decay_time / t0)
+                he_decay_time = np.nan
+            log_rise = log_amplitude * (np.arange(1, rise_hours + 1) / rise_hours)[None, :, None]
+
+            enhancement = np.concatenate((np.broadcast_to(log_rise, (NUM_ENERGY_CHANNELS, rise_hours, num_elements)),
+                                          np.maximum(log_decay, 0)), axis=1)
+            data_3d[:, onset:end, :] *= 10.0 ** enhancement
+            events.append({
+                "Start Time": pd.Timestamp(datetime_values[onset]),
+                "Peak Time": pd.Timestamp(datetime_values[peak]),
+                "End Time": pd.Timestamp(datetime_values[end - 1]),
+                "Decay Type": kind,
+                "Decay Time": he_decay_time,
+            })
+
+    # Data outages: runs of fill values per element, across all energy channels
+    mean_gap_hours = 12
+    for element in range(num_elements):
+        for _ in range(rng.poisson(gap_fraction * hours / mean_gap_hours)):
+            gap_start = int(rng.integers(0, hours))
+            data_3d[:, gap_start:gap_start + int(rng.geometric(1 / mean_gap_hours)), element] = FILL_VALUE
+    data_3d[(rng.random(data_3d.shape) < zero_fraction) & (data_3d != FILL_VALUE)] = 0
+
+    events_df = pd.DataFrame(events, columns=["Start Time", "Peak Time", "End Time", "Decay Type", "Decay Time"])
+    peak_times = pd.DatetimeIndex(events_df["Peak Time"])
+    end_times = pd.DatetimeIndex(events_df["End Time"])
+    events_df["Start Year"] = peak_times.year
+    events_df["Start Fractional Day"] = peak_times.dayofyear + (peak_times - peak_times.normalize()).total_seconds() / 86400
+    events_df["End Year"] = end_times.year
+    events_df["End Fractional Day"] = end_times.dayofyear + (end_times - end_times.normalize()).total_seconds() / 86400
+
+    element_mapping = {element_name: i for i, element_name in enumerate(elements)}
+    return data_3d, datetime_values, element_mapping, events_df
+
+
+def datetime64_to_fractional_year(datetime_values):
+    """
+    Converts datetime64 values to fractional years, the inverse of `fractional_year_to_datetime64`.
+
+    Args:
+        datetime_values (numpy.ndarray): Array of datetime64 values.
+
+    Returns:
+        numpy.ndarray: Array of fractional years.
+    """
+    datetime_values = np.asarray(datetime_values, dtype="datetime64[ns]")
+    years = datetime_values.astype("datetime64[Y]")
+    year_start = years.astype("datetime64[ns]")
+    next_year_start = (years + np.timedelta64(1, "Y")).astype("datetime64[ns]")
+    return years.astype("int64") + 1970 + (datetime_values - year_start) / (next_year_start - year_start)
+
+
+def write_sis_files(folder_path, data_3d, datetime_values, element_mapping, file_suffix="sis"):
+    """
+    Writes a data cube as SIS-format text files, one per element, readable by `load_all_sis_data`.
+
+    Args:
+        folder_path (str): Folder to write to, created if needed.
+        data_3d (numpy.ndarray): The 3D data cube (energy, time, element) with 8 energy channels.
+        datetime_values (numpy.ndarray): Array of datetime64 values.
+        element_mapping (dict): Element name to array index mapping.
+        file_suffix (str): Part of the file names after the element, as in `he_<file_suffix>.txt`.
+
+    Returns:
+        list: Paths of the written files.
+    """
+    os.makedirs(folder_path, exist_ok=True)
+    fp_year = datetime64_to_fractional_year(datetime_values)
+    paths = []
+    for element_name, element_index in element_mapping.items():
+        header = [
+            f"Synthetic SIS hourly flux for {element_name}",
+            "Generated by synthetic.py; not real ACE/SIS data",
+            "Units: particles/(cm^2 sr s MeV/nucleon), -999.9 marks missing data",
+            "Columns: fractional year, flux in energy channels 1-8",
+        ]
+        header += [""] * (SIS_HEADER_LINES - len(header))
+        rows = np.column_stack((fp_year, data_3d[:, :, element_index].T))
+        path = os.path.join(folder_path, f"{element_name.lower()}_{file_suffix}.txt")
+        np.savetxt(path, rows, fmt=["%.10f"] + ["%.6e"] * data_3d.shape[0], header="\n".join(header), comments="# ")
+        paths.append(path)
+    return paths
+
+
+def generate_sis_dataset(folder_path, **kwargs):
+    """
+    Generates a synthetic cube with `generate_sis_cube` and writes it with `write_sis_files`.
+
+    Args:
+        folder_path (str): Folder to write the element files to.
+        **kwargs: Passed on to `generate_sis_cube`.
+
+    Returns:
+        pd.DataFrame: The injected events (see `generate_sis_cube`).
+    """
+    data_3d, datetime_values, element_mapping, events_df = generate_sis_cube(**kwargs)
+    write_sis_files(folder_path, data_3d, datetime_values, element_mapping)
+    return events_df
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cube import SISCube
+from synthetic import generate_sis_cube
+
+
+@pytest.fixture(scope="session")
+def synthetic_data():
+    """
+    A small synthetic dataset: 20 days of hourly data with two injected events.
+    """
+    return generate_sis_cube(hours=24 * 20, num_events=2)
+
+
+@pytest.fixture(scope="session")
+def cube(synthetic_data):
+    data_3d, datetime_values, element_mapping, _ = synthetic_data
+    return SISCube(data_3d, datetime_values, element_mapping)
+
+
+@pytest.fixture(scope="session")
+def injected_events(synthetic_data):
+    """
+    The injected events in catalog form, with their decay phase as the event.
+    """
+    return synthetic_data[3]
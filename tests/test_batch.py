@@ -0,0 +1,43 @@
+import io
+import json
+import os
+
+import pandas as pd
+
+from batch import run_batch
+from flux_stats import compute_q1_thresholds
+from identification import compute_decay_events_for_all_data
+from load import load_all_sis_data
+from synthetic import generate_sis_cube, write_sis_files
+
+
+def test_batch_writes_a_catalog_and_report_per_dataset(tmp_path):
+    folder_paths = []
+    for year, seed in ((1998, 0), (2014, 1)):
+        data_3d, datetime_values, element_mapping, _ = generate_sis_cube(hours=24 * 20, start_year=year, num_events=2, seed=seed)
+        folder_path = str(tmp_path / f"flux_{year}")
+        write_sis_files(folder_path, data_3d, datetime_values, element_mapping)
+        folder_paths.append(folder_path)
+    output_dir = str(tmp_path / "batch")
+
+    reports = run_batch(folder_paths, output_dir, max_workers=1)
+
+    assert [report["dataset"] for report in reports] == ["flux_1998", "flux_2014"]
+    for folder_path, report in zip(folder_paths, reports):
+        # The catalog of the parsed files with their own Q1 helium cutoff, as process_dataset computes them
+        data_3d, datetime_values, element_mapping = load_all_sis_data(folder_path, max_workers=1)
+        he_flux_threshold = compute_q1_thresholds(data_3d, element_mapping, 1)["He"]
+        expected = compute_decay_events_for_all_data(data_3d, datetime_values, element_mapping, 1, he_flux_threshold,
+                                                     48, 24, 18, -0.005, 0.5)
+
+        assert report["he_flux_threshold"] == he_flux_threshold
+        assert report["output_csv"] == os.path.join(output_dir, f"decay_events_{report['dataset']}.csv")
+        assert report["events"] == len(expected) > 0
+        # List columns are stored as text, so compare with the expected catalog after the same round trip
+        pd.testing.assert_frame_equal(pd.read_csv(report["output_csv"]), pd.read_csv(io.StringIO(expected.to_csv(index=False))))
+
+    with open(os.path.join(output_dir, "batch_report.json")) as f:
+        batch_report = json.load(f)
+    assert batch_report["max_workers"] == 1
+    assert [dataset["he_flux_threshold"] for dataset in batch_report["datasets"]] == [report["he_flux_threshold"] for report in reports]
+    assert [dataset["events"] for dataset in batch_report["datasets"]] == [report["events"] for report in reports]
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from catalog import SET_COLUMN, TIME_PAIR_COLUMN, EventCatalog
+
+ELEMENTS = ["H", "He", "C", "O", "Fe"]
+
+
+def _catalog_df():
+    return pd.DataFrame({
+        "Event Number": [1, 2],
+        "Start Year": [1998, 1998],
+        "End Year": [1998, 1998],
+        "Start Fractional Day": [10.5, 40.25],
+        "End Fractional Day": [13.0, 44.0],
+        "Elements Decaying": [3, 2],
+        "Non-Decaying Elements": [["H", "Fe"], ["H", "C", "Fe"]],
+        "Best Log-Y Window Times": [(pd.Timestamp("1998-01-10 12:00"), pd.Timestamp("1998-01-12")), (None, None)],
+    })
+
+
+def test_from_dataframe_without_columns(tmp_path):
+    catalog = EventCatalog.from_dataframe(pd.DataFrame(), ELEMENTS)
+    assert len(catalog) == 0
+    assert catalog.start_times.dtype == np.dtype("datetime64[ns]")
+    assert len(catalog.overlapping("1998-01-01", "1999-01-01")) == 0
+
+    catalog.save(tmp_path / "empty.npz")
+    loaded = EventCatalog.load(tmp_path / "empty.npz")
+    assert len(loaded) == 0 and loaded.elements == ELEMENTS
+
+
+def test_from_dataframe_without_rows_keeps_column_kinds(tmp_path):
+    catalog = EventCatalog.from_dataframe(_catalog_df().iloc[:0], ELEMENTS)
+    assert len(catalog) == 0
+    assert catalog.column_kinds["Non-Decaying Elements"] == SET_COLUMN
+    assert catalog.column_kinds["Best Log-Y Window Times"] == TIME_PAIR_COLUMN
+    assert catalog.columns["Best Log-Y Window Times"].shape == (0, 2)
+    assert len(catalog.decaying("O")) == 0
+
+    catalog.save(tmp_path / "empty.npz")
+    assert list(EventCatalog.load(tmp_path / "empty.npz").to_dataframe().columns) == list(_catalog_df().columns)
+
+
+def test_from_dataframe_round_trip(tmp_path):
+    catalog = EventCatalog.from_dataframe(_catalog_df(), ELEMENTS)
+    catalog.save(tmp_path / "catalog.npz")
+    loaded = EventCatalog.load(tmp_path / "catalog.npz")
+    assert loaded.to_dataframe()["Non-Decaying Elements"].tolist() == [["H", "Fe"], ["H", "C", "Fe"]]
+    assert len(loaded.decaying("C")) == 1
@@ -0,0 +1,57 @@
+import warnings
+
+import numpy as np
+import pytest
+from scipy.stats import linregress
+
+from classification import best_decay_windows
+from identification import event_times
+
+
+def best_decay_windows_loop(flux_values, time_hours, min_window_hours):
+    """
+    One `linregress` per sub-window of at least `min_window_hours` and three samples, in both spaces.
+    """
+    log_flux = np.log10(flux_values)
+    best_r = np.zeros(2)
+    best_windows = [None, None]
+    for space, x_values in enumerate((time_hours, np.log10(time_hours + 1))):
+        for first in range(len(flux_values)):
+            for last in range(first + 2, len(flux_values)):
+                if time_hours[last] - time_hours[first] < min_window_hours or np.ptp(log_flux[first:last + 1]) == 0:
+                    continue
+                r_value = linregress(x_values[first:last + 1], log_flux[first:last + 1]).rvalue
+                if best_windows[space] is None or r_value < best_r[space]:
+                    best_r[space], best_windows[space] = r_value, (first, last)
+    return best_r, best_windows
+
+
+def event_series(cube, injected_events):
+    start_times, end_times = event_times(injected_events)
+    for start_time, end_time in zip(start_times, end_times):
+        flux, times = cube.window(start_time, end_time).valid_series(1, "He")
+        positive = flux > 0
+        # The first 60 samples keep the brute force quick and still cover the decay
+        yield flux[positive][:60], ((times[positive] - start_time) / np.timedelta64(1, "h"))[:60]
+
+
+@pytest.mark.parametrize("min_window_hours", [12, 36])
+def test_best_windows_match_linregress_over_every_window(cube, injected_events, min_window_hours):
+    rng = np.random.default_rng(0)
+    # The injected decays, plus an irregular noisy series with uneven sampling
+    noisy_hours = np.cumsum(rng.integers(1, 4, 50)).astype(float)
+    series = list(event_series(cube, injected_events)) + [(10 ** rng.normal(0, 0.3, 50), noisy_hours - noisy_hours[0])]
+
+    for flux, time_hours in series:
+        best_r, best_windows = best_decay_windows(flux, time_hours, min_window_hours)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            expected_r, expected_windows = best_decay_windows_loop(flux, time_hours, min_window_hours)
+        np.testing.assert_allclose(best_r, expected_r, atol=1e-9)
+        for space, window in enumerate(best_windows):
+            # Ties may pick a different window, but it must reach the same r
+            first, last = window
+            x_values = (time_hours, np.log10(time_hours + 1))[space]
+            assert time_hours[last] - time_hours[first] >= min_window_hours
+            r_value = linregress(x_values[first:last + 1], np.log10(flux[first:last + 1])).rvalue
+            assert r_value == pytest.approx(expected_r[space], abs=1e-9)
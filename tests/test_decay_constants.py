@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from scipy.stats import linregress
+
+from decay_constants import fit_decay_constants
+from identification import event_index_ranges, event_times
+
+
+def test_fits_match_linregress_per_event_and_channel(cube, injected_events):
+    energy_levels = [1, 4, 8]
+    fits = fit_decay_constants(injected_events, cube, None, None, energy_levels=energy_levels, max_workers=1)
+    # Without an "Event Number" column the events are numbered from 1
+    assert sorted(fits["Event"].unique()) == list(range(1, len(injected_events) + 1))
+
+    start_times, _ = event_times(injected_events)
+    first_index, stop_index = event_index_ranges(injected_events, cube.datetime_values)
+    num_decaying = 0
+    for _, fit in fits.iterrows():
+        event = fit["Event"] - 1
+        element_index = cube.element_mapping[fit["Element"]]
+        flux = cube.data_3d[fit["Energy Level"] - 1, first_index[event]:stop_index[event], element_index]
+        times = cube.datetime_values[first_index[event]:stop_index[event]]
+        positive = flux > 0
+        assert fit["Samples"] == np.count_nonzero(positive)
+
+        time_hours = (times[positive] - start_times[event]) / np.timedelta64(1, "h")
+        expected = linregress(time_hours, np.log(flux[positive]))
+        assert fit["Slope"] == pytest.approx(expected.slope, rel=1e-9, abs=1e-12)
+        assert fit["R-value"] == pytest.approx(expected.rvalue, rel=1e-9, abs=1e-12)
+        if expected.slope < 0:
+            num_decaying += 1
+            assert fit["Decay Time"] == pytest.approx(-1 / expected.slope, rel=1e-9)
+            assert fit["Decay Time Error"] == pytest.approx(expected.stderr / expected.slope ** 2, rel=1e-6)
+        else:
+            assert np.isnan(fit["Decay Time"])
+    assert num_decaying > 0
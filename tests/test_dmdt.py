@@ -0,0 +1,31 @@
+import numpy as np
+
+import dmdt
+from dmdt import DF_BINS, DT_BINS, compute_dmdt_mappings, normalized_log_flux
+from identification import event_index_ranges
+
+
+def _reference_mapping(flux, time_days):
+    """
+    The DMDT mapping of one series from an explicit loop over its sample pairs.
+    """
+    values = normalized_log_flux(flux)
+    valid = ~np.isnan(values)
+    values, time_days = values[valid], time_days[valid]
+    earlier, later = np.triu_indices(len(values), k=1)
+    counts, _, _ = np.histogram2d(values[later] - values[earlier], time_days[later] - time_days[earlier], bins=(DF_BINS, DT_BINS))
+    return counts / max(len(values) * (len(values) - 1) // 2, 1)
+
+
+def test_mappings_match_pairwise_reference(cube, injected_events, monkeypatch):
+    # A small budget splits the series over several chunks
+    monkeypatch.setattr(dmdt, "MAX_PAIRS_PER_CHUNK", 500)
+    mappings, elements = compute_dmdt_mappings(injected_events, cube, None, None, 2)
+
+    first_index, stop_index = event_index_ranges(injected_events, cube.datetime_values)
+    time_days = (cube.datetime_values - cube.datetime_values[0]) / np.timedelta64(1, "D")
+    for event in range(len(injected_events)):
+        event_slice = slice(first_index[event], stop_index[event])
+        for position, element_name in enumerate(elements):
+            flux = cube.data_3d[1, event_slice, cube.element_mapping[element_name]]
+            np.testing.assert_allclose(mappings[event, position], _reference_mapping(flux, time_days[event_slice]), rtol=1e-6)
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from classification import CLASSIFICATION_COLUMNS, classify_decay_events
+from decay_constants import FIT_COLUMNS, fit_decay_constants
+from dmdt import compute_dmdt_mappings
+from gaf import compute_gaf_images
+from identification import event_index_ranges, event_times
+
+# What compute_decay_events_for_all_data returns when it finds no events
+EMPTY_CATALOG = pd.DataFrame()
+
+
+def test_event_times_of_empty_catalog():
+    start_times, end_times = event_times(EMPTY_CATALOG)
+    assert start_times.dtype == end_times.dtype == np.dtype("datetime64[ns]")
+    assert len(start_times) == len(end_times) == 0
+
+
+def test_event_index_ranges_of_empty_catalog(cube):
+    first_index, stop_index = event_index_ranges(EMPTY_CATALOG, cube.datetime_values, extend_days=1)
+    assert len(first_index) == len(stop_index) == 0
+
+
+def test_consumers_accept_empty_catalog(cube, tmp_path):
+    num_elements = len(cube.element_mapping)
+
+    mappings, elements = compute_dmdt_mappings(EMPTY_CATALOG, cube, None, None, 1)
+    assert mappings.shape[:2] == (0, num_elements)
+
+    images, _ = compute_gaf_images(EMPTY_CATALOG, cube, None, None, 1, str(tmp_path / "gaf.npy"), max_workers=1)
+    assert images.shape[:2] == (0, num_elements)
+
+    classified_df = classify_decay_events(EMPTY_CATALOG, cube, None, None, 1)
+    assert len(classified_df) == 0 and set(CLASSIFICATION_COLUMNS) <= set(classified_df.columns)
+
+    fits = fit_decay_constants(EMPTY_CATALOG, cube, None, None, max_workers=1)
+    assert len(fits) == 0 and list(fits.columns) == list(FIT_COLUMNS)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from evaluation import evaluate_catalog, match_events, overlap_pairs
+
+T0 = np.datetime64("1998-01-01T00:00", "ns")
+
+
+def hours(values):
+    return T0 + np.asarray(values) * np.timedelta64(1, "h")
+
+
+def test_overlap_pairs_match_all_pairs_check():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        num_queries, num_indexed = rng.integers(0, 30, 2)
+        # Small integer grids so endpoints often touch, and lengths from points to spans covering most
+        # of the range, so short intervals are nested inside long ones
+        query_starts = rng.integers(0, 100, num_queries)
+        query_ends = query_starts + rng.integers(0, rng.choice([3, 30, 150]), num_queries)
+        starts = rng.integers(0, 100, num_indexed)
+        ends = starts + rng.integers(0, rng.choice([3, 30, 150]), num_indexed)
+
+        query_index, indexed = overlap_pairs(hours(query_starts), hours(query_ends), hours(starts), hours(ends))
+        expected = {
+            (query, other) for query in range(num_queries) for other in range(num_indexed)
+            if starts[other] <= query_ends[query] and ends[other] >= query_starts[query]
+        }
+        assert sorted(zip(query_index.tolist(), indexed.tolist())) == sorted(expected)
+        assert len(query_index) == len(expected)
+        assert np.all(np.diff(query_index) >= 0)
+
+
+def test_metrics_of_a_hand_worked_catalog():
+    labeled = pd.DataFrame({"Start Time": hours([0, 20, 50]), "End Time": hours([10, 30, 60])})
+    detected = pd.DataFrame({
+        # Hits the first labeled event (IoU 0.8), hits the second (IoU 1/3), only touches the second,
+        # misses everything, and hits the first again better (IoU 10/12)
+        "Start Time": hours([2, 25, 30, 70, 0]),
+        "End Time": hours([10, 35, 40, 80, 12]),
+    })
+
+    scores = evaluate_catalog(detected, labeled)
+    assert (scores["Detected"], scores["Labeled"], scores["True Positives"], scores["Labeled Found"]) == (5, 3, 3, 2)
+    assert scores["Precision"] == pytest.approx(3 / 5)
+    assert scores["Recall"] == pytest.approx(2 / 3)
+    assert scores["F1"] == pytest.approx(2 * (3 / 5) * (2 / 3) / (3 / 5 + 2 / 3))
+    # Each found labeled event is scored with its best detection: the last one and the second one
+    assert scores["Mean IoU"] == pytest.approx((10 / 12 + 1 / 3) / 2)
+    assert scores["Mean Start Offset Hours"] == pytest.approx((0 + 5) / 2)
+    assert scores["Mean End Offset Hours"] == pytest.approx((2 + 5) / 2)
+    assert scores["Mean Absolute Start Offset Hours"] == pytest.approx(2.5)
+
+    strict = evaluate_catalog(detected, labeled, min_iou=0.5)
+    assert (strict["True Positives"], strict["Labeled Found"]) == (2, 1)
+    assert strict["Precision"] == pytest.approx(2 / 5)
+    assert strict["Recall"] == pytest.approx(1 / 3)
+    assert strict["Mean IoU"] == pytest.approx(10 / 12)
+
+    matches = match_events(detected, labeled)
+    assert matches["Detected Index"].tolist() == [4, 1, -1]
+    assert np.isnan(matches["IoU"].iloc[2])
@@ -0,0 +1,40 @@
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np
+import pandas as pd
+
+from event_windows import EventWindows
+from graph import plot_decay_events_per_element
+from identification import compute_decay_events_for_all_data, event_index_ranges
+from instrumentation import PipelineStats
+
+
+def test_series_match_cube_windows(cube, injected_events):
+    event_windows = EventWindows.from_catalog(injected_events, cube, extend_days=1)
+    first_index, stop_index = event_index_ranges(injected_events, cube.datetime_values, extend_days=1)
+    core_first, core_stop = event_index_ranges(injected_events, cube.datetime_values)
+    assert np.array_equal(event_windows.first_index, first_index)
+    assert np.array_equal(event_windows.stop_index, stop_index)
+
+    for event in range(len(injected_events)):
+        for element_name in cube.element_mapping:
+            flux, times = event_windows.series(event, 1, element_name, extended=False)
+            valid = cube.valid_mask[0, core_first[event]:core_stop[event], cube.element_mapping[element_name]]
+            expected = cube.data_3d[0, core_first[event]:core_stop[event], cube.element_mapping[element_name]][valid]
+            assert np.array_equal(flux, expected)
+            assert np.shares_memory(flux, event_windows.flux) and not flux.flags.writeable
+            assert len(times) == len(flux)
+
+
+def test_element_counting_stage_entered_once_per_event(cube):
+    stats = PipelineStats()
+    decay_events_df = compute_decay_events_for_all_data(cube, None, None, 1, 0.0, 1, 24, 18, -0.005, 0.5, stats=stats)
+    assert len(decay_events_df) > 0
+    assert stats.calls["element_counting"] == len(decay_events_df)
+    assert stats.calls["event_windows"] == 1
+
+
+def test_plot_per_element_of_empty_catalog(cube):
+    assert plot_decay_events_per_element(pd.DataFrame(), cube, None, None, 2, 1, True) is None
@@ -0,0 +1,16 @@
+import numpy as np
+
+from flux_stats import HISTOGRAM_BINS, HISTOGRAM_LOG_RANGE, compute_flux_statistics
+
+
+def test_histogram_quantiles_within_one_bin(synthetic_data):
+    data_3d, _, element_mapping, _ = synthetic_data
+    exact = compute_flux_statistics(data_3d, element_mapping, method="exact")
+    # Small chunks, so the histogram is accumulated over several of them
+    histogram = compute_flux_statistics(data_3d, element_mapping, method="histogram", chunk_samples=100)
+
+    log_low, log_high = HISTOGRAM_LOG_RANGE
+    bin_factor = 10 ** ((log_high - log_low) / HISTOGRAM_BINS)
+    ratio = histogram.quantiles / exact.quantiles
+    assert np.all((ratio >= 1 / bin_factor) & (ratio <= bin_factor))
+    np.testing.assert_array_equal(histogram.count, exact.count)
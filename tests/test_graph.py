@@ -0,0 +1,65 @@
+import os
+
+import pandas as pd
+
+import graph
+from graph import create_interactive_plot_with_events, export_all_decay_events
+from synthetic import generate_sis_cube
+
+
+def test_interactive_plot_of_empty_catalog(cube, tmp_path):
+    output_html = tmp_path / "plot.html"
+    create_interactive_plot_with_events(cube, None, None, 1, cube.datetime_values[0], cube.datetime_values[-1],
+                                        str(output_html), pd.DataFrame(), include_plotlyjs="cdn", show=False)
+    assert output_html.exists()
+
+
+def test_serial_export_does_not_keep_figures(cube, injected_events, tmp_path):
+    paths = export_all_decay_events(injected_events, cube, None, None, 1, 1, True, str(tmp_path), events_per_page=1, max_workers=1)
+    assert len(paths) == len(injected_events) and all(os.path.exists(path) for path in paths)
+    # The figure reused across the pages belongs to the export, not to the module
+    assert graph._render_figures == {}
+
+
+def export_jobs(monkeypatch, *args, **kwargs):
+    """
+    The render jobs of an export, without rendering them.
+    """
+    jobs = []
+    monkeypatch.setattr(graph, "_render_jobs", lambda export_jobs, output_dir, max_workers: jobs.extend(export_jobs) or [])
+    export_all_decay_events(*args, **kwargs)
+    monkeypatch.undo()
+    return jobs
+
+
+def test_reused_figure_scales_the_last_page_like_a_fresh_one(monkeypatch, tmp_path):
+    data_3d, datetime_values, element_mapping, events_df = generate_sis_cube(hours=24 * 60, num_events=5, seed=3)
+    first_page, = export_jobs(monkeypatch, events_df, data_3d, datetime_values, element_mapping, 1, 1, True,
+                              str(tmp_path), events_per_page=5, max_workers=1)
+    # A short last page holding the quietest event, so the first page's peak is on a panel it hides
+    quietest = min(first_page["panels"], key=lambda panel: max(flux.max() for flux, _ in panel["series"] if len(flux)))
+    last_page = {**first_page, "panels": [quietest]}
+
+    fresh = {}
+    graph._render_job({**last_page, "path": str(tmp_path / "fresh.png")}, fresh)
+    reused = {}
+    graph._render_job({**first_page, "path": str(tmp_path / "first.png")}, reused)
+    first_page_ylim = next(iter(reused.values()))[1][0].get_ylim()
+    graph._render_job({**last_page, "path": str(tmp_path / "reused.png")}, reused)
+
+    fresh_ylim = next(iter(fresh.values()))[1][0].get_ylim()
+    assert first_page_ylim != fresh_ylim
+    assert next(iter(reused.values()))[1][0].get_ylim() == fresh_ylim
+
+
+def test_up_to_date_images_are_not_rendered_again(cube, injected_events, monkeypatch, tmp_path):
+    paths = export_all_decay_events(injected_events, cube, None, None, 1, 1, True, str(tmp_path), events_per_page=1, max_workers=1)
+    rendered = []
+    monkeypatch.setattr(graph, "_render_job", lambda job, figures=None: rendered.append(job["path"]))
+
+    export_all_decay_events(injected_events, cube, None, None, 1, 1, True, str(tmp_path), events_per_page=1, max_workers=1)
+    assert rendered == []
+    # A missing image is rendered again, the others are left alone
+    os.remove(paths[0])
+    export_all_decay_events(injected_events, cube, None, None, 1, 1, True, str(tmp_path), events_per_page=1, max_workers=1)
+    assert rendered == [paths[0]]
@@ -0,0 +1,201 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.ndimage import gaussian_filter1d
+from scipy.stats import linregress
+
+from identification import (DecaySegmentIndex, _durations_above_threshold, _shift_segment_starts, _sliding_window_regression,
+                            _smoothed_log_flux, compute_decay_events_for_all_data, count_elements_decaying_in_window,
+                            event_times, identify_exponential_decays)
+
+WINDOW_SIZE = 24
+SLOPE_THRESHOLD = -0.005
+R_VALUE_THRESHOLD = 0.5
+
+
+def identify_exponential_decays_loop(flux_data, time_data, window_size, slope_threshold, r_value_threshold):
+    """
+    The original detector: one `linregress` per sliding window, then a pairwise merge.
+    """
+    flux_data = np.where(flux_data > 0, flux_data, np.nan)
+    log_flux_data = gaussian_filter1d(np.log10(flux_data), sigma=1)
+
+    decays = []
+    for i in range(len(log_flux_data) - window_size):
+        window = log_flux_data[i:i + window_size]
+        if np.isnan(window).any():
+            continue
+        slope, intercept, r_value, p_value, std_err = linregress(np.arange(window_size), window)
+        if slope < slope_threshold and abs(r_value) > r_value_threshold:
+            decays.append((time_data[i], time_data[i + window_size - 1]))
+
+    merged_decays = []
+    for start, end in decays:
+        if merged_decays and start <= merged_decays[-1][1] + (time_data[1] - time_data[0]):
+            merged_decays[-1] = (merged_decays[-1][0], max(merged_decays[-1][1], end))
+        else:
+            merged_decays.append((start, end))
+    return merged_decays
+
+
+def assert_same_segments(flux_data, time_data, window_size=WINDOW_SIZE):
+    params = (window_size, SLOPE_THRESHOLD, R_VALUE_THRESHOLD)
+    expected = identify_exponential_decays_loop(flux_data, time_data, *params)
+    actual = identify_exponential_decays(flux_data, time_data, *params)
+    assert [(np.datetime64(start), np.datetime64(end)) for start, end in actual] == \
+        [(np.datetime64(start), np.datetime64(end)) for start, end in expected]
+    return actual
+
+
+def test_batched_detector_matches_linregress_loop(cube):
+    num_segments = 0
+    series = [(1, element_name) for element_name in cube.element_mapping] + [(8, "He"), (8, "Fe")]
+    for energy_level, element_name in series:
+        flux, times = cube.valid_series(energy_level, element_name)
+        num_segments += len(assert_same_segments(flux, times))
+    # The injected events must actually be detected for the comparison to mean anything
+    assert num_segments > 0
+
+
+def test_batched_detector_matches_with_nan_and_zero_flux(cube):
+    flux, times = cube.valid_series(1, "He")
+    flux = flux.copy()
+    # Zeros and NaNs inside and next to the injected decays, and at both ends of the series
+    flux[[0, 50, 51, 200, 333, len(flux) - 1]] = 0
+    flux[[10, 120, 121, 122, 400]] = np.nan
+    flux[300:310] = -1
+    assert_same_segments(flux, times)
+
+
+@pytest.mark.parametrize("num_samples", [0, 1, WINDOW_SIZE - 1, WINDOW_SIZE, WINDOW_SIZE + 1])
+def test_batched_detector_matches_on_short_series(num_samples):
+    times = np.datetime64("1998-01-01T00:00", "ns") + np.arange(num_samples).astype("timedelta64[h]")
+    flux = 10 ** (2 - 0.05 * np.arange(num_samples))
+    assert_same_segments(flux, times)
+
+
+def test_window_regression_matches_linregress(cube):
+    log_flux_data = _smoothed_log_flux(cube.valid_series(1, "O")[0])
+    slopes, r_values = _sliding_window_regression(log_flux_data, WINDOW_SIZE, chunk_size=100)
+    assert len(slopes) == len(log_flux_data) - WINDOW_SIZE
+    for i in range(len(slopes)):
+        window = log_flux_data[i:i + WINDOW_SIZE]
+        if np.isnan(window).any():
+            assert np.isnan(slopes[i]) and np.isnan(r_values[i])
+            continue
+        result = linregress(np.arange(WINDOW_SIZE), window)
+        assert slopes[i] == pytest.approx(result.slope, rel=1e-9, abs=1e-12)
+        assert r_values[i] == pytest.approx(result.rvalue, rel=1e-9, abs=1e-12)
+
+
+def shift_segment_start_loop(helium_flux, helium_time, start_index, end_index):
+    """
+    The original start back-shift of one segment.
+    """
+    start, end = helium_time[start_index], helium_time[end_index]
+    start_flux, end_flux = helium_flux[start_index], helium_flux[end_index]
+    if start_flux > end_flux:
+        duration_hours = (end - start) / np.timedelta64(1, "h")
+        shift_duration = np.timedelta64(max(8, int(duration_hours / 12)), "h")
+        previous_start_flux = start_flux
+        while start_flux > end_flux:
+            shifted_start_index = np.where(helium_time <= start - shift_duration)[0]
+            if len(shifted_start_index) == 0:
+                break
+            shifted_start_index = shifted_start_index[-1]
+            new_start_flux = helium_flux[shifted_start_index]
+            if new_start_flux < previous_start_flux:
+                start = helium_time[shifted_start_index]
+                start_flux = new_start_flux
+                previous_start_flux = new_start_flux
+                start_index = shifted_start_index
+            else:
+                break
+    return start_index
+
+
+def duration_above_threshold_loop(helium_flux, helium_time, start_index, end_index, he_flux_threshold):
+    """
+    The original above-threshold duration of one segment.
+    """
+    above_threshold_mask = helium_flux[start_index:end_index] >= he_flux_threshold
+    above_threshold_times = helium_time[start_index:end_index][above_threshold_mask]
+    duration_above_threshold = 0
+    if len(above_threshold_times) > 1:
+        continuous_periods = np.where(np.diff(above_threshold_times) <= np.timedelta64(1, "h"))[0]
+        if len(continuous_periods) > 0:
+            duration_above_threshold = (above_threshold_times[continuous_periods[-1] + 1] - above_threshold_times[0]) / np.timedelta64(1, "h")
+    return duration_above_threshold
+
+
+@pytest.fixture(scope="module")
+def helium_segments():
+    """
+    A valid helium series with data gaps, and segments on it: random ones, ones starting at
+    index 0, ones next to or across a gap and ones ending at the last sample.
+    """
+    rng = np.random.default_rng(3)
+    num_hours = 2000
+    all_times = np.datetime64("1998-01-01T00:00", "ns") + np.arange(num_hours).astype("timedelta64[h]")
+    kept = np.ones(num_hours, dtype=bool)
+    kept[[300, 301, 302, 900, 1500]] = False
+    kept[1200:1260] = False
+    helium_time = all_times[kept]
+    # A random walk in log flux, so starts can keep falling for several steps
+    helium_flux = 10 ** np.cumsum(0.05 * rng.standard_normal(len(helium_time)))
+    # Segments starting at index 0 try to shift back past the beginning of the data
+    helium_flux[0] = 2 * helium_flux.max()
+
+    gap_positions = np.flatnonzero(np.diff(helium_time) > np.timedelta64(1, "h"))
+    starts = [0, 0, 0, 5] + list(rng.integers(0, len(helium_time) - 200, 300)) + list(gap_positions - 20) + list(gap_positions + 1)
+    lengths = [1, 24, 150, 500] + list(rng.integers(1, 200, 300)) + [40] * len(gap_positions) + [30] * len(gap_positions)
+    start_indices = np.array(starts)
+    end_indices = np.minimum(start_indices + np.array(lengths), len(helium_time) - 1)
+    end_indices[-1] = len(helium_time) - 1
+    return helium_flux, helium_time, start_indices, end_indices
+
+
+def test_shift_segment_starts_matches_loop(helium_segments):
+    helium_flux, helium_time, start_indices, end_indices = helium_segments
+    shifted, shift_iterations = _shift_segment_starts(helium_flux, helium_time, start_indices, end_indices)
+    expected = [shift_segment_start_loop(helium_flux, helium_time, start, end) for start, end in zip(start_indices, end_indices)]
+    np.testing.assert_array_equal(shifted, expected)
+    # Segments stopped by the beginning of the data and segments that shift several times are covered
+    assert shift_iterations[0] == 1 and shifted[0] == 0
+    assert shift_iterations.max() > 1
+    assert np.array_equal(shift_iterations > 0, helium_flux[start_indices] > helium_flux[end_indices])
+
+
+@pytest.mark.parametrize("quantile", [None, 0.3, 0.7, 1.0])
+def test_durations_above_threshold_matches_loop(helium_segments, quantile):
+    helium_flux, helium_time, start_indices, end_indices = helium_segments
+    # None keeps every sample above the threshold; 1.0 leaves at most one sample at or above it
+    he_flux_threshold = 0.0 if quantile is None else np.quantile(helium_flux, quantile)
+    start_indices, _ = _shift_segment_starts(helium_flux, helium_time, start_indices, end_indices)
+    durations = _durations_above_threshold(helium_flux, helium_time, start_indices, end_indices, he_flux_threshold)
+    expected = [duration_above_threshold_loop(helium_flux, helium_time, start, end, he_flux_threshold)
+                for start, end in zip(start_indices, end_indices)]
+    np.testing.assert_array_equal(durations, expected)
+
+
+def test_decay_segment_index_matches_window_counting(cube):
+    criteria = (18, SLOPE_THRESHOLD, R_VALUE_THRESHOLD)
+    decay_index = DecaySegmentIndex(cube, None, None, *criteria, energy_levels=[1, 8])
+    # Every helium segment as an event, plus windows of many lengths, some shorter than the edge handling
+    decay_events_df = compute_decay_events_for_all_data(cube, None, None, 1, 0, 0, WINDOW_SIZE, *criteria)
+    start_times, end_times = event_times(decay_events_df)
+    rng = np.random.default_rng(5)
+    window_starts = cube.datetime_values[rng.integers(0, len(cube.datetime_values) - 20, 40)]
+    window_ends = window_starts + rng.integers(5, 300, 40).astype("timedelta64[h]")
+    start_times = np.concatenate((start_times, window_starts, cube.datetime_values[:1]))
+    end_times = np.concatenate((end_times, window_ends, cube.datetime_values[-1:]))
+    assert len(decay_events_df) > 0
+
+    num_decaying = 0
+    for energy_level in (1, 8):
+        for start, end in zip(start_times, end_times):
+            start, end = pd.Timestamp(start), pd.Timestamp(end)
+            expected = count_elements_decaying_in_window(cube, None, None, energy_level, start, end, *criteria)
+            assert decay_index.decaying_elements(energy_level, start, end) == expected
+            num_decaying += len(expected)
+    assert num_decaying > 0
@@ -0,0 +1,54 @@
+import os
+import stat
+
+import numpy as np
+
+from flux_stats import cached_flux_statistics
+from load import load_all_sis_data
+from synthetic import generate_sis_dataset
+
+
+def test_rebuilding_the_cache_keeps_earlier_cubes(tmp_path):
+    generate_sis_dataset(str(tmp_path), hours=24 * 5, num_events=1, seed=0)
+    first_cube, _, _ = load_all_sis_data(str(tmp_path), max_workers=1)
+    cached_cube, _, _ = load_all_sis_data(str(tmp_path), max_workers=1)
+    assert isinstance(cached_cube, np.memmap)
+    expected = np.array(cached_cube)
+
+    # Different data with a different size, so the fingerprint changes and the cache is rebuilt
+    generate_sis_dataset(str(tmp_path), hours=24 * 6, num_events=1, seed=1)
+    rebuilt_cube, _, _ = load_all_sis_data(str(tmp_path), max_workers=1)
+    assert rebuilt_cube.shape[1] == 24 * 6
+    np.testing.assert_array_equal(cached_cube, expected)
+    np.testing.assert_array_equal(first_cube, expected)
+
+
+def test_read_only_folder_skips_the_cache(tmp_path):
+    generate_sis_dataset(str(tmp_path), hours=24 * 5, num_events=1)
+    os.chmod(tmp_path, stat.S_IRUSR | stat.S_IXUSR)
+    try:
+        if os.access(tmp_path, os.W_OK):
+            # Running as root, permissions are not enforced; use a cache folder below a file instead
+            cache_dir = os.path.join(tmp_path, "he_sis.txt", "cache")
+        else:
+            cache_dir = None
+        data_3d, datetime_values, _ = load_all_sis_data(str(tmp_path), cache_dir=cache_dir, max_workers=1)
+    finally:
+        os.chmod(tmp_path, stat.S_IRWXU)
+    assert data_3d.shape == (8, 24 * 5, len(os.listdir(tmp_path)))
+    assert len(datetime_values) == 24 * 5
+
+
+def test_read_only_folder_skips_the_statistics_cache(tmp_path):
+    generate_sis_dataset(str(tmp_path), hours=24 * 5, num_events=1)
+    os.chmod(tmp_path, stat.S_IRUSR | stat.S_IXUSR)
+    try:
+        if os.access(tmp_path, os.W_OK):
+            # Running as root, permissions are not enforced; use a cache folder below a file instead
+            cache_dir = os.path.join(tmp_path, "he_sis.txt", "cache")
+        else:
+            cache_dir = None
+        statistics = cached_flux_statistics(str(tmp_path), cache_dir=cache_dir, max_workers=1)
+    finally:
+        os.chmod(tmp_path, stat.S_IRWXU)
+    assert statistics.quantiles.shape[1:] == (8, len(os.listdir(tmp_path)))
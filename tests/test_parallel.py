@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from decay_constants import fit_decay_constants
+from gaf import compute_gaf_images
+from parallel import bounded_map, resolve_max_workers
+
+
+def test_resolve_max_workers():
+    assert resolve_max_workers(8, 3) == 3
+    assert resolve_max_workers(4, 0) == 1
+    assert resolve_max_workers(None) >= 1
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_bounded_map_keeps_order(max_workers):
+    arguments = ((2, power) for power in range(20))
+    assert list(bounded_map(pow, arguments, max_workers, tasks_per_worker=1)) == [2 ** power for power in range(20)]
+
+
+def test_pooled_results_match_serial(cube, injected_events, tmp_path, monkeypatch):
+    serial_fits = fit_decay_constants(injected_events, cube, None, None, max_workers=1)
+    # One event per chunk, so the pool gets several chunks
+    monkeypatch.setattr("decay_constants.MAX_VALUES_PER_CHUNK", 1)
+    pooled_fits = fit_decay_constants(injected_events, cube, None, None, max_workers=2)
+    assert serial_fits.equals(pooled_fits)
+
+    serial_images, _ = compute_gaf_images(injected_events, cube, None, None, 1, str(tmp_path / "serial.npy"), max_workers=1)
+    monkeypatch.setattr("gaf.MAX_CHUNK_BYTES", 1)
+    pooled_images, _ = compute_gaf_images(injected_events, cube, None, None, 1, str(tmp_path / "pooled.npy"), max_workers=2)
+    np.testing.assert_array_equal(serial_images, pooled_images)
@@ -0,0 +1,41 @@
+import os
+import stat
+
+from pipeline import _read_catalog, run_pipeline
+from synthetic import generate_sis_dataset
+
+
+def test_rerun_only_repeats_stages_whose_inputs_changed(tmp_path):
+    folder_path, work_dir = str(tmp_path / "data"), str(tmp_path / "work")
+    generate_sis_dataset(folder_path, hours=24 * 20, num_events=2)
+    params = {"dpi": 20, "plot_energy_levels": 1}
+
+    first = run_pipeline(folder_path, work_dir, params, max_workers=1)
+    assert all(record["status"] == "ran" for record in first.values())
+    assert len(_read_catalog(first["filter"])) > 0
+
+    # Only the plot settings change: everything up to the classification is reused
+    second = run_pipeline(folder_path, work_dir, {**params, "extend_days": 2.0}, max_workers=1)
+    assert {name: record["status"] for name, record in second.items()} == {
+        "load": "cached", "thresholds": "cached", "detect": "cached", "filter": "cached", "classify": "cached",
+        "plot_events": "ran", "plot_elements": "ran",
+    }
+
+    # A new detection parameter that finds the same catalog re-runs the detection alone
+    third = run_pipeline(folder_path, work_dir, {**params, "r_value_threshold": 0.5 + 1e-9}, max_workers=1)
+    assert third["detect"]["status"] == "ran"
+    assert third["detect"]["content"] == first["detect"]["content"]
+    assert {name: third[name]["status"] for name in ("filter", "classify", "plot_events", "plot_elements")} == {
+        "filter": "cached", "classify": "cached", "plot_events": "cached", "plot_elements": "cached",
+    }
+
+
+def test_read_only_folder_runs_without_caches(tmp_path):
+    folder_path = str(tmp_path / "data")
+    generate_sis_dataset(folder_path, hours=24 * 5, num_events=1)
+    os.chmod(folder_path, stat.S_IRUSR | stat.S_IXUSR)
+    try:
+        records = run_pipeline(folder_path, str(tmp_path / "work"), targets=["thresholds"], max_workers=1)
+    finally:
+        os.chmod(folder_path, stat.S_IRWXU)
+    assert records["thresholds"]["status"] == "ran"
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from identification import compute_decay_events_for_all_data, event_times, identify_exponential_decays
+from streaming import StreamingDecayDetector
+
+CRITERIA = (24, -0.005, 0.5)
+
+
+def stream(cube, chunk_hours):
+    detector = StreamingDecayDetector(*CRITERIA)
+    events = []
+    for chunk_start in range(0, len(cube.datetime_values), chunk_hours):
+        chunk = slice(chunk_start, chunk_start + chunk_hours)
+        events.extend(detector.update_series(cube.data_3d[0, chunk, cube.element_mapping["He"]], cube.datetime_values[chunk]))
+    events.extend(detector.flush())
+    return [(np.datetime64(event.start), np.datetime64(event.end)) for event in events if event.kind == "closed"]
+
+
+@pytest.mark.parametrize("chunk_hours", [1, 7, 24, 100, 10 ** 6])
+def test_chunked_streaming_matches_batch_detection(cube, chunk_hours):
+    closed_segments = stream(cube, chunk_hours)
+
+    helium_flux, helium_time = cube.valid_series(1, "He")
+    expected = identify_exponential_decays(helium_flux, helium_time, *CRITERIA)
+    assert closed_segments == [(np.datetime64(start), np.datetime64(end)) for start, end in expected]
+
+    # With no threshold or duration filter every segment becomes an event; the batch detection
+    # only moves starts back, so the segment ends must match the catalog's
+    decay_events_df = compute_decay_events_for_all_data(cube, None, None, 1, 0, 0, *CRITERIA[:1], 18, *CRITERIA[1:])
+    assert len(decay_events_df) == len(closed_segments) > 0
+    _, end_times = event_times(decay_events_df)
+    segment_ends = np.array([end for _, end in closed_segments], dtype="datetime64[ns]")
+    np.testing.assert_array_equal(segment_ends[decay_events_df["Event Number"].to_numpy() - 1], end_times)
+
+
+def test_cube_updates_and_callback_see_every_event(cube):
+    helium_flux, helium_time = cube.valid_series(1, "He")
+    segments = identify_exponential_decays(helium_flux, helium_time, *CRITERIA)
+    # End the data in the middle of the last decay, so the flush has to close it
+    start, end = segments[-1]
+    cut = start + (end - start) / 2
+    chunk_starts = np.arange(cube.datetime_values[0], cut, np.timedelta64(30, "h"))
+
+    received = []
+    detector = StreamingDecayDetector(*CRITERIA, callback=received.append)
+    returned = []
+    for chunk_start in chunk_starts:
+        chunk_end = min(chunk_start + np.timedelta64(29, "h"), np.datetime64(cut))
+        returned.extend(detector.update(cube.window(chunk_start, chunk_end)))
+    flushed = detector.flush()
+    returned.extend(flushed)
+
+    assert received == returned
+    assert flushed[-1].kind == "closed" and flushed[-1].start == start
+
+    helium_flux, helium_time = cube.window(cube.datetime_values[0], cut).valid_series(1, "He")
+    expected = identify_exponential_decays(helium_flux, helium_time, *CRITERIA)
+    closed = [(event.start, event.end) for event in returned if event.kind == "closed"]
+    assert closed == [(pd.Timestamp(start), pd.Timestamp(end)) for start, end in expected]
@@ -0,0 +1,33 @@
+import pandas as pd
+import pytest
+
+import sweep
+from identification import compute_decay_events_for_all_data
+from sweep import parameter_grid, run_parameter_sweep
+
+PARAM_GRID = {
+    "he_flux_threshold": [0, 0.01],
+    "min_duration_hours": [0, 48],
+    "window_size": 24,
+    "window_size_for_decay_count": [12, 18],
+    "slope_threshold": -0.005,
+    "r_value_threshold": 0.5,
+}
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_sweep_matches_direct_detection(synthetic_data, max_workers):
+    data_3d, datetime_values, element_mapping, _ = synthetic_data
+    events, summary = run_parameter_sweep(data_3d, datetime_values, element_mapping, 1, PARAM_GRID, max_workers=max_workers)
+
+    parameter_sets = parameter_grid(PARAM_GRID)
+    assert len(summary) == len(parameter_sets)
+    for set_number, parameter_set in enumerate(parameter_sets):
+        expected = compute_decay_events_for_all_data(data_3d, datetime_values, element_mapping, 1, **parameter_set)
+        swept = events[events["Parameter Set"] == set_number][expected.columns].reset_index(drop=True)
+        pd.testing.assert_frame_equal(swept, expected.reset_index(drop=True), check_dtype=False)
+        assert summary.loc[set_number, "Events"] == len(expected)
+    assert events["Parameter Set"].nunique() > 1
+
+    # A serial sweep does not leave its cube and indexes behind
+    assert sweep._worker_cube is None and sweep._worker_decay_indexes == {}